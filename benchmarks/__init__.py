@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+"""
+This package provides the KConsole benchmark suite.
+
+Run every benchmark and compare with the stored baseline:
+
+    python -m benchmarks
+
+See python -m benchmarks --help for selecting benchmarks, sizes and files.
+"""
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the command line of the benchmark suite."""
+import argparse
+import logging
+import os
+import sys
+
+from benchmarks import runner
+
+BENCHMARKS = ("decode", "database", "latency", "startup")
+# The baseline compared with unless another is given.
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse the command line.
+
+    :return: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark KConsole with reproducible synthetic data and "
+        "compare the results with a baseline.",
+    )
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        metavar="BENCHMARK",
+        help=f"The benchmarks to run, out of {', '.join(BENCHMARKS)}. All by default.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Roster sizes for the database and model benchmarks.",
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        default=50000,
+        help="Frames of synthetic traffic decoded.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Runs of each measurement, the fastest counts.",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=200,
+        help="Position replies timed by the latency benchmark.",
+    )
+    parser.add_argument(
+        "--startup-runs",
+        type=int,
+        default=5,
+        help="Processes started by the startup benchmark.",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Smaller sizes and fewer runs, for a quick check.",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        default="benchmark-results.json",
+        help="The results file, - for standard output.",
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="FILE",
+        default=DEFAULT_BASELINE,
+        help="The results to compare with, benchmarks/baseline.json by default.",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="How much worse, as a share, a metric may get before it counts as "
+        "a regression.",
+    )
+    arguments = parser.parse_args()
+
+    unknown = set(arguments.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    if not arguments.benchmarks:
+        arguments.benchmarks = list(BENCHMARKS)
+    if arguments.quick:
+        arguments.sizes = [size for size in arguments.sizes if size <= 10000]
+        arguments.frames = min(arguments.frames, 10000)
+        arguments.repeat = min(arguments.repeat, 2)
+        arguments.samples = min(arguments.samples, 50)
+        arguments.startup_runs = min(arguments.startup_runs, 3)
+    return arguments
+
+
+def run(arguments: argparse.Namespace) -> dict:
+    """
+    Run the selected benchmarks.
+
+    :param arguments: The parsed command line.
+    :return: Metric name -> Metric.
+    """
+    results = {}
+    app = runner.application()
+    if {"database", "latency"} & set(arguments.benchmarks):
+        runner.open_database()
+
+    for name in arguments.benchmarks:
+        print(f"Running the {name} benchmark...", file=sys.stderr, flush=True)
+        if name == "decode":
+            from benchmarks import decode
+
+            results.update(decode.run(app, arguments.frames, arguments.repeat))
+        elif name == "database":
+            from benchmarks import database
+
+            results.update(database.run(app, arguments.sizes, arguments.repeat))
+        elif name == "latency":
+            if sys.platform == "win32":
+                print("Skipped, it needs a pseudo terminal.", file=sys.stderr)
+                continue
+            from benchmarks import latency
+
+            results.update(latency.run(app, samples=arguments.samples))
+        elif name == "startup":
+            from benchmarks import startup
+
+            results.update(startup.run(arguments.startup_runs))
+
+    return results
+
+
+def main() -> None:
+    """
+    Run the benchmarks, write the results and compare them with the baseline.
+
+    Exits with 1 if any metric regressed beyond the tolerance.
+
+    :return: None
+    """
+    arguments = parse_arguments()
+    # Log records would be part of the measurements.
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run(arguments)
+    settings = {
+        key: value
+        for key, value in vars(arguments).items()
+        if key not in ("output", "baseline", "save_baseline")
+    }
+    if arguments.output:
+        runner.write_results(arguments.output, results, settings)
+
+    if arguments.save_baseline:
+        runner.write_results(arguments.baseline, results, settings)
+        runner.print_results(results, [])
+        print(f"Saved the baseline to {arguments.baseline}.")
+        sys.exit(0)
+
+    comparison = []
+    if os.path.exists(arguments.baseline):
+        comparison = runner.compare(
+            results, runner.read_results(arguments.baseline), arguments.tolerance
+        )
+    runner.print_results(results, comparison)
+
+    regressions = [row[0] for row in comparison if row[4]]
+    if regressions:
+        print(f"{len(regressions)} regressions beyond {arguments.tolerance:.0%}.")
+        sys.exit(1)
+    if not comparison:
+        print(f"No baseline at {arguments.baseline} to compare with.")
+
+
+if __name__ == "__main__":
+    main()
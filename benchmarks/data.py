@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides reproducible synthetic data for the benchmarks."""
+import csv
+import random
+
+from kconsole.pty_radio import position_sentence
+from kconsole.roster import ROSTER_FIELDS
+
+# The seed every data set is generated from unless told otherwise.
+SEED = 20240901
+# Device IDs are four digits, radios beyond that move on to the next fleet.
+_FIRST_DEVICE_ID = 1000
+_DEVICES_PER_FLEET = 9000
+_FIRST_FLEET_ID = 100
+# Line noise, without the bytes that start a frame.
+_NOISE = bytes(byte for byte in range(4, 256) if byte != ord("$"))
+
+
+def radio_ids(count: int) -> list:
+    """
+    :param count: The number of radios.
+    :return: A list of unique (fleet_id, device_id) tuples.
+    """
+    return [
+        (
+            _FIRST_FLEET_ID + number // _DEVICES_PER_FLEET,
+            _FIRST_DEVICE_ID + number % _DEVICES_PER_FLEET,
+        )
+        for number in range(count)
+    ]
+
+
+def write_roster(path: str, count: int) -> None:
+    """
+    Write a CSV roster of radios for kconsole.roster.import_roster().
+
+    :param path: The file to write.
+    :param count: The number of radios.
+    :return: None
+    """
+    with open(path, "w", newline="", encoding="utf-8") as roster_file:
+        writer = csv.writer(roster_file)
+        writer.writerow(ROSTER_FIELDS)
+        for fleet_id, device_id in radio_ids(count):
+            writer.writerow(
+                (f"Radio {fleet_id}-{device_id}", f"{fleet_id:03d}", f"{device_id:04d}")
+            )
+
+
+def traffic(frame_count: int, radio_count: int = 1000, seed: int = SEED) -> bytes:
+    """
+    Generate serial traffic as received from a gateway radio.
+
+    Most frames are position replies, the rest texts, identifications and
+    acknowledgements, with an occasional burst of line noise in between.
+
+    :param frame_count: The number of frames.
+    :param radio_count: The number of radios the frames come from.
+    :param seed: The random seed, the same seed gives the same traffic.
+    :return: The bytes.
+    """
+    generator = random.Random(seed)
+    radios = radio_ids(radio_count)
+    chunks = []
+    for _ in range(frame_count):
+        fleet_id, device_id = generator.choice(radios)
+        ids = f"{fleet_id:03d}{device_id:04d}"
+        kind = generator.random()
+        if kind < 0.7:
+            chunks.append(
+                position_sentence(
+                    fleet_id,
+                    device_id,
+                    generator.uniform(-60, 60),
+                    generator.uniform(-180, 180),
+                    when=(2024, 9, 1, 12, 0, 0, 6, 245, 0),
+                )
+            )
+        elif kind < 0.85:
+            chunks.append(
+                f"\x02F{ids}Message {generator.randrange(10000)}\x03".encode()
+            )
+        elif kind < 0.95:
+            chunks.append(f"\x02I0{ids}{ids}\x03".encode())
+        else:
+            chunks.append(b"\x020\x03")
+
+        if generator.random() < 0.01:
+            chunks.append(bytes(generator.choice(_NOISE) for _ in range(16)))
+
+    return b"".join(chunks)
+
+
+def chunked(data: bytes, size: int) -> list:
+    """
+    Split data the way it is read from the serial port.
+
+    :param data: The bytes.
+    :param size: The bytes per read.
+    :return: A list of chunks.
+    """
+    return [data[offset : offset + size] for offset in range(0, len(data), size)]
+
+
+def position_frames(count: int, radio_count: int, seed: int = SEED) -> list:
+    """
+    Generate decoded position frames of known radios.
+
+    :param count: The number of frames.
+    :param radio_count: The number of radios the frames come from.
+    :param seed: The random seed.
+    :return: A list of PositionFrames.
+    """
+    from kconsole.decoder import PositionFrame
+
+    generator = random.Random(seed)
+    radios = radio_ids(radio_count)
+    return [
+        PositionFrame(
+            raw=b"",
+            timestamp=1725192000 + number,
+            fleet_id=fleet_id,
+            device_id=device_id,
+            latitude=generator.uniform(-60, 60),
+            longitude=generator.uniform(-180, 180),
+        )
+        for number, (fleet_id, device_id) in enumerate(
+            generator.choice(radios) for _ in range(count)
+        )
+    ]
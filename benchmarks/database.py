@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the persistence and radios model benchmarks."""
+import os
+import tempfile
+import time
+
+from benchmarks import data
+from benchmarks.runner import best_of, duration, rate
+
+# Columns the model is sorted by: text, and numbers with NULLs.
+SORT_COLUMNS = ("name", "last_contact")
+
+
+def _clear_radios() -> None:
+    from PySide6.QtSql import QSqlQuery
+
+    QSqlQuery().exec("DELETE FROM radios")
+
+
+def _add_radios(count: int) -> None:
+    """
+    Add radios one at a time, as from the add radio dialog.
+
+    :param count: The number of radios.
+    :return: None
+    """
+    from kconsole.models import RadiosModel
+
+    radios = RadiosModel()
+    for fleet_id, device_id in data.radio_ids(count):
+        radios.add_radio([f"Radio {fleet_id}-{device_id}", fleet_id, device_id])
+
+
+def _store_frames(frames: list) -> None:
+    """
+    Write frames through a FrameStore in the calling thread.
+
+    :param frames: The frames to write.
+    :return: None
+    """
+    from PySide6.QtSql import QSqlDatabase
+
+    from kconsole.store import FrameStore
+
+    frame_store = FrameStore()
+    frame_store.start()
+    for offset in range(0, len(frames), 50):
+        frame_store.add_frames(frames[offset : offset + 50])
+    frame_store.stop()
+    # The connection belongs to this thread, the window's store opens its own.
+    frame_store.deleteLater()
+    del frame_store
+    QSqlDatabase.removeDatabase(FrameStore.connection_name)
+
+
+def _sort_time(model, column: str, repeat: int) -> float:
+    """
+    Time sorting the model, each time from the order the table was read in.
+
+    :param model: A RadiosTableModel.
+    :param column: The column to sort by.
+    :param repeat: The number of runs, the fastest counts.
+    :return: The fastest run in seconds.
+    """
+    from PySide6.QtCore import Qt
+
+    times = []
+    for _ in range(repeat):
+        model.select()
+        started = time.perf_counter()
+        model.sort(model.fieldIndex(column), Qt.SortOrder.DescendingOrder)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def run(
+    app,
+    sizes: tuple,
+    repeat: int,
+    add_count: int = 500,
+    frame_count: int = 20000,
+    update_count: int = 5000,
+) -> dict:
+    """
+    Measure writing radios and traffic to the database, and reading and
+    sorting the radios model, at each roster size.
+
+    :param app: The running application.
+    :param sizes: The roster sizes, e.g. 1000, 10000 and 100000 radios.
+    :param repeat: The number of runs, the fastest counts.
+    :param add_count: The number of radios added one at a time.
+    :param frame_count: The number of frames written by the frame store.
+    :param update_count: The number of position updates of the radios.
+    :return: Metric name -> Metric.
+    """
+    from kconsole.models import RadiosModel, RadiosTableModel
+    from kconsole.roster import import_roster
+
+    results = {}
+
+    _clear_radios()
+    started = time.perf_counter()
+    _add_radios(add_count)
+    results["database.add_radio"] = rate(
+        add_count, time.perf_counter() - started, "rows/s"
+    )
+
+    frames = data.position_frames(frame_count, 1000)
+    seconds = best_of(repeat, _store_frames, frames)
+    results["database.frame_store.insert"] = rate(frame_count, seconds, "rows/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            _clear_radios()
+            roster = os.path.join(directory, f"roster-{size}.csv")
+            data.write_roster(roster, size)
+            started = time.perf_counter()
+            import_roster(roster)
+            results[f"database.roster_import.{size}"] = rate(
+                size, time.perf_counter() - started, "rows/s"
+            )
+
+            radios = RadiosModel()
+            updates = data.position_frames(update_count, size)
+            seconds = best_of(repeat, radios.record_frames, updates)
+            results[f"database.record_frames.{size}"] = rate(
+                update_count, seconds, "updates/s"
+            )
+
+            model = RadiosTableModel()
+            results[f"model.select.{size}"] = duration(best_of(repeat, model.select))
+            for column in SORT_COLUMNS:
+                results[f"model.sort_{column}.{size}"] = duration(
+                    _sort_time(model, column, repeat)
+                )
+
+    _clear_radios()
+    return results
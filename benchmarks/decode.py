@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the frame decoding and capture replay benchmarks."""
+import os
+import tempfile
+
+from benchmarks import data
+from benchmarks.runner import best_of, rate
+
+# Bytes per read: a few characters as from a slow line, and a full buffer.
+CHUNK_SIZES = (64, 4096)
+
+
+def _decode(chunks: list) -> int:
+    """
+    :param chunks: The reads to decode.
+    :return: The number of frames decoded.
+    """
+    from kconsole.decoder import FrameDecoder
+
+    decoder = FrameDecoder()
+    return sum(len(decoder.feed(chunk)) for chunk in chunks)
+
+
+def _read_capture(path: str) -> int:
+    """
+    :param path: The capture file to read.
+    :return: The number of bytes read.
+    """
+    from kconsole.capture import CaptureReader
+
+    with CaptureReader(path) as reader:
+        return sum(len(record.data) for record in reader)
+
+
+def _replay(app, path: str) -> dict:
+    """
+    Replay a capture as fast as possible through the Qt event loop.
+
+    :param app: The running application.
+    :param path: The capture file.
+    :return: The replay report.
+    """
+    from PySide6.QtCore import QEventLoop
+
+    from kconsole.capture import CaptureReplay
+
+    replay = CaptureReplay(path, speed=0)
+    loop = QEventLoop()
+    reports = []
+    replay.finished.connect(reports.append)
+    replay.finished.connect(loop.quit)
+    replay.start()
+    loop.exec()
+    return reports[0]
+
+
+def run(app, frame_count: int, repeat: int) -> dict:
+    """
+    Measure decoding, and reading and replaying captures, of synthetic traffic.
+
+    :param app: The running application.
+    :param frame_count: The number of frames in the traffic.
+    :param repeat: The number of runs, the fastest counts.
+    :return: Metric name -> Metric.
+    """
+    from kconsole.capture import CaptureWriter, Direction
+
+    traffic = data.traffic(frame_count)
+    frames = _decode([traffic])
+    megabytes = len(traffic) / 1e6
+    results = {}
+
+    for size in CHUNK_SIZES:
+        chunks = data.chunked(traffic, size)
+        seconds = best_of(repeat, _decode, chunks)
+        results[f"decode.chunk_{size}.throughput"] = rate(megabytes, seconds, "MB/s")
+        results[f"decode.chunk_{size}.frames"] = rate(frames, seconds, "frames/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for compressed in (False, True):
+            name = "compressed" if compressed else "plain"
+            path = os.path.join(directory, f"{name}.kcap")
+            writer = CaptureWriter(path, compressed=compressed)
+            for chunk in data.chunked(traffic, 64):
+                writer.write(Direction.READ, chunk)
+            writer.close()
+
+            seconds = best_of(repeat, _read_capture, path)
+            results[f"capture.{name}.read"] = rate(megabytes, seconds, "MB/s")
+
+        seconds = min(_replay(app, path)["seconds"] for _ in range(repeat))
+        results["capture.compressed.replay"] = rate(frames, seconds, "frames/s")
+
+    return results
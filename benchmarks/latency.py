@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the serial byte to table update latency benchmark."""
+import os
+import pty
+import random
+import time
+import tty
+
+from benchmarks import data
+from benchmarks.runner import duration, percentile
+
+
+def run(app, radio_count: int = 1000, samples: int = 200) -> dict:
+    """
+    Measure the time from a position reply arriving on the serial port to
+    the radio's row in the main window's table being updated.
+
+    The main window is opened offscreen on one end of a pseudo terminal
+    with the benchmark roster, position replies are written to the other
+    end one at a time and timed until the model reports the changed row.
+
+    :param app: The running application.
+    :param radio_count: The number of radios in the table.
+    :param samples: The number of replies timed.
+    :return: Metric name -> Metric.
+    """
+    from PySide6.QtCore import QEventLoop, QSettings, QTimer
+    from PySide6.QtSql import QSqlQuery
+
+    from kconsole.pty_radio import position_sentence
+    from kconsole.views import Window
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    settings = QSettings()
+    settings.setValue("default_port", os.ttyname(slave))
+    settings.sync()
+
+    QSqlQuery().exec("DELETE FROM radios")
+    query = QSqlQuery()
+    query.prepare("INSERT INTO radios (name, fleet_id, device_id) VALUES (?, ?, ?)")
+    for fleet_id, device_id in data.radio_ids(radio_count):
+        query.addBindValue(f"Radio {fleet_id}-{device_id}")
+        query.addBindValue(fleet_id)
+        query.addBindValue(device_id)
+        query.exec()
+
+    window = Window()
+    window.show()
+    model = window.radiosModel.model
+    loop = QEventLoop()
+    # The row waited for, and whether it was updated.
+    waiting = {"row": -1, "updated": False}
+
+    def changed(top_left, *_) -> None:
+        if top_left.row() == waiting["row"]:
+            waiting["updated"] = True
+            loop.quit()
+
+    model.dataChanged.connect(changed)
+    timeout = QTimer()
+    timeout.setSingleShot(True)
+    timeout.timeout.connect(loop.quit)
+
+    generator = random.Random(data.SEED)
+    radios = data.radio_ids(radio_count)
+    latencies = []
+    try:
+        # The worker thread opens the port asynchronously.
+        timeout.start(500)
+        loop.exec()
+        for _ in range(samples):
+            fleet_id, device_id = generator.choice(radios)
+            waiting["row"] = model.row_of(
+                window.radiosModel.lookup(fleet_id, device_id)["id"]
+            )
+            waiting["updated"] = False
+            sentence = position_sentence(
+                fleet_id,
+                device_id,
+                generator.uniform(-60, 60),
+                generator.uniform(-180, 180),
+            )
+            timeout.start(5000)
+            started = time.perf_counter()
+            os.write(master, sentence)
+            loop.exec()
+            if not waiting["updated"]:
+                raise RuntimeError("The table was not updated within 5 seconds.")
+            latencies.append(time.perf_counter() - started)
+            timeout.stop()
+    finally:
+        window.close()
+        window.deleteLater()
+        os.close(master)
+        os.close(slave)
+        settings.remove("default_port")
+
+    return {
+        "latency.serial_to_table.p50": duration(percentile(latencies, 0.5)),
+        "latency.serial_to_table.p95": duration(percentile(latencies, 0.95)),
+        "latency.serial_to_table.max": duration(max(latencies)),
+    }
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the benchmark results, environment and baseline checks."""
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+logger = logging.getLogger(__name__)
+
+# The application name used by the in-process benchmarks, keeping their
+# settings and database apart from the real ones.
+APPLICATION_NAME = "KConsoleBenchmark"
+DATABASE_NAME = "KConsoleBenchmark.sqlite"
+
+
+@dataclass
+class Metric:
+    """A single measured value."""
+
+    value: float
+    unit: str
+    # "higher" for rates, "lower" for durations.
+    better: str = "lower"
+
+    def change(self, baseline: "Metric") -> float:
+        """
+        :param baseline: The same metric measured earlier.
+        :return: How much worse this value is, as a share of the baseline,
+        negative if it improved.
+        """
+        if not baseline.value:
+            return 0.0
+        change = (self.value - baseline.value) / baseline.value
+        return change if self.better == "lower" else -change
+
+
+def rate(count: float, seconds: float, unit: str) -> Metric:
+    """
+    :param count: The number of things done.
+    :param seconds: The time it took.
+    :param unit: The unit of the rate, e.g. frames/s.
+    :return: A Metric of things per second, higher being better.
+    """
+    return Metric(round(count / seconds, 3) if seconds else 0.0, unit, "higher")
+
+
+def duration(seconds: float) -> Metric:
+    """
+    :param seconds: A duration.
+    :return: A Metric in milliseconds, lower being better.
+    """
+    return Metric(round(seconds * 1000, 3), "ms")
+
+
+def best_of(repeat: int, function, *arguments) -> float:
+    """
+    Time a function several times, returning the fastest run since slower
+    runs only measure interference from the rest of the system.
+
+    :param repeat: The number of runs.
+    :param function: The function to time.
+    :param arguments: The arguments of the function.
+    :return: The fastest run in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*arguments)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def percentile(values: list, share: float) -> float:
+    """
+    :param values: The measured values.
+    :param share: The percentile as a share, e.g. 0.95.
+    :return: The value below which the share of values falls.
+    """
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[
+        round(share * 100) - 1
+    ]
+
+
+def application():
+    """
+    Create the Qt application for the in-process benchmarks.
+
+    Windows are drawn offscreen unless another platform is asked for, and
+    QStandardPaths test mode plus their own application name keep the
+    settings and database of the benchmarks apart from the real ones.
+
+    :return: The QApplication.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QSettings, QStandardPaths
+    from PySide6.QtWidgets import QApplication
+
+    QStandardPaths.setTestModeEnabled(True)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setOrganizationName("SARStats")
+    app.setApplicationName(APPLICATION_NAME)
+    QSettings().clear()
+    return app
+
+
+def open_database():
+    """
+    Open an empty benchmark database with kconsole.database.
+
+    :return: None
+    :raises RuntimeError: If the database can not be opened.
+    """
+    from PySide6.QtCore import QStandardPaths
+    from PySide6.QtSql import QSqlDatabase
+
+    from kconsole.database import create_connection
+
+    directory = QStandardPaths.standardLocations(
+        QStandardPaths.StandardLocation.AppLocalDataLocation
+    )[0]
+    for suffix in ("", "-wal", "-shm"):
+        path = os.path.join(directory, DATABASE_NAME + suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+    if not create_connection(DATABASE_NAME):
+        raise RuntimeError(
+            f"Database Error: {QSqlDatabase.database().lastError().text()}"
+        )
+
+
+def environment() -> dict:
+    """
+    :return: A description of the machine and versions the results are for.
+    """
+    import PySide6
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "pyside6": PySide6.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_results(path: str, results: dict, settings: dict) -> None:
+    """
+    Write the results as JSON.
+
+    :param path: The file to write, - for standard output.
+    :param results: Metric name -> Metric.
+    :param settings: The options the benchmarks were run with.
+    :return: None
+    """
+    document = {
+        "environment": environment(),
+        "settings": settings,
+        "results": {name: asdict(metric) for name, metric in sorted(results.items())},
+    }
+    text = json.dumps(document, indent=2)
+    if path == "-":
+        print(text)
+        return
+    with open(path, "w", encoding="utf-8") as results_file:
+        results_file.write(text + "\n")
+
+
+def read_results(path: str) -> dict:
+    """
+    Read results written by write_results().
+
+    :param path: The file to read.
+    :return: Metric name -> Metric.
+    """
+    with open(path, encoding="utf-8") as results_file:
+        document = json.load(results_file)
+    return {name: Metric(**metric) for name, metric in document["results"].items()}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare results with a baseline.
+
+    :param results: Metric name -> Metric, as measured now.
+    :param baseline: Metric name -> Metric, as measured before.
+    :param tolerance: How much worse, as a share, a metric may get before it
+    counts as a regression.
+    :return: A list of (name, baseline, current, change, regressed) tuples for
+    the metrics in both, change being how much worse it got as a share.
+    """
+    rows = []
+    for name in sorted(results.keys() & baseline.keys()):
+        change = results[name].change(baseline[name])
+        rows.append((name, baseline[name], results[name], change, change > tolerance))
+    return rows
+
+
+def print_results(results: dict, comparison: list) -> None:
+    """
+    Print the results, with the change from the baseline where known,
+    positive changes being improvements.
+
+    :param results: Metric name -> Metric.
+    :param comparison: The rows returned by compare().
+    :return: None
+    """
+    changes = {row[0]: row for row in comparison}
+    width = max((len(name) for name in results), default=0)
+    for name, metric in sorted(results.items()):
+        line = f"{name:<{width}}  {metric.value:>14,.3f} {metric.unit}"
+        if name in changes:
+            _, before, _, change, regressed = changes[name]
+            line += f"  (baseline {before.value:,.3f}, {-change:+.1%})"
+            if regressed:
+                line += "  REGRESSION"
+        print(line)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the cold startup benchmark."""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.runner import duration
+
+# Started in a new interpreter for every run, see kconsole --measure-startup.
+_LAUNCHER = "from kconsole.main import main; main()"
+
+
+def _start(directory: str, report: str) -> None:
+    """
+    Start KConsole until its window is shown, recording the startup times.
+
+    :param directory: The home of the settings and data of the run.
+    :param report: The file the startup times are appended to.
+    :return: None
+    :raises RuntimeError: If KConsole fails or does not show its window.
+    """
+    environment = dict(
+        os.environ,
+        QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+        XDG_CONFIG_HOME=os.path.join(directory, "config"),
+        XDG_DATA_HOME=os.path.join(directory, "data"),
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", _LAUNCHER, "--measure-startup", report],
+        env=environment,
+        capture_output=True,
+        timeout=120,
+    )
+    if process.returncode:
+        raise RuntimeError(
+            f"KConsole exited with {process.returncode}: "
+            f"{process.stderr.decode(errors='replace')[-2000:]}"
+        )
+
+
+def run(runs: int = 5) -> dict:
+    """
+    Measure the time from starting a new interpreter to the first window.
+
+    Every run starts a new process, so nothing but the operating system's
+    file cache is warm. Settings and data are kept in a temporary home on
+    platforms following the XDG base directories, elsewhere the user's own
+    are used. The first run, which also creates the database, is reported
+    separately from the median of the others.
+
+    :param runs: The number of processes started.
+    :return: Metric name -> Metric.
+    """
+    from PySide6.QtCore import QSettings
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Without a port the first-run settings dialog would block startup.
+        settings = QSettings(
+            os.path.join(directory, "config", "SARStats", "KConsole.conf"),
+            QSettings.Format.IniFormat,
+        )
+        settings.setValue("default_port", "kconsole-benchmark")
+        settings.sync()
+
+        report = os.path.join(directory, "startup.jsonl")
+        for _ in range(max(runs, 2)):
+            _start(directory, report)
+        with open(report, encoding="utf-8") as report_file:
+            reports = [json.loads(line) for line in report_file]
+
+    results = {"startup.first.total": duration(reports[0]["total"])}
+    for phase in reports[0]:
+        results[f"startup.{phase}"] = duration(
+            statistics.median(report[phase] for report in reports[1:])
+        )
+    return results
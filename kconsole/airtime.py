@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides airtime accounting and the duty-cycle budget."""
+import logging
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+from PySide6.QtSerialPort import QSerialPort
+
+logger = logging.getLogger(__name__)
+
+# Bytes KSync adds around every command: STX, the command or length code,
+# the three digit fleet ID, the four digit device ID and ETX.
+_TEXT_OVERHEAD = 1 + 1 + 3 + 4 + 1
+_POLL_LENGTH = 1 + 2 + 3 + 4 + 1
+
+
+def character_time(settings: dict) -> float:
+    """
+    The time in seconds one character occupies the serial line.
+
+    :param settings: The program settings holding the QSerialPort enums.
+    :return: Seconds per character, including start, parity and stop bits.
+    """
+    stop_bits = {
+        QSerialPort.StopBits.OneStop: 1.0,
+        QSerialPort.StopBits.OneAndHalfStop: 1.5,
+        QSerialPort.StopBits.TwoStop: 2.0,
+    }[settings["stop_bits"]]
+    parity_bits = 0 if settings["parity"] == QSerialPort.Parity.NoParity else 1
+    bits = 1 + settings["data_bits"].value + parity_bits + stop_bits
+
+    return bits / settings["baud_rate"].value
+
+
+def frame_length(command: str, arguments: dict) -> int:
+    """
+    The number of bytes KSync writes for a command.
+
+    :param command: The KSync method, send_text or poll_gnss.
+    :param arguments: The keyword arguments of the KSync method.
+    :return: The frame length in bytes.
+    """
+    if command == "send_text":
+        return _TEXT_OVERHEAD + len(arguments["message"].encode())
+    return _POLL_LENGTH
+
+
+def duty_cycle_share(percent) -> float:
+    """
+    Turn the duty_cycle setting into the share of the window that may be
+    spent transmitting.
+
+    :param percent: The setting, a percentage in (0, 100].
+    :return: The share, from just above 0 to 1. Values that are not a
+    percentage in range fall back to 1, which never holds traffic back.
+    """
+    try:
+        share = float(percent) / 100
+    except (TypeError, ValueError):
+        share = float("nan")
+
+    if not 0 < share <= 1:
+        logger.warning(
+            "Ignoring duty_cycle setting %r, it must be above 0 and at most 100.",
+            percent,
+        )
+        return 1.0
+
+    return share
+
+
+class AirtimeAccountant(QObject):
+    """
+    Track how long outbound frames occupy the serial line and the channel.
+
+    The serial transmit time follows from the line settings. The radio then
+    keys up and sends the frame over the air at its own, much lower, bit rate,
+    which is what actually occupies the channel. Over-the-air time is summed
+    over a sliding window and compared with the duty-cycle budget, the share
+    of the window the console may transmit.
+    """
+
+    budget_changed = Signal(float, float)
+
+    def __init__(
+        self,
+        settings: dict,
+        duty_cycle: float = 1.0,
+        window: float = 3600.0,
+        air_bit_rate: int = 1200,
+        key_up_time: float = 0.25,
+        parent=None,
+    ):
+        """
+        :param settings: The program settings holding the QSerialPort enums.
+        :param duty_cycle: The share of the window that may be spent
+        transmitting, from 0 to 1.
+        :param window: The length of the sliding window in seconds.
+        :param air_bit_rate: The over-the-air bit rate of the radio.
+        :param key_up_time: Seconds the radio transmits before the data, for
+        keying up and the preamble.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        self.character_time = character_time(settings)
+        self.budget = duty_cycle * window
+        self.window = window
+        self.air_bit_rate = air_bit_rate
+        self.key_up_time = key_up_time
+        # Running totals since the accountant was created.
+        self.transmit_time = 0.0
+        self.air_time = 0.0
+        # (monotonic time, air time) of the frames inside the window.
+        self._frames = deque()
+        self._used = 0.0
+        # Budget recovers as frames leave the window, so it is republished.
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self._publish)
+
+    def frame_transmit_time(self, length: int) -> float:
+        """
+        :param length: The frame length in bytes.
+        :return: Seconds the frame occupies the serial line.
+        """
+        return length * self.character_time
+
+    def frame_air_time(self, length: int) -> float:
+        """
+        :param length: The frame length in bytes.
+        :return: Estimated seconds the frame occupies the radio channel.
+        """
+        return self.key_up_time + length * 8 / self.air_bit_rate
+
+    def remaining(self) -> float:
+        """
+        :return: The seconds of air time left in the current window.
+        """
+        self._expire(time.monotonic())
+        return max(0.0, self.budget - self._used)
+
+    def fits(self, length: int) -> bool:
+        """
+        :param length: The frame length in bytes.
+        :return: False if the frame takes more air time than the whole budget,
+        so it could never be sent within the duty cycle.
+        """
+        return self.frame_air_time(length) <= self.budget
+
+    def wait_time(self, length: int) -> float:
+        """
+        How long until a frame fits in the budget.
+
+        :param length: The frame length in bytes.
+        :return: Seconds to wait, 0 if the frame may be sent now.
+        """
+        now = time.monotonic()
+        self._expire(now)
+        excess = self._used + self.frame_air_time(length) - self.budget
+        if excess <= 0:
+            return 0.0
+
+        # Walk the window until enough air time has expired.
+        for sent_at, air_time in self._frames:
+            excess -= air_time
+            if excess <= 0:
+                return sent_at + self.window - now
+
+        # Only reached for frames larger than the whole budget, which the
+        # outbound queue rejects up front, see fits().
+        return self.window
+
+    def record(self, length: int) -> float:
+        """
+        Account for a frame that has been written.
+
+        :param length: The number of bytes written.
+        :return: The estimated air time of the frame.
+        """
+        now = time.monotonic()
+        air_time = self.frame_air_time(length)
+        self.transmit_time += self.frame_transmit_time(length)
+        self.air_time += air_time
+        self._frames.append((now, air_time))
+        self._used += air_time
+        self._publish()
+        return air_time
+
+    @Slot()
+    def _publish(self) -> None:
+        """
+        Emit the remaining budget, polling only while the window holds frames.
+
+        :return: None
+        """
+        self.budget_changed.emit(self.remaining(), self.budget)
+        if self._frames and not self._timer.isActive():
+            self._timer.start()
+        elif not self._frames:
+            self._timer.stop()
+
+    def _expire(self, now: float) -> None:
+        """
+        Drop frames that have left the sliding window.
+
+        :param now: The current monotonic time.
+        :return: None
+        """
+        start = now - self.window
+        while self._frames and self._frames[0][0] <= start:
+            self._used -= self._frames.popleft()[1]
+
+        if not self._frames:
+            # Avoids drifting float sums.
+            self._used = 0.0
@@ -0,0 +1,467 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides recording and replay of raw serial traffic."""
+import argparse
+import logging
+import mmap
+import struct
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from enum import IntEnum
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from kconsole.decoder import FrameDecoder
+
+logger = logging.getLogger(__name__)
+
+# File header: magic, version, flags, reserved and the start time.
+_MAGIC = b"KCAP"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBHd")
+# Record header: seconds since the start, direction and payload length.
+_RECORD = struct.Struct("<dBI")
+# Compressed block header: compressed and uncompressed length.
+_BLOCK = struct.Struct("<II")
+_COMPRESSED = 0x01
+
+
+class Direction(IntEnum):
+    """What a recorded chunk is."""
+
+    READ = 0
+    WRITTEN = 1
+    # A connection event, e.g. the port being opened, as text.
+    EVENT = 2
+
+
+@dataclass(frozen=True)
+class CaptureRecord:
+    """A chunk of serial traffic and when it was read or written."""
+
+    timestamp: float
+    direction: Direction
+    data: bytes
+
+
+class CaptureWriter:
+    """
+    Append serial traffic to a compact binary capture file.
+
+    The file starts with a header holding the start time, followed by
+    records of the seconds since the start, the direction and the bytes.
+    Compressed captures group the records in zlib blocks of about
+    block_size bytes. Writes are buffered, flush() writes out whatever is
+    pending; a capture cut short, e.g. by a crash, is readable up to the
+    last complete record or block.
+    """
+
+    def __init__(self, path: str, compressed: bool = False, block_size: int = 65536):
+        """
+        :param path: The capture file, created or truncated.
+        :param compressed: Compress the records in zlib blocks.
+        :param block_size: Uncompressed bytes buffered before a block is written.
+        """
+        self.path = path
+        self.compressed = compressed
+        self.block_size = block_size
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self._pending = bytearray()
+        self._file = open(path, "wb")
+        self._file.write(
+            _HEADER.pack(
+                _MAGIC, _VERSION, _COMPRESSED if compressed else 0, 0, self.started
+            )
+        )
+
+    def write(self, direction: Direction, data: bytes) -> None:
+        """
+        Record a chunk of traffic.
+
+        :param direction: Whether the data was read, written or is an event.
+        :param data: The bytes.
+        :return: None
+        """
+        self._pending += _RECORD.pack(
+            time.perf_counter() - self._clock, direction, len(data)
+        )
+        self._pending += data
+        if len(self._pending) >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the pending records to the file.
+
+        :return: None
+        """
+        if not self._pending:
+            return
+
+        if self.compressed:
+            block = zlib.compress(self._pending)
+            self._file.write(_BLOCK.pack(len(block), len(self._pending)))
+            self._file.write(block)
+        else:
+            self._file.write(self._pending)
+        self._pending.clear()
+        self._file.flush()
+
+    def close(self) -> None:
+        """
+        Write the pending records and close the file.
+
+        :return: None
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+class RecordingPort:
+    """
+    Stand in for a serial port towards KSync, recording what it writes.
+
+    KSync only needs write() and flush(), both are passed on to the port.
+    """
+
+    def __init__(self, serial_port: object, capture: CaptureWriter):
+        """
+        :param serial_port: The port written to.
+        :param capture: The capture recording the written data.
+        """
+        self.serial_port = serial_port
+        self.capture = capture
+
+    def write(self, data: bytes) -> int:
+        """
+        :param data: The bytes to write.
+        :return: The number of bytes written, -1 on error.
+        """
+        written = self.serial_port.write(data)
+        if written > 0:
+            self.capture.write(Direction.WRITTEN, bytes(data[:written]))
+        return written
+
+    def flush(self) -> bool:
+        return self.serial_port.flush()
+
+
+class CaptureReader:
+    """
+    Read a capture file through a memory map.
+
+    Uncompressed records are sliced straight out of the map, compressed
+    blocks are decompressed one at a time while iterating.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: The capture file.
+        :raises ValueError: If the file is not a capture.
+        """
+        self.path = path
+        with open(path, "rb") as capture_file:
+            self._map = mmap.mmap(capture_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a capture file.")
+        magic, version, flags, _, self.started = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {_VERSION} capture file.")
+        self.compressed = bool(flags & _COMPRESSED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def __iter__(self):
+        """
+        :return: An iterator of CaptureRecords in the order they were recorded.
+        """
+        if self.compressed:
+            return self._compressed_records()
+        return self._records(self._map, _HEADER.size)
+
+    @property
+    def closed(self) -> bool:
+        """
+        :return: True once the capture has been closed.
+        """
+        return self._map.closed
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _records(self, buffer, position: int):
+        """
+        Parse the records in a buffer.
+
+        Every record is copied out, no view of the map outlives a yield, so
+        the reader can be closed while a generator is suspended.
+
+        :param buffer: The records, possibly ending with a partial one.
+        :param position: The offset of the first record.
+        :return: A generator of CaptureRecords.
+        """
+        end = len(buffer)
+        while position + _RECORD.size <= end:
+            offset, direction, length = _RECORD.unpack_from(buffer, position)
+            position += _RECORD.size
+            if position + length > end:
+                logger.info("Capture %s ends with a partial record.", self.path)
+                return
+            yield CaptureRecord(
+                self.started + offset,
+                Direction(direction),
+                buffer[position : position + length],
+            )
+            position += length
+
+    def _compressed_records(self):
+        """
+        Decompress the blocks one at a time and parse their records.
+
+        :return: A generator of CaptureRecords.
+        """
+        position = _HEADER.size
+        end = len(self._map)
+        while position + _BLOCK.size <= end:
+            compressed_length, length = _BLOCK.unpack_from(self._map, position)
+            position += _BLOCK.size
+            if position + compressed_length > end:
+                logger.info("Capture %s ends with a partial block.", self.path)
+                return
+            block = zlib.decompress(
+                self._map[position : position + compressed_length], bufsize=length
+            )
+            position += compressed_length
+            yield from self._records(block, 0)
+
+
+class CaptureReplay(QObject):
+    """
+    Feed a capture back through the inbound path as if a radio sent it.
+
+    The bytes read are decoded by a FrameDecoder with their recorded time,
+    one chunk at a time as the serial worker would, and the frames emitted
+    for the frame store and models. A link drop in the capture discards the
+    partial frame like the worker does. The replay runs at the recorded
+    speed multiplied by speed, or as fast as possible if speed is 0, in
+    which case the event loop still runs every batch_size chunks.
+    """
+
+    frames_received = Signal(list)
+    # A dict with the chunks, bytes, frames and seconds taken.
+    finished = Signal(dict)
+
+    def __init__(
+        self, path: str, speed: float = 1.0, batch_size: int = 1000, parent=None
+    ):
+        """
+        :param path: The capture file.
+        :param speed: The playback speed, 1 for the recorded speed or 0 for
+        as fast as possible.
+        :param batch_size: Chunks replayed between returns to the event loop
+        when replaying as fast as possible.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        self.speed = speed
+        self.batch_size = batch_size
+        self.reader = CaptureReader(path)
+        self.decoder = FrameDecoder()
+        self.report = {"chunks": 0, "bytes": 0, "frames": 0, "seconds": 0.0}
+        self._records = iter(self.reader)
+        self._next = None
+        self._first = None
+        self._started = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._replay)
+
+    @Slot()
+    def start(self) -> None:
+        """
+        Start replaying.
+
+        :return: None
+        """
+        self._started = time.perf_counter()
+        self._timer.start(0)
+
+    @Slot()
+    def stop(self) -> None:
+        """
+        Stop replaying early, finished is still emitted.
+
+        :return: None
+        """
+        if self._started is not None and not self.reader.closed:
+            self._timer.stop()
+            self._finish()
+
+    def _replay(self) -> None:
+        """
+        Replay the chunks that are due and wait for the next one.
+
+        :return: None
+        """
+        for _ in range(self.batch_size):
+            record = self._next if self._next is not None else next(self._records, None)
+            self._next = None
+            if record is None:
+                self._finish()
+                return
+
+            if self.speed:
+                if self._first is None:
+                    self._first = record.timestamp
+                due = (record.timestamp - self._first) / self.speed
+                wait = due - (time.perf_counter() - self._started)
+                if wait > 0.001:
+                    self._next = record
+                    self._timer.start(int(wait * 1000))
+                    return
+
+            self._play(record)
+            # A receiver of frames_received may have stopped the replay.
+            if self.reader.closed:
+                return
+
+        self._timer.start(0)
+
+    def _play(self, record: CaptureRecord) -> None:
+        """
+        Replay a single chunk.
+
+        :param record: The recorded chunk.
+        :return: None
+        """
+        if record.direction == Direction.EVENT:
+            if record.data.startswith(b"closed"):
+                self.decoder.clear()
+            return
+        if record.direction != Direction.READ:
+            return
+
+        self.report["chunks"] += 1
+        self.report["bytes"] += len(record.data)
+        frames = self.decoder.feed(record.data, int(record.timestamp))
+        if frames:
+            self.report["frames"] += len(frames)
+            self.frames_received.emit(frames)
+
+    def _finish(self) -> None:
+        """
+        Close the capture and report.
+
+        :return: None
+        """
+        self.report["seconds"] = round(time.perf_counter() - self._started, 4)
+        self.reader.close()
+        logger.info("Replay finished: %s", self.report)
+        self.finished.emit(self.report)
+
+
+def _print_capture(path: str) -> int:
+    """
+    Print every record of a capture.
+
+    :param path: The capture file.
+    :return: The process exit code.
+    """
+    with CaptureReader(path) as reader:
+        for record in reader:
+            print(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.timestamp))
+                + f".{int(record.timestamp % 1 * 1000):03d}",
+                record.direction.name,
+                record.data,
+            )
+    return 0
+
+
+def _replay_capture(path: str, speed: float) -> int:
+    """
+    Replay a capture into the database, updating the radios table.
+
+    :param path: The capture file.
+    :param speed: The playback speed, 0 for as fast as possible.
+    :return: The process exit code.
+    """
+    from PySide6.QtCore import QCoreApplication, QThread
+    from PySide6.QtSql import QSqlDatabase
+
+    from kconsole.database import create_connection
+    from kconsole.models import RadiosModel
+    from kconsole.startup import configure_application
+    from kconsole.store import FrameStore
+
+    app = QCoreApplication(sys.argv[:1])
+    configure_application(app)
+    if not create_connection("KConsole.sqlite"):
+        print(f"Database Error: {QSqlDatabase.database().lastError().text()}")
+        return 1
+
+    radios = RadiosModel()
+    store_thread = QThread()
+    frame_store = FrameStore()
+    frame_store.moveToThread(store_thread)
+    store_thread.started.connect(frame_store.start)
+    store_thread.finished.connect(frame_store.stop)
+    store_thread.start()
+
+    replay = CaptureReplay(path, speed=speed)
+    replay.frames_received.connect(frame_store.add_frames)
+    replay.frames_received.connect(radios.record_frames)
+    replay.finished.connect(lambda report: print(report))
+    replay.finished.connect(app.quit)
+    replay.start()
+    app.exec()
+
+    store_thread.quit()
+    store_thread.wait()
+    return 0
+
+
+def main() -> None:
+    """
+    Print or replay a capture from the command line.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m kconsole.capture",
+        description="Print or replay a KConsole serial traffic capture.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show = subparsers.add_parser("show", help="Print every record.")
+    show.add_argument("capture")
+    replay = subparsers.add_parser(
+        "replay", help="Replay the received traffic into the database."
+    )
+    replay.add_argument("capture")
+    replay.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Playback speed, 1 for the recorded speed, 0 for as fast as possible.",
+    )
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if arguments.command == "show":
+        sys.exit(_print_capture(arguments.capture))
+    sys.exit(_replay_capture(arguments.capture, arguments.speed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,38 @@
 """Database connection operations."""
+import logging
 import pathlib
 
-from PySide6.QtWidgets import QMessageBox
 from PySide6.QtCore import QStandardPaths
 from PySide6.QtSql import QSqlDatabase, QSqlQuery
 
+logger = logging.getLogger(__name__)
+
+# Name Qt gives the connection created without an explicit name.
+DEFAULT_CONNECTION = "qt_sql_default_connection"
+
+# Applied to every connection. WAL lets the frame store write while the GUI
+# reads, NORMAL synchronous is durable in WAL mode apart from the last
+# transactions on power loss.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16384",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Prepared queries by (connection name, statement).
+_prepared_queries = {}
+
 
 def create_connection(database_name: str):
     """
     Create and open a database connection.
 
     :param database_name: The name of the SQLLite file to open as a DB.
-    :return: None
+    :return: True if the connection was opened, False if not. The error is
+    available from QSqlDatabase.database().lastError().
     """
     data_directory = pathlib.Path(
         QStandardPaths.standardLocations(
@@ -26,14 +47,82 @@ def create_connection(database_name: str):
     connection.setDatabaseName(str(db_path))
 
     if not connection.open():
-        QMessageBox.warning(
-            None,
-            "KConsole",
-            f"Database Error: {connection.lastError().text()}",
-        )
         return False
 
-    _create_radios_table()
+    configure_connection()
+    return migrate()
+
+
+def configure_connection(connection_name: str = DEFAULT_CONNECTION) -> None:
+    """
+    Apply the performance pragmas to an open connection.
+
+    :param connection_name: The name of the connection to configure.
+    :return: None
+    """
+    query = QSqlQuery(QSqlDatabase.database(connection_name, open=False))
+    for pragma in CONNECTION_PRAGMAS:
+        if not query.exec(pragma):
+            logger.info("%s failed: %s", pragma, query.lastError().text())
+
+
+def prepared_query(statement: str, connection_name: str = DEFAULT_CONNECTION):
+    """
+    A query prepared once per connection and reused for hot statements.
+
+    Values are bound by position with bindValue() before every exec().
+
+    :param statement: The SQL statement with positional placeholders.
+    :param connection_name: The connection to prepare the statement on.
+    :return: QSqlQuery
+    """
+    key = (connection_name, statement)
+    query = _prepared_queries.get(key)
+
+    if query is None:
+        query = QSqlQuery(QSqlDatabase.database(connection_name, open=False))
+        if not query.prepare(statement):
+            logger.info("Unable to prepare %s: %s", statement, query.lastError().text())
+        _prepared_queries[key] = query
+
+    return query
+
+
+def release_prepared_queries(connection_name: str = DEFAULT_CONNECTION) -> None:
+    """
+    Drop the prepared queries of a connection, before it is closed.
+
+    :param connection_name: The connection being closed.
+    :return: None
+    """
+    for key in [key for key in _prepared_queries if key[0] == connection_name]:
+        del _prepared_queries[key]
+
+
+def migrate() -> bool:
+    """
+    Bring the schema up to date. Every migration runs in its own transaction
+    and the number of applied migrations is tracked in PRAGMA user_version.
+
+    :return: True if successful, false if not.
+    """
+    database = QSqlDatabase.database()
+    query = QSqlQuery()
+    query.exec("PRAGMA user_version")
+    query.next()
+    version = query.value(0)
+    query.finish()
+
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info("Applying database migration %s: %s.", number, migration.__name__)
+        database.transaction()
+
+        if migration() and query.exec(f"PRAGMA user_version = {number}"):
+            database.commit()
+        else:
+            database.rollback()
+            return False
+
     return True
 
 
@@ -70,8 +159,9 @@ def _create_radios_table() -> bool:
             name VARCHAR(40) NOT NULL,
             fleet_id INTEGER NOT NULL,
             device_id INTEGER NOT NULL,
-            last_contact VARCHAR(40),
-            last_coordinates VARCHAR(40)
+            last_contact INTEGER,
+            latitude REAL,
+            longitude REAL
         )
         """
     )
@@ -79,5 +169,240 @@ def _create_radios_table() -> bool:
     if query_result:
         return query_result
     else:
-        print(create_table_query.lastError())
+        logger.error(
+            "Unable to create the radios table: %s",
+            create_table_query.lastError().text(),
+        )
         return query_result
+
+
+def _create_radios_indexes() -> bool:
+    """
+    Index the radios table for position, staleness and fleet/device lookups.
+
+    :return: True if successful, false if not.
+    """
+    return _remove_duplicate_radios() and _exec_statements(
+        "CREATE INDEX IF NOT EXISTS radios_last_contact ON radios (last_contact)",
+        "CREATE INDEX IF NOT EXISTS radios_position ON radios (latitude, longitude)",
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS radios_fleet_device
+        ON radios (fleet_id, device_id)
+        """,
+    )
+
+
+def _remove_duplicate_radios() -> bool:
+    """
+    Merge radios sharing a fleet and device ID so the unique index can be
+    created. The first radio added is kept, with the most recent contact and
+    position of its duplicates, and every removed radio is logged.
+
+    :return: True if successful, false if not.
+    """
+    query = QSqlQuery()
+    if not query.exec(
+        """
+        SELECT id, name, fleet_id, device_id FROM radios WHERE id NOT IN (
+            SELECT MIN(id) FROM radios GROUP BY fleet_id, device_id
+        )
+        """
+    ):
+        logger.error("Unable to find duplicate radios: %s", query.lastError().text())
+        return False
+
+    removed = []
+    while query.next():
+        removed.append(tuple(query.value(column) for column in range(4)))
+    query.finish()
+    if not removed:
+        return True
+
+    for radio in removed:
+        logger.warning("Removing duplicate radio %s %r, fleet %s device %s.", *radio)
+
+    if not _exec_statements(
+        # Keep the latest contact, whichever duplicate it was recorded on.
+        """
+        UPDATE radios SET (last_contact, latitude, longitude) = (
+            SELECT newest.last_contact, newest.latitude, newest.longitude
+            FROM radios AS newest
+            WHERE newest.fleet_id = radios.fleet_id
+            AND newest.device_id = radios.device_id
+            ORDER BY newest.last_contact DESC LIMIT 1
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM radios GROUP BY fleet_id, device_id
+            HAVING COUNT(*) > 1
+        )
+        """,
+        """
+        DELETE FROM radios WHERE id NOT IN (
+            SELECT MIN(id) FROM radios GROUP BY fleet_id, device_id
+        )
+        """,
+    ):
+        return False
+
+    logger.warning(
+        "Merged %s duplicate radios into the first radio with their IDs.",
+        len(removed),
+    )
+    return True
+
+
+def _migrate_radios_positions() -> bool:
+    """
+    Convert the old free-form last_contact/last_coordinates strings of the
+    radios table to an epoch timestamp and numeric latitude/longitude columns.
+    If the table already uses the numeric columns no action is taken.
+
+    :return: True if successful, false if not.
+    """
+    if "last_coordinates" not in _table_columns("radios"):
+        return True
+
+    # SQLite can not change a column type in place, so the table is rebuilt.
+    return _exec_statements(
+        """
+        CREATE TABLE radios_migrated (
+            id INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE NOT NULL,
+            name VARCHAR(40) NOT NULL,
+            fleet_id INTEGER NOT NULL,
+            device_id INTEGER NOT NULL,
+            last_contact INTEGER,
+            latitude REAL,
+            longitude REAL
+        )
+        """,
+        """
+        INSERT INTO radios_migrated
+            (id, name, fleet_id, device_id, last_contact, latitude, longitude)
+        SELECT
+            id,
+            name,
+            fleet_id,
+            device_id,
+            CAST(strftime('%s', last_contact) AS INTEGER),
+            CASE WHEN instr(last_coordinates, ',') > 0 THEN CAST(
+                substr(last_coordinates, 1, instr(last_coordinates, ',') - 1)
+                AS REAL
+            ) END,
+            CASE WHEN instr(last_coordinates, ',') > 0 THEN CAST(
+                substr(last_coordinates, instr(last_coordinates, ',') + 1)
+                AS REAL
+            ) END
+        FROM radios
+        """,
+        "DROP TABLE radios",
+        "ALTER TABLE radios_migrated RENAME TO radios",
+    )
+
+
+def _add_radios_poll_priority() -> bool:
+    """
+    Add the operator set poll priority of each radio, 0 disables adaptive
+    polling of a radio and higher values poll it more often.
+
+    :return: True if successful, false if not.
+    """
+    if "poll_priority" in _table_columns("radios"):
+        return True
+
+    return _exec_statements(
+        "ALTER TABLE radios ADD COLUMN poll_priority INTEGER NOT NULL DEFAULT 1"
+    )
+
+
+def _create_messages_table() -> bool:
+    """
+    Create the table holding text messages received from radios.
+
+    :return: True if successful, false if not.
+    """
+    return _exec_statements(
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE NOT NULL,
+            fleet_id INTEGER NOT NULL,
+            device_id INTEGER NOT NULL,
+            received INTEGER NOT NULL,
+            message TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS messages_device_received
+        ON messages (fleet_id, device_id, received)
+        """,
+    )
+
+
+def _create_positions_table() -> bool:
+    """
+    Create the table holding GNSS position fixes received from radios.
+
+    :return: True if successful, false if not.
+    """
+    return _exec_statements(
+        """
+        CREATE TABLE IF NOT EXISTS positions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE NOT NULL,
+            fleet_id INTEGER NOT NULL,
+            device_id INTEGER NOT NULL,
+            received INTEGER NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS positions_device_received
+        ON positions (fleet_id, device_id, received)
+        """,
+    )
+
+
+def _table_columns(table: str) -> set:
+    """
+    The column names of a table.
+
+    :param table: The table name.
+    :return: A set of column names, empty if the table does not exist.
+    """
+    query = QSqlQuery()
+    query.exec(f"PRAGMA table_info({table})")
+    columns = set()
+    while query.next():
+        columns.add(query.value("name"))
+
+    return columns
+
+
+def _exec_statements(*statements: str) -> bool:
+    """
+    Execute schema statements in order, stopping at the first failure.
+
+    :param statements: The SQL statements to execute.
+    :return: True if successful, false if not.
+    """
+    query = QSqlQuery()
+    for statement in statements:
+        if not query.exec(statement):
+            logger.error(
+                "Schema statement failed: %s\n%s", query.lastError().text(), statement
+            )
+            return False
+
+    return True
+
+
+# Schema migrations in order, append new ones to the end and never reorder.
+# Databases created before versioning (user_version 0) run all of them, so
+# each one must also succeed on a schema it already describes.
+MIGRATIONS = (
+    _create_radios_table,
+    _migrate_radios_positions,
+    _create_radios_indexes,
+    _create_messages_table,
+    _create_positions_table,
+    _add_radios_poll_priority,
+)
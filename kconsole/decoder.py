@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides an incremental decoder for FleetSync serial traffic."""
+import logging
+import time
+from dataclasses import dataclass, field
+
+from ksync import KMessage
+
+logger = logging.getLogger(__name__)
+
+# ASCII control characters framing FleetSync data.
+STX = 0x02
+ETX = 0x03
+_NMEA_START = ord("$")
+_LINE_ENDINGS = b"\r\n"
+# Frame starts that abandon an unterminated frame, meaning its terminator
+# was lost. A text message may contain a plain "$", so inside STX frames
+# only a position sentence counts.
+_STX_RESTARTS = (bytes([STX]), b"$PK")
+_NMEA_RESTARTS = (bytes([STX]), b"$")
+
+# Text length codes as used by KSync, 'F' short and 'G' long/extra-long.
+_TEXT_CODES = ("F", "G")
+
+
+def _now() -> int:
+    """
+    The current time as integer seconds since the epoch.
+
+    :return: int
+    """
+    return int(time.time())
+
+
+@dataclass(frozen=True)
+class Frame:
+    """A single complete frame received from the gateway radio."""
+
+    raw: bytes
+    timestamp: int = field(default_factory=_now, compare=False)
+
+    def __str__(self) -> str:
+        return self.raw.decode("utf-8", errors="replace")
+
+
+@dataclass(frozen=True)
+class TextFrame(Frame):
+    """A text message sent by a radio."""
+
+    fleet_id: int = 0
+    device_id: int = 0
+    message: str = ""
+
+    def __str__(self) -> str:
+        return f"Text from {self.fleet_id}-{self.device_id}: {self.message}"
+
+
+@dataclass(frozen=True)
+class PositionFrame(Frame):
+    """A GNSS (NMEA) position reply sent by a radio."""
+
+    fleet_id: int = 0
+    device_id: int = 0
+    latitude: float = 0.0
+    longitude: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Position from {self.fleet_id}-{self.device_id}: "
+            f"{self.latitude:.5f}, {self.longitude:.5f}"
+        )
+
+
+@dataclass(frozen=True)
+class StatusFrame(Frame):
+    """An identification or acknowledgement frame."""
+
+    fleet_id: int = 0
+    device_id: int = 0
+    ack: bool = False
+
+    def __str__(self) -> str:
+        if self.ack:
+            return "Acknowledgement received."
+        return f"Identification from {self.fleet_id}-{self.device_id}"
+
+
+class FrameDecoder:
+    """
+    Incrementally split a serial byte stream into typed frames.
+
+    Data is appended to a single reusable buffer, complete frames are cut out
+    of it and only the trailing partial frame is kept for the next call to
+    feed(). A frame start arriving before the terminator of the current
+    frame drops the current frame as noise and decoding resumes there. Bytes are only decoded to text once a frame is complete, so split
+    multibyte characters are never decoded on their own.
+    """
+
+    def __init__(self, max_buffer: int = 65536):
+        """
+        :param max_buffer: The largest partial frame to hold before the buffer
+        is considered garbage and discarded.
+        """
+        self.max_buffer = max_buffer
+        # The number of unframed bytes skipped so far, a sign of line noise
+        # or wrong line parameters.
+        self.skipped = 0
+        self._buffer = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def clear(self) -> None:
+        """
+        Discard any partially received data.
+
+        :return: None
+        """
+        self._buffer.clear()
+
+    def feed(self, data: bytes, timestamp: int = None) -> list:
+        """
+        Add received data to the buffer and return every complete frame.
+
+        :param data: The bytes read from the serial port.
+        :param timestamp: The time the data was received in seconds since the
+        epoch, now if None, e.g. to replay a capture.
+        :return: A list of Frame objects, possibly empty.
+        """
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        position = 0
+        length = len(buffer)
+
+        with memoryview(buffer) as view:
+            while position < length:
+                start_byte = buffer[position]
+
+                if start_byte == STX:
+                    end = buffer.find(ETX, position + 1)
+                    restart = self._find_restart(position, end, _STX_RESTARTS)
+                    if restart != -1:
+                        position = self._drop_partial(position, restart)
+                        continue
+                    if end == -1:
+                        break
+                    payload = bytes(view[position + 1 : end])
+                    position = end + 1
+
+                elif start_byte == _NMEA_START:
+                    end = buffer.find(b"\n", position)
+                    restart = self._find_restart(position, end, _NMEA_RESTARTS)
+                    if restart != -1:
+                        position = self._drop_partial(position, restart)
+                        continue
+                    if end == -1:
+                        break
+                    payload = bytes(view[position:end])
+                    position = end + 1
+
+                elif start_byte in _LINE_ENDINGS:
+                    position += 1
+                    continue
+
+                else:
+                    position = self._skip_garbage(position)
+                    continue
+
+                frames.append(self._parse(payload.strip(), timestamp))
+
+        del buffer[:position]
+
+        if len(buffer) > self.max_buffer:
+            logger.info("Discarding %s bytes of unterminated serial data.", len(buffer))
+            buffer.clear()
+
+        return frames
+
+    def _find_restart(self, position: int, end: int, restarts: tuple) -> int:
+        """
+        Look for another frame start inside a frame.
+
+        :param position: The offset of the frame start.
+        :param end: The offset of its terminator, -1 if not received yet.
+        :param restarts: The byte strings that start a new frame.
+        :return: The offset of the first new frame start before the
+        terminator, -1 if there is none.
+        """
+        stop = len(self._buffer) if end == -1 else end
+        offsets = [
+            offset
+            for offset in (
+                self._buffer.find(restart, position + 1, stop) for restart in restarts
+            )
+            if offset != -1
+        ]
+        return min(offsets, default=-1)
+
+    def _drop_partial(self, position: int, restart: int) -> int:
+        """
+        Drop a frame whose terminator was lost.
+
+        :param position: The offset of the frame start.
+        :param restart: The offset of the next frame start.
+        :return: The offset to continue decoding at.
+        """
+        self.skipped += restart - position
+        logger.debug(
+            "Dropping unterminated frame: %s", bytes(self._buffer[position:restart])
+        )
+        return restart
+
+    def _skip_garbage(self, position: int) -> int:
+        """
+        Find the start of the next frame after unframed data.
+
+        :param position: The offset of the first unframed byte.
+        :return: The offset of the next possible frame start.
+        """
+        candidates = [
+            offset
+            for offset in (
+                self._buffer.find(STX, position),
+                self._buffer.find(_NMEA_START, position),
+            )
+            if offset != -1
+        ]
+        next_start = min(candidates) if candidates else len(self._buffer)
+        self.skipped += next_start - position
+        logger.debug(
+            "Skipping unframed serial data: %s",
+            bytes(self._buffer[position:next_start]),
+        )
+        return next_start
+
+    @staticmethod
+    def _parse(payload: bytes, timestamp: int = None) -> Frame:
+        """
+        Turn a complete frame payload into a typed frame.
+
+        :param payload: The frame contents without STX/ETX or line endings.
+        :param timestamp: The time the frame was received, now if None.
+        :return: A Frame subclass, or a plain Frame if the type is unknown.
+        """
+        if timestamp is None:
+            timestamp = _now()
+
+        try:
+            if payload.startswith(b"$PK"):
+                nmea = KMessage(payload).nmea_message
+                return PositionFrame(
+                    raw=payload,
+                    timestamp=timestamp,
+                    fleet_id=int(nmea.fleetId),
+                    device_id=int(nmea.deviceId),
+                    latitude=float(nmea.lat),
+                    longitude=float(nmea.lon),
+                )
+
+            text = payload.decode("utf-8", errors="replace")
+
+            if text[:1] in _TEXT_CODES:
+                return TextFrame(
+                    raw=payload,
+                    timestamp=timestamp,
+                    fleet_id=int(text[1:4]),
+                    device_id=int(text[4:8]),
+                    message=text[8:],
+                )
+
+            if text[:1] in ("D", "I", "0"):
+                message = KMessage(bytes([STX]) + payload + bytes([ETX]))
+                return StatusFrame(
+                    raw=payload,
+                    timestamp=timestamp,
+                    fleet_id=message.fleet_id,
+                    device_id=message.device_id,
+                    ack=message.ack,
+                )
+
+        except Exception as error:  # KMessage raises bare Exceptions.
+            logger.info("Unable to parse frame %s: %s", payload, error)
+
+        return Frame(raw=payload, timestamp=timestamp)
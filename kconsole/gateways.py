@@ -0,0 +1,494 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the gateway manager serving several serial ports."""
+import itertools
+import logging
+import os
+import re
+import time
+
+from PySide6.QtCore import QObject, QSettings, Qt, QThread, Signal, Slot
+
+from kconsole.airtime import duty_cycle_share
+from kconsole.outbound import Priority
+from kconsole.settings import port_settings
+from kconsole.store import FrameStore
+from kconsole.worker import SerialWorker
+
+logger = logging.getLogger(__name__)
+
+
+class Gateway(QObject):
+    """
+    One gateway radio: a serial port and the worker thread serving it.
+
+    The gateway lives in the GUI thread and talks to its SerialWorker through
+    queued signals, keeping the last queue depth and airtime budget reported
+    by the worker.
+    """
+
+    # Requests for the serial worker, these are queued across threads.
+    send_text_requested = Signal(str, object, object, bool, int)
+    poll_gnss_requested = Signal(object, object)
+    reconnect_requested = Signal()
+    reconfigure_requested = Signal(str, dict)
+    release_requested = Signal()
+
+    frames_received = Signal(list)
+    port_error = Signal(str)
+    send_failed = Signal(str)
+    poll_sent = Signal(object, object, bool)
+    status_changed = Signal()
+
+    def __init__(
+        self,
+        port_name: str,
+        settings: dict,
+        fleets: set = frozenset(),
+        duty_cycle: float = 1.0,
+        duty_cycle_window: float = 3600.0,
+        capture_path: str = None,
+        compress_capture: bool = False,
+        parent=None,
+    ):
+        """
+        :param port_name: The name of the serial port to open.
+        :param settings: The program settings holding the QSerialPort enums.
+        :param fleets: The fleet IDs routed to this gateway, empty for any.
+        :param duty_cycle: The share of the window that may be spent transmitting.
+        :param duty_cycle_window: The duty-cycle window in seconds.
+        :param capture_path: A file to record the traffic to, None to not record.
+        :param compress_capture: Compress the capture file.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        self.port_name = port_name
+        self.fleets = fleets
+        self.queue_depth = 0
+        # Whether the port is plugged in, as far as the PortRegistry knows.
+        self.port_present = True
+        self.airtime_remaining = 0.0
+        self.airtime_budget = 0.0
+
+        self.thread = QThread(self)
+        self.worker = SerialWorker(
+            port_name,
+            settings,
+            duty_cycle=duty_cycle,
+            duty_cycle_window=duty_cycle_window,
+            capture_path=capture_path,
+            compress_capture=compress_capture,
+        )
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.open_serial_port)
+        # Emitted from the worker thread once its event loop has stopped.
+        self.thread.finished.connect(self.worker.close_serial_port)
+        self.thread.finished.connect(self.worker.deleteLater)
+
+        self.send_text_requested.connect(self.worker.send_text)
+        self.poll_gnss_requested.connect(self.worker.poll_gnss)
+        self.reconnect_requested.connect(self.worker.reconnect)
+        self.reconfigure_requested.connect(self.worker.reconfigure)
+        # Blocks until the port is closed, so it can be opened straight away.
+        self.release_requested.connect(
+            self.worker.release, Qt.ConnectionType.BlockingQueuedConnection
+        )
+        self.worker.frames_received.connect(self.frames_received)
+        self.worker.send_failed.connect(self.send_failed)
+        self.worker.poll_sent.connect(self.poll_sent)
+        self.worker.port_error.connect(self._report_port_error)
+        self.worker.queue_depth_changed.connect(self._set_queue_depth)
+        self.worker.airtime_changed.connect(self._set_airtime)
+
+    def start(self) -> None:
+        """
+        Start the worker thread, which opens the serial port.
+
+        :return: None
+        """
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the worker thread, closing the serial port.
+
+        :return: None
+        """
+        self.thread.quit()
+        self.thread.wait()
+
+    @Slot(str)
+    def _report_port_error(self, error: str) -> None:
+        self.port_error.emit(f"{self.port_name}: {error}")
+
+    @Slot(int)
+    def _set_queue_depth(self, depth: int) -> None:
+        self.queue_depth = depth
+        self.status_changed.emit()
+
+    @Slot(float, float)
+    def _set_airtime(self, remaining: float, budget: float) -> None:
+        self.airtime_remaining = remaining
+        self.airtime_budget = budget
+        self.status_changed.emit()
+
+
+class GatewayManager(QObject):
+    """
+    Serve several gateway radios, each on its own serial port and thread.
+
+    Every gateway has its own port settings, KSync and decoder. Commands are
+    routed to the gateway serving the fleet of the addressed radio, commands
+    for other fleets are spread round-robin over the gateways not dedicated
+    to a fleet. Broadcasts go out on every gateway. Frames received by any
+    gateway are merged into one stream and a single FrameStore, which runs
+    in its own thread.
+
+    The gateways are listed in the "gateways" setting, each port keeping its
+    settings and an optional comma separated "fleets" list in its own
+    QSettings group. Without a list the "default_port" is the only gateway.
+    Both are edited in the settings dialog and applied by reload_settings().
+
+    With a capture directory the traffic of every gateway is recorded to a
+    file of its own there, named after the port and the time it started.
+    """
+
+    frames_received = Signal(list)
+    port_error = Signal(str)
+    port_lost = Signal(str)
+    port_restored = Signal(str)
+    send_failed = Signal(str)
+    # (fleet_id, device_id, sent) once a GNSS poll left a gateway's queue.
+    poll_sent = Signal(object, object, bool)
+    queue_depth_changed = Signal(int)
+    airtime_changed = Signal(float, float)
+
+    def __init__(
+        self, parent=None, capture_directory: str = None, compress_capture=False
+    ):
+        """
+        :param parent: parent object.
+        :param capture_directory: The directory to record traffic to, None to
+        not record.
+        :param compress_capture: Compress the capture files.
+        """
+        super().__init__(parent)
+        self.saved_settings = QSettings()
+        self.capture_directory = capture_directory
+        self.compress_capture = compress_capture
+        self.gateways = []
+        # Fleet ID -> the gateway dedicated to it.
+        self._fleet_gateways = {}
+        self._round_robin = iter(())
+        self.store_thread = None
+        self.frame_store = None
+        self.port_registry = None
+
+    def __len__(self) -> int:
+        return len(self.gateways)
+
+    def profiles(self) -> list:
+        """
+        The configured gateways.
+
+        :return: A list of (port_name, fleets) tuples, fleets being a set.
+        """
+        port_names = self.saved_settings.value("gateways", [], type=list)
+        if not port_names and self.saved_settings.value("default_port"):
+            port_names = [self.saved_settings.value("default_port")]
+
+        profiles = []
+        for port_name in port_names:
+            fleets = self.saved_settings.value(f"{port_name}/fleets", "")
+            if isinstance(fleets, list):
+                fleets = ",".join(fleets)
+            profiles.append(
+                (port_name, {int(fleet) for fleet in fleets.split(",") if fleet})
+            )
+
+        return profiles
+
+    def start(self) -> None:
+        """
+        Start the frame store and open every configured gateway.
+
+        :return: None
+        """
+        self.store_thread = QThread(self)
+        self.frame_store = FrameStore()
+        self.frame_store.moveToThread(self.store_thread)
+        self.store_thread.started.connect(self.frame_store.start)
+        self.store_thread.finished.connect(self.frame_store.stop)
+        self.store_thread.finished.connect(self.frame_store.deleteLater)
+        self.frames_received.connect(self.frame_store.add_frames)
+        self.store_thread.start()
+
+        for port_name, fleets in self.profiles():
+            self._start_gateway(port_name, fleets)
+
+        self._route_fleets()
+
+    @Slot()
+    def reload_settings(self) -> None:
+        """
+        Apply changed gateways, port settings and fleet assignments.
+
+        Running gateways keep serving the ports still configured, with their
+        new settings and fleets. The remaining ports are given to the
+        remaining gateways in order, so a changed default port moves the
+        single gateway to the new port. Ports left over are opened as new
+        gateways and gateways left over are closed.
+
+        :return: None
+        """
+        profiles = self.profiles()
+        running = {gateway.port_name: gateway for gateway in self.gateways}
+        kept = [
+            (running.pop(port_name, None), port_name, fleets)
+            for port_name, fleets in profiles
+        ]
+        # The gateways whose port is no longer configured, in order.
+        spare = list(running.values())
+
+        gateways = []
+        for gateway, port_name, fleets in kept:
+            if gateway is None and spare:
+                gateway = spare.pop(0)
+            if gateway is None:
+                gateways.append(self._start_gateway(port_name, fleets))
+                continue
+
+            gateway.reconfigure_requested.emit(
+                port_name, port_settings(port_name, self.saved_settings)
+            )
+            gateway.port_name = port_name
+            gateway.fleets = fleets
+            gateways.append(gateway)
+
+        for gateway in spare:
+            logger.info("Gateway %s removed.", gateway.port_name)
+            gateway.stop()
+            gateway.deleteLater()
+
+        self.gateways = gateways
+        self._route_fleets()
+        self._update_status()
+        if self.port_registry is not None:
+            self._check_ports()
+
+    def _start_gateway(self, port_name: str, fleets: set) -> Gateway:
+        """
+        Open a gateway and merge its traffic and status with the others.
+
+        :param port_name: The name of the serial port.
+        :param fleets: The fleet IDs routed to the gateway, empty for any.
+        :return: The started Gateway, also added to the gateways.
+        """
+        # Stored as a percentage, 100 never holds traffic back.
+        duty_cycle = duty_cycle_share(self.saved_settings.value("duty_cycle", 100))
+        duty_cycle_window = float(self.saved_settings.value("duty_cycle_window", 3600))
+
+        gateway = Gateway(
+            port_name,
+            port_settings(port_name, self.saved_settings),
+            fleets,
+            duty_cycle=duty_cycle,
+            duty_cycle_window=duty_cycle_window,
+            capture_path=self._capture_path(port_name),
+            compress_capture=self.compress_capture,
+            parent=self,
+        )
+        gateway.frames_received.connect(self.frames_received)
+        gateway.port_error.connect(self.port_error)
+        gateway.send_failed.connect(self.send_failed)
+        gateway.poll_sent.connect(self.poll_sent)
+        gateway.status_changed.connect(self._update_status)
+        self.gateways.append(gateway)
+        gateway.start()
+        logger.debug("Gateway %s started for fleets %s.", port_name, fleets)
+        return gateway
+
+    def _capture_path(self, port_name: str):
+        """
+        :param port_name: The name of the serial port recorded.
+        :return: A new capture file for the port, or None if not recording.
+        """
+        if not self.capture_directory:
+            return None
+
+        os.makedirs(self.capture_directory, exist_ok=True)
+        # e.g. /dev/ttyUSB0 -> dev_ttyUSB0, COM3 -> COM3
+        name = re.sub(r"[^\w-]+", "_", port_name).strip("_") or "port"
+        return os.path.join(
+            self.capture_directory,
+            f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.kcap",
+        )
+
+    def _route_fleets(self) -> None:
+        """
+        Map the fleets to their dedicated gateways and the rest round-robin.
+
+        :return: None
+        """
+        self._fleet_gateways = {}
+        for gateway in self.gateways:
+            for fleet in gateway.fleets:
+                if fleet in self._fleet_gateways:
+                    logger.info("Fleet %s is assigned to several gateways.", fleet)
+                self._fleet_gateways.setdefault(fleet, gateway)
+
+        shared = [gateway for gateway in self.gateways if not gateway.fleets]
+        self._round_robin = itertools.cycle(shared or self.gateways)
+
+    def stop(self) -> None:
+        """
+        Close every gateway, then flush and close the frame store.
+
+        :return: None
+        """
+        for gateway in self.gateways:
+            gateway.stop()
+
+        if self.store_thread is not None:
+            self.store_thread.quit()
+            self.store_thread.wait()
+
+    def watch_ports(self, port_registry: object) -> None:
+        """
+        Report gateway ports that are unplugged or plugged back in.
+
+        :param port_registry: The PortRegistry to follow.
+        :return: None
+        """
+        self.port_registry = port_registry
+        port_registry.updated.connect(self._check_ports)
+        if port_registry.scanned:
+            self._check_ports()
+
+    @Slot(str)
+    def release_port(self, port_name: str) -> None:
+        """
+        Close a gateway port for another user, holding its commands.
+
+        :param port_name: The name of the serial port.
+        :return: None
+        """
+        for gateway in self.gateways:
+            if gateway.port_name == port_name:
+                gateway.release_requested.emit()
+
+    @Slot(str)
+    def reopen_port(self, port_name: str) -> None:
+        """
+        Reopen a released gateway port, sending the held commands.
+
+        :param port_name: The name of the serial port.
+        :return: None
+        """
+        for gateway in self.gateways:
+            if gateway.port_name == port_name:
+                gateway.reconnect_requested.emit()
+
+    def gateway_for(self, fleet_id: int) -> Gateway:
+        """
+        The gateway to send a command for a fleet through.
+
+        :param fleet_id: The fleet ID of the addressed radio.
+        :return: A Gateway, or None if there are no gateways.
+        """
+        gateway = self._fleet_gateways.get(int(fleet_id))
+        if gateway is None:
+            gateway = next(self._round_robin, None)
+
+        return gateway
+
+    @Slot(str, object, object, bool, int)
+    def send_text(
+        self,
+        message: str,
+        fleet_id: int,
+        device_id: int,
+        broadcast: bool,
+        priority: int = Priority.ROUTINE,
+    ) -> None:
+        """
+        Route a text message, broadcasts go out on every gateway.
+
+        :param message: The text of the message to be sent.
+        :param fleet_id: The fleet ID of the receiving device.
+        :param device_id: The device ID of the receiving device.
+        :param broadcast: Send the message to every device.
+        :param priority: The Priority of the message.
+        :return: None
+        """
+        if broadcast:
+            gateways = self.gateways
+        else:
+            gateways = [self.gateway_for(fleet_id)]
+
+        for gateway in gateways:
+            if gateway is None:
+                self.send_failed.emit("Unable to send text: no gateway configured.")
+                continue
+            gateway.send_text_requested.emit(
+                message, fleet_id, device_id, broadcast, priority
+            )
+
+    @Slot(object, object)
+    def poll_gnss(self, fleet_id: int, device_id: int) -> None:
+        """
+        Route a position request.
+
+        :param fleet_id: The fleet ID of the device to poll.
+        :param device_id: The device ID of the device to poll.
+        :return: None
+        """
+        gateway = self.gateway_for(fleet_id)
+        if gateway is None:
+            self.send_failed.emit("Unable to poll gnss: no gateway configured.")
+            self.poll_sent.emit(fleet_id, device_id, False)
+            return
+
+        gateway.poll_gnss_requested.emit(fleet_id, device_id)
+
+    @Slot()
+    def _check_ports(self) -> None:
+        """
+        Compare the gateway ports with the ports present.
+
+        :return: None
+        """
+        for gateway in self.gateways:
+            present = self.port_registry.contains(gateway.port_name)
+            if present == gateway.port_present:
+                continue
+
+            gateway.port_present = present
+            if present:
+                logger.info("Gateway port %s is back.", gateway.port_name)
+                gateway.reconnect_requested.emit()
+                self.port_restored.emit(gateway.port_name)
+            else:
+                logger.info("Gateway port %s disappeared.", gateway.port_name)
+                self.port_lost.emit(gateway.port_name)
+
+    @Slot()
+    def _update_status(self) -> None:
+        """
+        Publish the total queue depth and the most constrained airtime budget.
+
+        :return: None
+        """
+        self.queue_depth_changed.emit(
+            sum(gateway.queue_depth for gateway in self.gateways)
+        )
+
+        budgets = [
+            (gateway.airtime_remaining, gateway.airtime_budget)
+            for gateway in self.gateways
+            if gateway.airtime_budget
+        ]
+        if budgets:
+            self.airtime_changed.emit(
+                *min(budgets, key=lambda budget: budget[0] / budget[1])
+            )
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the headless KConsole service."""
+import logging
+import os
+import signal
+import socket
+
+from PySide6.QtCore import QCoreApplication, QObject, QSettings, QTimer, Slot
+
+from kconsole.gateways import GatewayManager
+from kconsole.models import RadiosModel
+from kconsole.ports import PortRegistry
+from kconsole.scheduler import PollScheduler
+
+logger = logging.getLogger(__name__)
+
+
+def notify_systemd(state: str) -> bool:
+    """
+    Send a state change to systemd for Type=notify services.
+
+    :param state: The notification, READY=1 or STOPPING=1.
+    :return: True if systemd was notified, False if not running under it.
+    """
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+
+    if address.startswith("@"):
+        # An abstract namespace socket.
+        address = "\0" + address[1:]
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as notify_socket:
+            notify_socket.sendto(state.encode(), address)
+    except OSError as error:
+        logger.info("Unable to notify systemd: %s", error)
+        return False
+
+    return True
+
+
+class HeadlessConsole(QObject):
+    """
+    Run the gateways, frame handling and persistence without any window.
+
+    Received traffic is stored and the radios table updated exactly as in
+    the GUI, and with adaptive polling enabled in the settings the poll
+    scheduler keeps positions fresh. Only QtCore, QtSerialPort and QtSql are
+    loaded, QtWidgets and the compiled UI modules never are. SIGTERM and
+    SIGINT stop the service cleanly, flushing the frame store.
+    """
+
+    def __init__(self, parent=None, capture_directory=None, compress_capture=False):
+        """
+        :param parent: parent object.
+        :param capture_directory: The directory serial traffic is recorded
+        to, None to not record.
+        :param compress_capture: Compress the capture files.
+        """
+        super().__init__(parent)
+        self.saved_settings = QSettings()
+        self.radios = RadiosModel()
+        self.gateways = GatewayManager(self, capture_directory, compress_capture)
+        self.port_registry = PortRegistry(parent=self)
+        self.poll_scheduler = PollScheduler(
+            base_interval=float(self.saved_settings.value("poll_base_interval", 600)),
+            poll_interval=float(self.saved_settings.value("poll_interval", 5)),
+            parent=self,
+        )
+        # Python only runs signal handlers between bytecodes, so the event
+        # loop is woken up regularly to let them run.
+        self._signal_timer = QTimer(self)
+        self._signal_timer.setInterval(500)
+        self._signal_timer.timeout.connect(lambda: None)
+
+    def start(self) -> bool:
+        """
+        Open the gateways and start polling.
+
+        :return: True if at least one gateway is configured, False if not.
+        """
+        self.gateways.frames_received.connect(self.radios.record_frames)
+        self.gateways.frames_received.connect(self.poll_scheduler.handle_frames)
+        self.gateways.queue_depth_changed.connect(self.poll_scheduler.set_queue_depth)
+        self.gateways.port_error.connect(self._log_error)
+        self.gateways.send_failed.connect(self._log_error)
+        self.gateways.port_lost.connect(self._log_port_lost)
+        self.poll_scheduler.poll_requested.connect(self.gateways.poll_gnss)
+
+        self.gateways.start()
+        if not len(self.gateways):
+            logger.error("No serial port configured, run KConsole with a GUI first.")
+            return False
+
+        self.port_registry.start()
+        self.gateways.watch_ports(self.port_registry)
+        self.poll_scheduler.load()
+        if self.saved_settings.value("adaptive_polling", False, type=bool):
+            self.poll_scheduler.start()
+
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signal_number, self._handle_signal)
+        self._signal_timer.start()
+
+        logger.info("KConsole running headless on %s gateways.", len(self.gateways))
+        notify_systemd("READY=1")
+        return True
+
+    @Slot()
+    def stop(self) -> None:
+        """
+        Stop polling and close the gateways.
+
+        :return: None
+        """
+        notify_systemd("STOPPING=1")
+        self._signal_timer.stop()
+        self.poll_scheduler.stop()
+        self.gateways.stop()
+        self.port_registry.stop()
+        logger.info("KConsole stopped.")
+
+    def _handle_signal(self, signal_number: int, frame) -> None:
+        """
+        Quit the event loop on SIGTERM or SIGINT.
+
+        :param signal_number: The signal received.
+        :param frame: Unused.
+        :return: None
+        """
+        logger.info("Received signal %s, stopping.", signal_number)
+        QCoreApplication.quit()
+
+    @Slot(str)
+    def _log_error(self, message: str) -> None:
+        logger.error("%s", message)
+
+    @Slot(str)
+    def _log_port_lost(self, port_name: str) -> None:
+        logger.error("Gateway port %s disconnected.", port_name)
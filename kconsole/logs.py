@@ -1,6 +1,33 @@
 import logging
+import logging.handlers
+import pathlib
+import queue
+import sqlite3
+import time
+from collections import deque
 from functools import cached_property
-from PySide6.QtCore import QObject, Signal
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QObject, Qt, QTimer, Signal
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE_NAME = "kconsole.log"
+LOG_DATABASE_NAME = "kconsole-log.sqlite"
+
+_LOG_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY,
+        created REAL NOT NULL,
+        level INTEGER NOT NULL,
+        logger TEXT NOT NULL,
+        thread TEXT,
+        message TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS logs_created ON logs (created)",
+    "CREATE INDEX IF NOT EXISTS logs_level ON logs (level, created)",
+    "CREATE INDEX IF NOT EXISTS logs_logger ON logs (logger, created)",
+)
 
 
 class Bridge(QObject):
@@ -11,16 +38,44 @@ class Bridge(QObject):
     https://pointermath.wordpress.com/2013/05/29/python-pyside-logging-headache/
     And finally the sort of solution from here:
     https://stackoverflow.com/questions/66664542/conflicting-names-between-logging-emit-function-and-qt-emit-signal/66664679#66664679
+
+    The bridge also owns the timer flushing the buffered records, so it must
+    be created in the GUI thread.
     """
+
     sigLog = Signal(str)
 
+    def __init__(self, interval: int):
+        super().__init__()
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+
 
 class ConsoleWindowLogHandler(logging.Handler):
     """
-    Override the logging handler to emit a signal so this can be used in
-    a threaded app safely.
+    Buffer log records in a fixed size ring and hand them to the console in
+    batches, so this can be used in a threaded app safely.
+
+    Records from any thread are only appended to the ring, the oldest being
+    dropped once it is full. While the console is shown a timer in the GUI
+    thread formats whatever arrived and emits it as one block of text once
+    per frame. While it is hidden nothing is formatted at all, the ring just
+    keeps the latest records for when it is opened.
     """
 
+    def __init__(self, capacity: int = 5000, interval: int = 16):
+        """
+        :param capacity: The number of records kept, and the number of
+        lines the console should be limited to.
+        :param interval: Milliseconds between flushes, 16 is about one frame.
+        """
+        logging.Handler.__init__(self)
+        self.capacity = capacity
+        self.interval = interval
+        self.records = deque(maxlen=capacity)
+        # Records pushed out of the ring before they could be shown.
+        self.dropped = 0
+
     @cached_property
     def bridge(self) -> object:
         """
@@ -28,17 +83,462 @@ class ConsoleWindowLogHandler(logging.Handler):
 
         :return: Object
         """
-        return Bridge()
+        bridge = Bridge(self.interval)
+        bridge.timer.timeout.connect(self.publish)
+        return bridge
+
+    def emit(self, logRecord):
+        """
+        Override the log handler emit method to buffer the record.
+
+        :param logRecord:
+        :return:
+        """
+        if len(self.records) == self.capacity:
+            self.dropped += 1
+        self.records.append(logRecord)
+
+    def set_visible(self, visible: bool) -> None:
+        """
+        Start or stop flushing as the console is shown or hidden.
+
+        :param visible: True if the console is shown.
+        :return: None
+        """
+        if visible:
+            self.publish()
+            self.bridge.timer.start()
+        else:
+            self.bridge.timer.stop()
+
+    def publish(self) -> None:
+        """
+        Format the buffered records and emit them as one block of text, this
+        must run in the GUI thread.
+
+        :return: None
+        """
+        # Only as many as are there now, other threads may keep appending.
+        count = len(self.records)
+        if not count:
+            return
+
+        lines = []
+        if self.dropped:
+            lines.append(f"... {self.dropped} older messages dropped.")
+            self.dropped = 0
+
+        popleft = self.records.popleft
+        for _ in range(count):
+            record = popleft()
+            try:
+                lines.append(str(record.getMessage()))
+            except Exception:
+                self.handleError(record)
 
-    def __init__(self):
+        self.bridge.sigLog.emit("\n".join(lines))
+
+
+class SqliteLogHandler(logging.Handler):
+    """
+    Write records to an indexed SQLite table for later review.
+
+    Meant to run behind a LogListener: the connection is opened by the
+    first record, on the listener thread, and records are committed in
+    batches, whenever the listener runs out of records and at the latest
+    every commit_every records. Records older than the retention period
+    are deleted when the database is opened and every so often after.
+    """
+
+    def __init__(self, path: str, retention_days: float = 14, commit_every: int = 500):
+        """
+        :param path: The SQLite database file, created if missing.
+        :param retention_days: Days records are kept for, forever if 0.
+        :param commit_every: The most records written before a commit.
+        """
         logging.Handler.__init__(self)
+        self.path = str(path)
+        self.retention_days = retention_days
+        self.commit_every = commit_every
+        self.connection = None
+        self.pending = 0
+        self.written = 0
 
     def emit(self, logRecord):
         """
-        Override the log handler emit method to instead emit a signal.
+        Insert the record, committing if enough have been written.
 
         :param logRecord:
         :return:
         """
-        message = str(logRecord.getMessage())
-        self.bridge.sigLog.emit(message)
+        try:
+            if self.connection is None:
+                self._open()
+            self.connection.execute(
+                "INSERT INTO logs (created, level, logger, thread, message) VALUES (?, ?, ?, ?, ?)",
+                (
+                    logRecord.created,
+                    logRecord.levelno,
+                    logRecord.name,
+                    logRecord.threadName,
+                    self.format(logRecord),
+                ),
+            )
+            self.pending += 1
+            self.written += 1
+            if self.pending >= self.commit_every:
+                self.flush()
+            # Roughly once a day at a record per second.
+            if self.written % 100000 == 0:
+                self._prune()
+        except Exception:
+            self.handleError(logRecord)
+
+    def flush(self):
+        """
+        Commit the records written so far.
+
+        :return: None
+        """
+        if self.connection is not None and self.pending:
+            self.connection.commit()
+            self.pending = 0
+
+    def close(self):
+        """
+        Commit and close the database.
+
+        :return: None
+        """
+        self.acquire()
+        try:
+            self.flush()
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+        finally:
+            self.release()
+        logging.Handler.close(self)
+
+    def _open(self) -> None:
+        """
+        Open the database, creating the table and indexes if needed.
+
+        :return: None
+        """
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # Closed from whichever thread shuts logging down.
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _LOG_SCHEMA:
+            self.connection.execute(statement)
+        self._prune()
+
+    def _prune(self) -> None:
+        """
+        Delete the records older than the retention period.
+
+        :return: None
+        """
+        if self.retention_days:
+            self.connection.execute(
+                "DELETE FROM logs WHERE created < ?",
+                (time.time() - self.retention_days * 86400,),
+            )
+            self.connection.commit()
+            self.pending = 0
+
+
+class LogListener(logging.handlers.QueueListener):
+    """
+    A QueueListener that flushes its handlers whenever the queue runs dry,
+    so batched writes reach the disk as soon as the logging goes quiet.
+    """
+
+    def dequeue(self, block):
+        """
+        Take the next record, flushing the handlers before waiting for it.
+
+        :param block: Whether to wait for a record.
+        :return: The record.
+        """
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            if not block:
+                raise
+
+        for handler in self.handlers:
+            handler.acquire()
+            try:
+                handler.flush()
+            except Exception:
+                logger.exception("Unable to flush %s.", handler)
+            finally:
+                handler.release()
+        return self.queue.get()
+
+
+class LogPipeline:
+    """
+    Route the log records through a queue to a thread writing them out.
+
+    Logging calls only put the record on a queue, the handlers that write
+    to disk run on the listener thread: a size rotated log file, the
+    handlers that were on the root logger before, e.g. stderr, and
+    optionally an SQLite table that the logging console can search.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        database: bool = True,
+        retention_days: float = 14,
+    ):
+        """
+        :param directory: The directory holding the log file and database.
+        :param max_bytes: The size the log file is rotated at.
+        :param backup_count: The number of rotated log files kept.
+        :param database: Also write the records to an SQLite database.
+        :param retention_days: Days the database keeps records for.
+        """
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.file_path = directory / LOG_FILE_NAME
+        self.database_path = directory / LOG_DATABASE_NAME if database else None
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.retention_days = retention_days
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = logging.handlers.QueueHandler(self.queue)
+        self.listener = None
+
+    def start(self) -> None:
+        """
+        Move the root logger's handlers behind the queue and start writing.
+
+        :return: None
+        """
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        for handler in handlers:
+            root.removeHandler(handler)
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            self.file_path,
+            maxBytes=self.max_bytes,
+            backupCount=self.backup_count,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s"
+            )
+        )
+        handlers.append(file_handler)
+        if self.database_path is not None:
+            handlers.append(SqliteLogHandler(self.database_path, self.retention_days))
+
+        self.listener = LogListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        root.addHandler(self.queue_handler)
+        logger.debug("Logging to %s.", self.file_path)
+
+    def stop(self) -> None:
+        """
+        Write out the queued records and put the handlers back on the root
+        logger.
+
+        :return: None
+        """
+        if self.listener is None:
+            return
+
+        root = logging.getLogger()
+        root.removeHandler(self.queue_handler)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            if isinstance(
+                handler, (logging.handlers.RotatingFileHandler, SqliteLogHandler)
+            ):
+                handler.close()
+            else:
+                root.addHandler(handler)
+        self.listener = None
+
+
+def read_logs(
+    connection: sqlite3.Connection,
+    level: int = logging.NOTSET,
+    logger_name: str = "",
+    start: float = None,
+    end: float = None,
+    before: int = None,
+    limit: int = 500,
+) -> list:
+    """
+    Read a page of records, newest first.
+
+    :param connection: A connection to the log database.
+    :param level: The lowest level to include.
+    :param logger_name: Only include this logger and its children, any if empty.
+    :param start: Only include records from this time on, in seconds since the epoch.
+    :param end: Only include records before this time.
+    :param before: Only include records older than this record ID, for paging.
+    :param limit: The most records to return.
+    :return: A list of (id, created, level, logger, message) tuples.
+    """
+    conditions = ["level >= ?"]
+    values = [level]
+    if logger_name:
+        # A range rather than LIKE so the logger index is used.
+        conditions.append("(logger = ? OR (logger >= ? AND logger < ?))")
+        values += [logger_name, logger_name + ".", logger_name + "/"]
+    if start is not None:
+        conditions.append("created >= ?")
+        values.append(start)
+    if end is not None:
+        conditions.append("created < ?")
+        values.append(end)
+    if before is not None:
+        conditions.append("id < ?")
+        values.append(before)
+
+    return connection.execute(
+        "SELECT id, created, level, logger, message FROM logs WHERE "
+        + " AND ".join(conditions)
+        + " ORDER BY id DESC LIMIT ?",
+        (*values, limit),
+    ).fetchall()
+
+
+class LogHistoryModel(QAbstractTableModel):
+    """
+    The records in the log database, newest first, fetched a page at a time
+    as the view scrolls down.
+    """
+
+    COLUMNS = ("Time", "Level", "Logger", "Message")
+
+    def __init__(self, path: str, page_size: int = 500, parent=None):
+        """
+        :param path: The log database file.
+        :param page_size: The number of records fetched at a time.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        self.path = str(path)
+        self.page_size = page_size
+        self.connection = None
+        self.rows = []
+        self.filters = {}
+        self._exhausted = True
+
+    def set_filter(
+        self,
+        level: int = logging.NOTSET,
+        logger_name: str = "",
+        start: float = None,
+        end: float = None,
+    ) -> None:
+        """
+        Show the records matching the filter, starting with the newest page.
+
+        :param level: The lowest level to include.
+        :param logger_name: Only include this logger and its children, any if empty.
+        :param start: Only include records from this time on, in seconds since the epoch.
+        :param end: Only include records before this time.
+        :return: None
+        """
+        self.beginResetModel()
+        self.filters = {
+            "level": level,
+            "logger_name": logger_name,
+            "start": start,
+            "end": end,
+        }
+        self.rows = self._read_page()
+        self._exhausted = len(self.rows) < self.page_size
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (
+            Qt.ItemDataRole.DisplayRole,
+            Qt.ItemDataRole.ToolTipRole,
+        ):
+            return None
+
+        _, created, level, logger_name, message = self.rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return (
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+                + f".{int(created % 1 * 1000):03d}"
+            )
+        if column == 1:
+            return logging.getLevelName(level)
+        if column == 2:
+            return logger_name
+        return message
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ):
+        if (
+            orientation == Qt.Orientation.Horizontal
+            and role == Qt.ItemDataRole.DisplayRole
+        ):
+            return self.COLUMNS[section]
+        return None
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        """
+        Append the next page of older records.
+
+        :param parent: Unused, the model is a flat table.
+        :return: None
+        """
+        page = self._read_page(before=self.rows[-1][0] if self.rows else None)
+        self._exhausted = len(page) < self.page_size
+        if page:
+            self.beginInsertRows(
+                QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1
+            )
+            self.rows += page
+            self.endInsertRows()
+
+    def _read_page(self, before: int = None) -> list:
+        """
+        Read a page of records matching the filter.
+
+        :param before: Only read records older than this record ID.
+        :return: A list of (id, created, level, logger, message) tuples.
+        """
+        try:
+            if self.connection is None:
+                # Read only, the listener thread is the only writer.
+                self.connection = sqlite3.connect(
+                    pathlib.Path(self.path).as_uri() + "?mode=ro", uri=True
+                )
+            return read_logs(
+                self.connection, before=before, limit=self.page_size, **self.filters
+            )
+        except sqlite3.Error as error:
+            logger.info("Unable to read the log history: %s", error)
+            self.connection = None
+            return []
@@ -2,13 +2,19 @@
 # main.py
 
 """This module provides the KConsole application."""
+import argparse
 import logging
 import sys
 
-from PySide6.QtWidgets import QApplication
-from .database import create_connection
+from kconsole.startup import StartupTimer, configure_application
+
+# Created before Qt is imported so imports are part of the measurement.
+startup_timer = StartupTimer()
 
-from kconsole.views import Window
+from PySide6.QtCore import QCoreApplication, QSettings, QStandardPaths, QTimer
+from PySide6.QtSql import QSqlDatabase
+from .database import create_connection
+from .logs import LogPipeline
 
 # Configure root logger.
 logging.basicConfig(level=logging.DEBUG)
@@ -18,17 +24,191 @@ def main():
     """
     KConsole main function.
     """
+    arguments = parse_arguments()
+
+    if arguments.import_roster or arguments.export_roster:
+        sys.exit(run_roster_command(arguments))
+
+    if arguments.headless:
+        sys.exit(run_headless(arguments))
+
+    # QtWidgets and the views are only loaded when a window is wanted.
+    from PySide6.QtWidgets import QApplication, QMessageBox
+
+    from kconsole.views import Window
+
+    startup_timer.mark("imports")
+
     # Create the application
     app = QApplication(sys.argv)
+    configure_application(app)
     app.setApplicationDisplayName("KConsole")
-    app.setApplicationName("KConsole")
-    app.setOrganizationName("SARStats")
-    app.setOrganizationDomain("sarstats.com")
+    log_pipeline = start_logging()
     # Connect to the database before creating any window
     if not create_connection("KConsole.sqlite"):
+        QMessageBox.warning(
+            None,
+            "KConsole",
+            f"Database Error: {QSqlDatabase.database().lastError().text()}",
+        )
+        log_pipeline.stop()
         sys.exit(1)
+
+    startup_timer.mark("database")
+
     # Create the main window
-    win = Window()
+    win = Window(
+        log_database=log_pipeline.database_path,
+        capture_directory=arguments.capture,
+        compress_capture=arguments.compress_capture,
+    )
+    startup_timer.mark("window")
     win.show()
+
+    if arguments.measure_startup:
+        # Runs once the event loop has processed the first show and paint.
+        QTimer.singleShot(0, lambda: report_startup(arguments.measure_startup, app))
+
     # Run the event loop
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    log_pipeline.stop()
+    sys.exit(exit_code)
+
+
+def start_logging() -> LogPipeline:
+    """
+    Write the log records to a rotated file, and a database unless turned
+    off with the log_database setting, from a separate thread. The
+    application names must be set first, they locate the files.
+
+    :return: The running LogPipeline, to be stopped once the event loop ends.
+    """
+    saved_settings = QSettings()
+    log_pipeline = LogPipeline(
+        QStandardPaths.writableLocation(
+            QStandardPaths.StandardLocation.AppLocalDataLocation
+        )
+        + "/logs",
+        max_bytes=int(saved_settings.value("log_file_size", 10 * 1024 * 1024)),
+        backup_count=int(saved_settings.value("log_file_count", 5)),
+        database=saved_settings.value("log_database", True, type=bool),
+        retention_days=float(saved_settings.value("log_retention_days", 14)),
+    )
+    log_pipeline.start()
+    return log_pipeline
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse the command line.
+
+    :return: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(prog="kconsole", description="KConsole")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run the gateways and store traffic without a window, e.g. as a "
+        "systemd service.",
+    )
+    parser.add_argument(
+        "--measure-startup",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="Show the main window, append the startup times as a line of JSON "
+        "to FILE (standard output by default) and exit.",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="DIRECTORY",
+        help="Record the raw traffic of every serial port to a capture file in "
+        "DIRECTORY, replay it with python -m kconsole.capture.",
+    )
+    parser.add_argument(
+        "--compress-capture",
+        action="store_true",
+        help="Compress the capture files.",
+    )
+    roster = parser.add_mutually_exclusive_group()
+    roster.add_argument(
+        "--import-roster",
+        metavar="FILE",
+        help="Import radios from a CSV, JSON or JSON lines file and exit.",
+    )
+    roster.add_argument(
+        "--export-roster",
+        metavar="FILE",
+        help="Export radios to a CSV, JSON or JSON lines file and exit.",
+    )
+    # Qt consumes its own arguments from sys.argv.
+    arguments, _ = parser.parse_known_args()
+    return arguments
+
+
+def run_roster_command(arguments: argparse.Namespace) -> int:
+    """
+    Import or export the roster without opening a window.
+
+    :param arguments: The parsed command line.
+    :return: The process exit code.
+    """
+    from kconsole.roster import export_roster, import_roster
+
+    app = QCoreApplication(sys.argv)
+    configure_application(app)
+    if not create_connection("KConsole.sqlite"):
+        print(f"Database Error: {QSqlDatabase.database().lastError().text()}")
+        return 1
+
+    if arguments.import_roster:
+        report = import_roster(arguments.import_roster)
+        print(report)
+        return 1 if report.errors else 0
+
+    print(f"Exported {export_roster(arguments.export_roster)} radios.")
+    return 0
+
+
+def report_startup(destination: str, app: QCoreApplication) -> None:
+    """
+    Record the time to the first window and quit.
+
+    :param destination: A file to append the report to, or - for standard output.
+    :param app: The running application.
+    :return: None
+    """
+    startup_timer.mark("first_window")
+    startup_timer.write(destination)
+    app.quit()
+
+
+def run_headless(arguments: argparse.Namespace) -> int:
+    """
+    Run the gateways without loading QtWidgets until stopped by a signal.
+
+    :param arguments: The parsed command line.
+    :return: The process exit code.
+    """
+    from kconsole.headless import HeadlessConsole
+
+    app = QCoreApplication(sys.argv)
+    configure_application(app)
+    log_pipeline = start_logging()
+    try:
+        if not create_connection("KConsole.sqlite"):
+            print(f"Database Error: {QSqlDatabase.database().lastError().text()}")
+            return 1
+
+        console = HeadlessConsole(
+            capture_directory=arguments.capture,
+            compress_capture=arguments.compress_capture,
+        )
+        if not console.start():
+            console.stop()
+            return 1
+
+        app.aboutToQuit.connect(console.stop)
+        return app.exec()
+    finally:
+        log_pipeline.stop()
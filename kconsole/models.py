@@ -2,85 +2,689 @@
 # rpcontacts/model.py
 
 """This module provides a model to manage the radios table."""
+import datetime
 import logging
+import math
+import sys
+import time
+from array import array
 
-from PySide6.QtCore import Qt
-from PySide6.QtSql import QSqlTableModel
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtSql import QSqlDatabase, QSqlQuery
+
+from kconsole.database import prepared_query
+from kconsole.decoder import PositionFrame
 
 logger = logging.getLogger(__name__)
 
+# Columns of the radios table, in display order.
+_RADIO_COLUMNS = (
+    "id",
+    "name",
+    "fleet_id",
+    "device_id",
+    "last_contact",
+    "latitude",
+    "longitude",
+    "poll_priority",
+)
+
+_COLUMN_TITLES = {
+    "id": "ID",
+    "name": "Name",
+    "fleet_id": "Fleet ID",
+    "device_id": "Device ID",
+    "last_contact": "Last Contact",
+    "latitude": "Latitude",
+    "longitude": "Longitude",
+    "poll_priority": "Poll Priority",
+}
+
+# Columns the operator may edit in place.
+_EDITABLE_COLUMNS = ("name", "fleet_id", "device_id", "poll_priority")
+_INTEGER_COLUMNS = ("fleet_id", "device_id", "last_contact", "poll_priority")
+
+# Array type codes used to store each column, None for interned strings.
+_COLUMN_TYPES = {
+    "id": "q",
+    "name": None,
+    "fleet_id": "q",
+    "device_id": "q",
+    "last_contact": "q",
+    "latitude": "d",
+    "longitude": "d",
+    "poll_priority": "q",
+}
+
+# Poll priorities the operator may set, 0 excludes a radio from adaptive
+# polling. New radios get the column default.
+POLL_PRIORITIES = range(4)
+DEFAULT_POLL_PRIORITY = 1
+
+# Values standing in for NULL inside the arrays.
+_NULL_INTEGER = -(2**63)
+_NULL_REAL = math.nan
+
+
+def _to_storage(column: str, value):
+    """
+    Convert a value to what is stored in a column.
+
+    :param column: The column name.
+    :param value: The value, None for NULL.
+    :return: The stored value.
+    """
+    type_code = _COLUMN_TYPES[column]
+    if type_code is None:
+        return sys.intern(value) if isinstance(value, str) else value
+    if value is None:
+        return _NULL_INTEGER if type_code == "q" else _NULL_REAL
+    return value
+
+
+def _from_storage(value):
+    """
+    Convert a stored value back, turning the NULL stand-ins into None.
+
+    :param value: The stored value.
+    :return: The value, None for NULL.
+    """
+    if value == _NULL_INTEGER or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def _sort_key(value):
+    """
+    Sort key placing NULL values last regardless of type.
+
+    :param value: The stored value.
+    :return: A tuple usable as a sort key.
+    """
+    value = _from_storage(value)
+    return (value is None, value if value is not None else 0)
+
+
+class RadiosTableModel(QAbstractTableModel):
+    """
+    Table model holding the radios table in memory.
+
+    Each column is stored separately, numbers in compact arrays and names as
+    interned strings, which keeps the footprint of very large rosters small.
+    The table is read once by select(), after that every add, delete and
+    update is written to the DB and applied to the affected rows only, with
+    the matching fine-grained row signals, so views keep their scroll
+    position and selection. Sorting happens in memory without a query.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columns = self._empty_columns()
+        # Radio id -> row number, built on first use and then kept up to date.
+        self._row_numbers = None
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(_RADIO_COLUMNS)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._columns["id"])
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (
+            Qt.ItemDataRole.DisplayRole,
+            Qt.ItemDataRole.EditRole,
+        ):
+            return None
+
+        column = _RADIO_COLUMNS[index.column()]
+        value = _from_storage(self._columns[column][index.row()])
+
+        if role == Qt.ItemDataRole.DisplayRole and value and column == "last_contact":
+            return datetime.datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+
+        return value
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        flags = super().flags(index)
+        if index.isValid() and _RADIO_COLUMNS[index.column()] in _EDITABLE_COLUMNS:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ):
+        if (
+            role == Qt.ItemDataRole.DisplayRole
+            and orientation == Qt.Orientation.Horizontal
+        ):
+            return _COLUMN_TITLES[_RADIO_COLUMNS[section]]
+
+        return super().headerData(section, orientation, role)
+
+    def setData(
+        self, index: QModelIndex, value, role: int = Qt.ItemDataRole.EditRole
+    ) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+
+        column = _RADIO_COLUMNS[index.column()]
+
+        try:
+            if column in _INTEGER_COLUMNS:
+                value = int(value)
+        except ValueError:
+            return False
+
+        if column == "poll_priority" and value not in POLL_PRIORITIES:
+            return False
+
+        radio_id = self._columns["id"][index.row()]
+        if not self._update_values(radio_id, {column: value}):
+            return False
+
+        self._columns[column][index.row()] = _to_storage(column, value)
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder):
+        """
+        Sort the rows in memory, keeping persistent indexes (selection) intact.
+
+        :param column: The column number to sort by.
+        :param order: The sort order.
+        :return: None
+        """
+        values = self._columns[_RADIO_COLUMNS[column]]
+        if _COLUMN_TYPES[_RADIO_COLUMNS[column]] is not None:
+            values = [_sort_key(value) for value in values]
+
+        order_of_rows = sorted(
+            range(len(values)),
+            key=values.__getitem__,
+            reverse=order == Qt.SortOrder.DescendingOrder,
+        )
+
+        self.layoutAboutToBeChanged.emit()
+
+        for name, stored in self._columns.items():
+            reordered = [stored[row] for row in order_of_rows]
+            type_code = _COLUMN_TYPES[name]
+            self._columns[name] = (
+                reordered if type_code is None else array(type_code, reordered)
+            )
+
+        new_rows = [0] * len(order_of_rows)
+        for new_row, old_row in enumerate(order_of_rows):
+            new_rows[old_row] = new_row
+
+        old_indexes = self.persistentIndexList()
+        self.changePersistentIndexList(
+            old_indexes,
+            [
+                self.index(new_rows[index.row()], index.column())
+                for index in old_indexes
+            ],
+        )
+        if self._row_numbers is not None:
+            self._row_numbers = {
+                radio_id: row for row, radio_id in enumerate(self._columns["id"])
+            }
+        self.layoutChanged.emit()
+
+    def fieldIndex(self, name: str) -> int:
+        """
+        The column number of a field, mirroring QSqlTableModel.
+
+        :param name: The name of the field.
+        :return: The column number, or -1 if there is no such field.
+        """
+        return _RADIO_COLUMNS.index(name) if name in _RADIO_COLUMNS else -1
+
+    def select(self) -> bool:
+        """
+        Read the whole radios table in one query, resetting the model.
+
+        :return: True if successful, False if not.
+        """
+        query = QSqlQuery()
+        query.setForwardOnly(True)
+        if not query.exec(f"SELECT {', '.join(_RADIO_COLUMNS)} FROM radios"):
+            logger.info("Unable to read radios, error: %s", query.lastError().text())
+            return False
+
+        columns = self._empty_columns()
+        appenders = [columns[name].append for name in _RADIO_COLUMNS]
+        while query.next():
+            for i, (name, append) in enumerate(zip(_RADIO_COLUMNS, appenders)):
+                append(_to_storage(name, None if query.isNull(i) else query.value(i)))
+
+        self.beginResetModel()
+        self._columns = columns
+        self._row_numbers = None
+        self.endResetModel()
+        return True
+
+    def radio(self, row: int) -> dict:
+        """
+        The radio at a row.
+
+        :param row: The row number.
+        :return: A dict describing the radio, empty if the row does not exist.
+        """
+        if 0 <= row < self.rowCount():
+            return {
+                name: _from_storage(self._columns[name][row]) for name in _RADIO_COLUMNS
+            }
+        return {}
+
+    def row_of(self, radio_id: int) -> int:
+        """
+        The row number of a radio.
+
+        :param radio_id: The id (primary key) of the radio.
+        :return: The row number, or -1 if the radio is not in the model.
+        """
+        if self._row_numbers is None:
+            self._row_numbers = {
+                radio_id: row for row, radio_id in enumerate(self._columns["id"])
+            }
+
+        return self._row_numbers.get(radio_id, -1)
+
+    def keys(self):
+        """
+        Iterate over the fleet ID, device ID and id of every radio.
+
+        :return: An iterator of (fleet_id, device_id, id) tuples.
+        """
+        return zip(
+            self._columns["fleet_id"], self._columns["device_id"], self._columns["id"]
+        )
+
+    def insert_radio(self, name: str, fleet_id: int, device_id: int) -> bool:
+        """
+        Insert a radio in the DB and append it to the model.
+
+        :param name: The name of the radio.
+        :param fleet_id: The fleet ID of the radio.
+        :param device_id: The device ID of the radio.
+        :return: True if successful, False if not.
+        """
+        query = prepared_query(
+            "INSERT INTO radios (name, fleet_id, device_id) VALUES (?, ?, ?)"
+        )
+        query.bindValue(0, name)
+        query.bindValue(1, int(fleet_id))
+        query.bindValue(2, int(device_id))
+
+        if not query.exec():
+            logger.info(
+                "Unable to add device to DB, error: %s", query.lastError().text()
+            )
+            return False
+
+        self.append_radio(
+            {
+                "id": query.lastInsertId(),
+                "name": name,
+                "fleet_id": int(fleet_id),
+                "device_id": int(device_id),
+                "poll_priority": DEFAULT_POLL_PRIORITY,
+            }
+        )
+        return True
+
+    def append_radio(self, radio: dict) -> None:
+        """
+        Append a radio that is already in the DB to the model.
+
+        :param radio: Column names and values, missing columns are NULL.
+        :return: None
+        """
+        position = self.rowCount()
+        self.beginInsertRows(QModelIndex(), position, position)
+        for name in _RADIO_COLUMNS:
+            self._columns[name].append(_to_storage(name, radio.get(name)))
+        if self._row_numbers is not None:
+            self._row_numbers[radio["id"]] = position
+        self.endInsertRows()
+
+    def remove_radio(self, row: int) -> bool:
+        """
+        Delete the radio at a row from the DB and the model.
+
+        :param row: The row number.
+        :return: True if successful, False if not.
+        """
+        radio_id = self._columns["id"][row]
+        query = prepared_query("DELETE FROM radios WHERE id = ?")
+        query.bindValue(0, radio_id)
+
+        if not query.exec():
+            logger.info(
+                "Device deletion from DB created an error: %s",
+                query.lastError().text(),
+            )
+            return False
+
+        self.beginRemoveRows(QModelIndex(), row, row)
+        for stored in self._columns.values():
+            del stored[row]
+        if self._row_numbers is not None:
+            # Only the rows below the removed one move up.
+            ids = self._columns["id"]
+            del self._row_numbers[radio_id]
+            for moved in range(row, len(ids)):
+                self._row_numbers[ids[moved]] = moved
+        self.endRemoveRows()
+        return True
+
+    def update_radio(self, radio_id: int, **values) -> bool:
+        """
+        Update columns of a single radio in the DB and the model.
+
+        :param radio_id: The id (primary key) of the radio.
+        :param values: Column names and their new values.
+        :return: True if successful, False if not.
+        """
+        row = self.row_of(radio_id)
+        if row == -1 or not self._update_values(radio_id, values):
+            return False
+
+        for name, value in values.items():
+            self._columns[name][row] = _to_storage(name, value)
+
+        columns = [_RADIO_COLUMNS.index(name) for name in values]
+        self.dataChanged.emit(
+            self.index(row, min(columns)), self.index(row, max(columns))
+        )
+        return True
+
+    @staticmethod
+    def _empty_columns() -> dict:
+        """
+        Create empty storage for every column.
+
+        :return: A dict of column name to array (or list for strings).
+        """
+        return {
+            name: [] if type_code is None else array(type_code)
+            for name, type_code in _COLUMN_TYPES.items()
+        }
+
+    @staticmethod
+    def _update_values(radio_id: int, values: dict) -> bool:
+        """
+        Write column values of a single radio to the DB.
+
+        :param radio_id: The id (primary key) of the radio.
+        :param values: Column names and their new values.
+        :return: True if successful, False if not.
+        """
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        # The statement depends only on the column names, so it is reused for
+        # e.g. every position update.
+        query = prepared_query(f"UPDATE radios SET {assignments} WHERE id = ?")
+        for position, value in enumerate(values.values()):
+            query.bindValue(position, value)
+        query.bindValue(len(values), radio_id)
+
+        if query.exec():
+            return True
+
+        logger.info(
+            "Unable to update device in DB, error: %s", query.lastError().text()
+        )
+        return False
+
 
 class RadiosModel:
     def __init__(self):
         self.model = self._create_model()
+        # (fleet_id, device_id) -> radio id, built on first lookup and then
+        # kept up to date as radios are added and removed.
+        self._radio_cache = None
+        self.model.dataChanged.connect(self._data_changed)
+        self.model.modelReset.connect(self.invalidate_cache)
+        self.model.rowsInserted.connect(self._rows_inserted)
+        self.model.rowsAboutToBeRemoved.connect(self._rows_removed)
 
     @staticmethod
-    def _create_model() -> QSqlTableModel:
+    def _create_model() -> RadiosTableModel:
         """
         Create and set up the model.
         """
-        table_model = QSqlTableModel()
-        table_model.setTable("radios")
-        table_model.setEditStrategy(QSqlTableModel.EditStrategy.OnFieldChange)
+        table_model = RadiosTableModel()
         table_model.select()
-
-        column_titles = {
-            "name": "Name",
-            "fleet_id": "Fleet ID",
-            "device_id": "Device ID",
-            "last_contact": "Last Contact",
-            "last_coordinates": "Last Coordinates",
-        }
-
-        for key, value in column_titles.items():
-            index = table_model.fieldIndex(key)
-            table_model.setHeaderData(index, Qt.Orientation.Horizontal, value)
-
         return table_model
 
     def add_radio(self, data: list) -> bool:
         """
         Add a new row (radio) to the DB.
 
-        :param data:
+        :param data: The name, fleet ID and device ID of the radio.
         :return: True if successful, False if not.
         """
         logger.debug("Adding a device to the DB with data: %s.", data)
 
-        rows = self.model.rowCount()
-        self.model.insertRows(rows, 1)
-        for column, field in enumerate(data):
-            # First column is the primary key automatically created.
-            self.model.setData(self.model.index(rows, column + 1), field)
-
-        if self.model.submitAll():
-            self.model.select()
+        if self.model.insert_radio(*data):
             logger.debug("Data successfully added to DB.")
             return True
-        else:
-            logger.info(
-                "Unable to add device to DB, error: %s", self.model.lastError().text()
-            )
-            logger.info("Query executed: %s", self.model.query().executedQuery())
-            return False
+
+        return False
 
     def delete_radio(self, row: int) -> bool:
         """
         Delete an entry from the radio table.
 
         :param row: The row to be removed.
-        :return: None
+        :return: True if successful, False if not.
         """
-        logger.debug("Removing device at row: %s from DB.")
-        self.model.removeRow(row)
-        if self.model.submitAll():
-            self.model.select()
+        logger.debug("Removing device at row: %s from DB.", row)
+
+        if self.model.remove_radio(row):
             logger.debug("Device successfully removed from DB.")
             return True
-        else:
+
+        return False
+
+    def invalidate_cache(self) -> None:
+        """
+        Drop the radio lookup cache, it is rebuilt on the next lookup.
+
+        :return: None
+        """
+        self._radio_cache = None
+
+    def lookup(self, fleet_id: int, device_id: int) -> dict:
+        """
+        Find a radio by fleet and device ID without a query.
+
+        :param fleet_id: The fleet ID of the radio.
+        :param device_id: The device ID of the radio.
+        :return: A dict describing the radio, or None if it is not known.
+        """
+        if self._radio_cache is None:
+            self._radio_cache = {
+                (fleet, device): radio_id
+                for fleet, device, radio_id in self.model.keys()
+            }
+
+        radio_id = self._radio_cache.get((int(fleet_id), int(device_id)))
+        if radio_id is None:
+            return None
+
+        return self.model.radio(self.model.row_of(radio_id))
+
+    def record_frames(self, frames: list) -> None:
+        """
+        Record the last contact, and position if known, of the radios heard.
+
+        All updates of a batch share one transaction, and so one write lock,
+        rather than waiting for the frame store once per frame.
+
+        :param frames: The frames decoded by the serial worker.
+        :return: None
+        """
+        database = QSqlDatabase.database()
+        # False inside a transaction already open, e.g. a roster import.
+        in_transaction = database.transaction()
+        try:
+            for frame in frames:
+                if not getattr(frame, "fleet_id", 0):
+                    continue
+
+                radio = self.lookup(frame.fleet_id, frame.device_id)
+                if radio is None:
+                    continue
+
+                if isinstance(frame, PositionFrame):
+                    self.model.update_radio(
+                        radio["id"],
+                        last_contact=frame.timestamp,
+                        latitude=frame.latitude,
+                        longitude=frame.longitude,
+                    )
+                else:
+                    self.model.update_radio(radio["id"], last_contact=frame.timestamp)
+        except BaseException:
+            if in_transaction:
+                database.rollback()
+            raise
+
+        if in_transaction and not database.commit():
             logger.info(
-                "Device deletion from DB created an error: %s",
-                self.model.lastError().text(),
+                "Unable to record radio contacts, error: %s",
+                database.lastError().text(),
             )
 
-            return False
+    def radio(self, row: int) -> dict:
+        """
+        The radio at a row of the table.
+
+        :param row: The row number.
+        :return: A dict describing the radio, empty if the row does not exist.
+        """
+        return self.model.radio(row)
+
+    def _rows_inserted(self, parent: QModelIndex, first: int, last: int) -> None:
+        """
+        Add inserted radios to the lookup cache.
+
+        :param parent: Unused, the table has no hierarchy.
+        :param first: The first inserted row.
+        :param last: The last inserted row.
+        :return: None
+        """
+        if self._radio_cache is None:
+            return
+
+        for row in range(first, last + 1):
+            radio = self.model.radio(row)
+            self._radio_cache[radio["fleet_id"], radio["device_id"]] = radio["id"]
+
+    def _rows_removed(self, parent: QModelIndex, first: int, last: int) -> None:
+        """
+        Drop radios about to be removed from the lookup cache.
+
+        :param parent: Unused, the table has no hierarchy.
+        :param first: The first removed row.
+        :param last: The last removed row.
+        :return: None
+        """
+        if self._radio_cache is None:
+            return
+
+        for row in range(first, last + 1):
+            radio = self.model.radio(row)
+            key = (radio["fleet_id"], radio["device_id"])
+            if self._radio_cache.get(key) == radio["id"]:
+                del self._radio_cache[key]
+
+    def _data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex) -> None:
+        """
+        Invalidate the lookup cache when a fleet or device ID is edited.
+
+        :param top_left: The first changed index.
+        :param bottom_right: The last changed index.
+        :return: None
+        """
+        if top_left.column() <= _RADIO_COLUMNS.index("device_id") and (
+            bottom_right.column() >= _RADIO_COLUMNS.index("fleet_id")
+        ):
+            self.invalidate_cache()
+
+
+def _read_row(query: QSqlQuery) -> list:
+    """
+    Read the current row of a query selecting _RADIO_COLUMNS.
+
+    :param query: The positioned query.
+    :return: A list of values, None for NULL.
+    """
+    return [
+        None if query.isNull(i) else query.value(i) for i in range(len(_RADIO_COLUMNS))
+    ]
+
+
+def radios_in_area(south: float, west: float, north: float, east: float) -> list:
+    """
+    Find the radios whose last known position is inside a bounding box.
+
+    :param south: The minimum latitude.
+    :param west: The minimum longitude.
+    :param north: The maximum latitude.
+    :param east: The maximum longitude.
+    :return: A list of dicts, one per radio.
+    """
+    return _select_radios(
+        "latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?",
+        (south, north, west, east),
+    )
+
+
+def stale_radios(max_age: int, now: int = None) -> list:
+    """
+    Find the radios that have not been heard from in max_age seconds,
+    including radios that were never heard from at all.
+
+    :param max_age: The age in seconds after which a radio is stale.
+    :param now: The reference epoch time, defaults to the current time.
+    :return: A list of dicts, one per radio, least recently heard first.
+    """
+    if now is None:
+        now = int(time.time())
+
+    # Two queries, as an OR of both conditions scans the whole index while
+    # each of them on its own seeks on radios_last_contact.
+    return _select_radios("last_contact IS NULL", ()) + _select_radios(
+        "last_contact < ? ORDER BY last_contact", (now - max_age,)
+    )
+
+
+def _select_radios(condition: str, values: tuple) -> list:
+    """
+    Run an indexed query against the radios table.
+
+    :param condition: The WHERE clause with positional placeholders.
+    :param values: The values bound to the placeholders.
+    :return: A list of dicts, one per radio.
+    """
+    query = QSqlQuery()
+    query.setForwardOnly(True)
+    query.prepare(f"SELECT {', '.join(_RADIO_COLUMNS)} FROM radios WHERE {condition}")
+    for value in values:
+        query.addBindValue(value)
+
+    if not query.exec():
+        logger.info("Radio lookup failed, error: %s", query.lastError().text())
+        return []
+
+    radios = []
+    while query.next():
+        radios.append(dict(zip(_RADIO_COLUMNS, _read_row(query))))
+
+    return radios
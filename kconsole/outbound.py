@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the paced, prioritised outbound transmit queue."""
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from kconsole.airtime import frame_length
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Outbound priority classes, lower values are sent first."""
+
+    EMERGENCY = 0
+    POLL = 1
+    ROUTINE = 2
+
+
+@dataclass(order=True)
+class OutboundRequest:
+    """A single KSync command waiting to be sent."""
+
+    priority: int
+    # Keeps requests of the same priority in submission order.
+    sequence: int
+    command: str = field(compare=False)
+    arguments: dict = field(compare=False, default_factory=dict)
+    attempts: int = field(compare=False, default=0)
+
+
+class OutboundQueue(QObject):
+    """
+    Queue KSync commands by priority and pace them to the serial line.
+
+    A command is only written once the previous one has had time to leave the
+    line at the configured baud rate, plus a guard time for the radio to take
+    it from its input buffer. Commands are held while the AirtimeAccountant
+    has no budget left for them, except emergencies which are always sent.
+    Commands that would take more air time than the whole budget are failed
+    rather than held, as they could never be sent.
+    While the queue is paused, e.g. the serial link is down, commands are
+    kept and sent once it resumes. Failed writes are retried a bounded number
+    of times, a command interrupted by the link going down is kept without
+    counting as an attempt. The queue must live in the same thread as the
+    serial port.
+    """
+
+    depth_changed = Signal(int)
+    request_sent = Signal(object)
+    request_failed = Signal(object, str)
+
+    def __init__(
+        self,
+        ksync: object,
+        airtime: object,
+        guard_time: float = 0.05,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+        parent=None,
+    ):
+        """
+        :param ksync: The KSync instance commands are sent through.
+        :param airtime: The AirtimeAccountant of the serial port.
+        :param guard_time: Extra seconds left between two commands.
+        :param max_retries: How often a failed write is retried.
+        :param retry_delay: Seconds to wait before retrying a failed write.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        self.ksync = ksync
+        self.airtime = airtime
+        self.guard_time = guard_time
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue = []
+        self._sequence = itertools.count()
+        self._ready_at = 0.0
+        self.paused = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.send_next)
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def submit(self, command: str, priority: Priority, **arguments) -> None:
+        """
+        Queue a KSync command.
+
+        :param command: The KSync method to call, send_text or poll_gnss.
+        :param priority: The priority class of the command.
+        :param arguments: The keyword arguments of the KSync method.
+        :return: None
+        """
+        request = OutboundRequest(
+            int(priority), next(self._sequence), command, arguments
+        )
+        heapq.heappush(self._queue, request)
+        self.depth_changed.emit(len(self._queue))
+        self._schedule()
+
+    @Slot()
+    def pause(self) -> None:
+        """
+        Hold every command until resume() is called.
+
+        :return: None
+        """
+        self.paused = True
+        self._timer.stop()
+
+    @Slot()
+    def resume(self) -> None:
+        """
+        Send the commands held while paused.
+
+        :return: None
+        """
+        self.paused = False
+        self._schedule()
+
+    @Slot()
+    def send_next(self) -> None:
+        """
+        Send the highest priority command if the line is free.
+
+        :return: None
+        """
+        if not self._queue or self.paused:
+            return
+
+        wait = self._ready_at - time.monotonic()
+        if wait > 0:
+            self._timer.start(int(wait * 1000) + 1)
+            return
+
+        if self._queue[0].priority != Priority.EMERGENCY:
+            length = frame_length(self._queue[0].command, self._queue[0].arguments)
+            if not self.airtime.fits(length):
+                # Waiting would block everything queued behind it for good.
+                request = heapq.heappop(self._queue)
+                reason = (
+                    f"{self.airtime.frame_air_time(length):.1f} s of air time "
+                    f"exceeds the {self.airtime.budget:.1f} s duty-cycle budget."
+                )
+                logger.info("Outbound %s rejected: %s", request.command, reason)
+                self.request_failed.emit(request, reason)
+                self.depth_changed.emit(len(self._queue))
+                self._schedule()
+                return
+
+            wait = self.airtime.wait_time(length)
+            if wait > 0:
+                logger.info("Duty-cycle budget exhausted, holding for %.1f s.", wait)
+                self._timer.start(int(wait * 1000) + 1)
+                return
+
+        request = heapq.heappop(self._queue)
+        request.attempts += 1
+
+        try:
+            written = getattr(self.ksync, request.command)(**request.arguments)
+        except Exception as error:  # KSync raises bare Exceptions.
+            logger.info("Outbound %s rejected: %s", request.command, error)
+            self.request_failed.emit(request, str(error))
+            written = 0
+        else:
+            if self.paused:
+                # The link went down during the write or flush, so the command
+                # may never have left; it is sent again on resume.
+                logger.info("Outbound %s held until the link is back.", request.command)
+                request.attempts -= 1
+                heapq.heappush(self._queue, request)
+                written = 0
+            elif written > 0:
+                logger.debug("Outbound %s sent: %s", request.command, request)
+                self.request_sent.emit(request)
+            elif request.attempts <= self.max_retries:
+                logger.info("Outbound %s failed, retrying.", request.command)
+                heapq.heappush(self._queue, request)
+                self._ready_at = time.monotonic() + self.retry_delay
+            else:
+                logger.info("Outbound %s failed, giving up.", request.command)
+                self.request_failed.emit(request, "Unable to write to serial port.")
+
+        if written > 0:
+            self.airtime.record(written)
+            self._ready_at = (
+                time.monotonic()
+                + self.airtime.frame_transmit_time(written)
+                + self.guard_time
+            )
+
+        self.depth_changed.emit(len(self._queue))
+        self._schedule()
+
+    def _schedule(self) -> None:
+        """
+        Start the send timer unless it is already pending.
+
+        :return: None
+        """
+        if self._queue and not self.paused and not self._timer.isActive():
+            wait = max(0.0, self._ready_at - time.monotonic())
+            self._timer.start(int(wait * 1000))
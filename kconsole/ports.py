@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the cached serial port registry with hot-plug updates."""
+import logging
+import os
+import sys
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal, Slot
+from PySide6.QtSerialPort import QSerialPortInfo
+
+logger = logging.getLogger(__name__)
+
+# Linux creates and removes device nodes in /dev on hot-plug, which changes
+# the modification time of the directory.
+_DEVICE_DIRECTORY = "/dev"
+
+
+def port_info(port: QSerialPortInfo) -> dict:
+    """
+    Describe a serial port with plain values that can cross threads.
+
+    :param port: The QSerialPortInfo.
+    :return: A dict of the port details shown by the settings dialog.
+    """
+    return {
+        "portName": port.portName(),
+        "description": port.description(),
+        "manufacturer": port.manufacturer(),
+        "serialNumber": port.serialNumber(),
+        "systemLocation": port.systemLocation(),
+        "vendorIdentifier": port.vendorIdentifier(),
+        "productIdentifier": port.productIdentifier(),
+    }
+
+
+class _PortScanner(QObject):
+    """Enumerate serial ports, this lives in the registry's thread."""
+
+    scanned = Signal(dict)
+
+    def __init__(self, interval: int, full_scan_interval: int, parent=None):
+        super().__init__(parent)
+        self.interval = interval
+        self.full_scan_interval = full_scan_interval
+        self._device_directory_time = None
+        self._since_full_scan = 0
+        self._timer = None
+
+    @Slot()
+    def start(self) -> None:
+        """
+        Scan now and then on a timer, this must run in the scanner thread.
+
+        :return: None
+        """
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.interval)
+        self._timer.timeout.connect(self.scan)
+        self._timer.start()
+        self.scan(force=True)
+
+    @Slot()
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.stop()
+
+    @Slot()
+    @Slot(bool)
+    def scan(self, force: bool = False) -> None:
+        """
+        Enumerate the ports, on Linux only if /dev changed since the last
+        scan or a full scan is due.
+
+        :param force: Enumerate regardless of /dev.
+        :return: None
+        """
+        self._since_full_scan += self.interval
+        if sys.platform.startswith("linux"):
+            try:
+                modified = os.stat(_DEVICE_DIRECTORY).st_mtime_ns
+            except OSError:
+                modified = None
+
+            if (
+                not force
+                and modified == self._device_directory_time
+                and self._since_full_scan < self.full_scan_interval
+            ):
+                return
+            self._device_directory_time = modified
+
+        self._since_full_scan = 0
+        self.scanned.emit(
+            {
+                port.portName(): port_info(port)
+                for port in QSerialPortInfo.availablePorts()
+            }
+        )
+
+
+class PortRegistry(QObject):
+    """
+    Keep a cached list of the serial ports, refreshed in the background.
+
+    Ports are enumerated on a separate thread, every interval on most
+    platforms and on Linux only when /dev changes (with an occasional full
+    scan in case a change was missed), so slow enumeration with many USB
+    adapters never blocks the GUI. Additions and removals are signalled one
+    port at a time so views can update incrementally.
+    """
+
+    port_added = Signal(str, dict)
+    port_removed = Signal(str)
+    updated = Signal()
+    # Requests for the scanner, queued to its thread.
+    _scan_requested = Signal(bool)
+
+    def __init__(
+        self, interval: int = 2000, full_scan_interval: int = 30000, parent=None
+    ):
+        """
+        :param interval: Milliseconds between checks for changes.
+        :param full_scan_interval: Milliseconds between unconditional scans.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        # Port name -> port details, empty until the first scan finishes.
+        self.ports = {}
+        self.scanned = False
+        self._thread = QThread(self)
+        self._scanner = _PortScanner(interval, full_scan_interval)
+        self._scanner.moveToThread(self._thread)
+        self._thread.started.connect(self._scanner.start)
+        self._thread.finished.connect(self._scanner.stop)
+        self._thread.finished.connect(self._scanner.deleteLater)
+        self._scanner.scanned.connect(self._apply_scan)
+        self._scan_requested.connect(self._scanner.scan)
+
+    def start(self) -> None:
+        """
+        Start scanning in the background.
+
+        :return: None
+        """
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop scanning.
+
+        :return: None
+        """
+        self._thread.quit()
+        self._thread.wait()
+
+    def refresh(self) -> None:
+        """
+        Enumerate the ports as soon as possible.
+
+        :return: None
+        """
+        self._scan_requested.emit(True)
+
+    def contains(self, port_name: str) -> bool:
+        """
+        :param port_name: A port name or system location, e.g. /dev/ttyUSB0.
+        :return: True if the port is currently present.
+        """
+        if port_name in self.ports or any(
+            info["systemLocation"] == port_name for info in self.ports.values()
+        ):
+            return True
+
+        # Pseudo terminals, e.g. a simulator, are not enumerated as serial
+        # ports but can be opened by their path.
+        return os.path.isabs(port_name) and os.path.exists(port_name)
+
+    @Slot(dict)
+    def _apply_scan(self, ports: dict) -> None:
+        """
+        Update the cache and signal the ports that came and went.
+
+        :param ports: Port name -> port details from the scanner.
+        :return: None
+        """
+        removed = self.ports.keys() - ports.keys()
+        added = ports.keys() - self.ports.keys()
+        self.ports = ports
+        self.scanned = True
+
+        for name in sorted(removed):
+            logger.info("Serial port %s removed.", name)
+            self.port_removed.emit(name)
+        for name in sorted(added):
+            logger.debug("Serial port %s found.", name)
+            self.port_added.emit(name, ports[name])
+
+        self.updated.emit()
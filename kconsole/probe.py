@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the serial line parameter auto-detection probe."""
+import itertools
+import logging
+
+from PySide6.QtCore import QIODevice, QObject, QTimer, Signal, Slot
+from PySide6.QtSerialPort import QSerialPort
+from ksync.ksync import KSync
+
+from kconsole.decoder import FrameDecoder, PositionFrame, StatusFrame, TextFrame
+from kconsole.settings import BAUD_RATES, PORT_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# The line parameters tried by default, FleetSync data is always 8 bits and
+# radios are not known to use mark or space parity or 1.5 stop bits.
+PROBE_PARITIES = ("None", "Even", "Odd")
+PROBE_STOP_BITS = ("1", "2")
+
+# Frames that can only be decoded if the line parameters are right.
+_WELL_FORMED = (PositionFrame, TextFrame, StatusFrame)
+
+
+def candidates(
+    baud_rates=None,
+    parities=PROBE_PARITIES,
+    stop_bits=PROBE_STOP_BITS,
+    data_bits: str = "8",
+    flow_control: str = "None",
+) -> list:
+    """
+    The line parameter combinations to try, fastest first.
+
+    :param baud_rates: The baud rates to try, every known one if None.
+    :param parities: The parities to try.
+    :param stop_bits: The stop bits to try.
+    :param data_bits: The data bits used for every candidate.
+    :param flow_control: The flow control used for every candidate.
+    :return: A list of dicts of the QSettings texts, keyed like PORT_SETTINGS.
+    """
+    if baud_rates is None:
+        baud_rates = BAUD_RATES
+    baud_rates = sorted(baud_rates, key=int, reverse=True)
+
+    return [
+        {
+            "baud_rate": baud_rate,
+            "data_bits": data_bits,
+            "parity": parity,
+            "stop_bits": stop,
+            "flow_control": flow_control,
+        }
+        for baud_rate, parity, stop in itertools.product(
+            baud_rates, parities, stop_bits
+        )
+    ]
+
+
+def program_settings(texts: dict) -> dict:
+    """
+    Map the QSettings texts of a candidate to the QSerialPort enums.
+
+    :param texts: A dict of the QSettings texts, keyed like PORT_SETTINGS.
+    :return: The program settings dict used by SerialWorker.
+    """
+    return {key: PORT_SETTINGS[key][text] for key, text in texts.items()}
+
+
+def describe(texts: dict) -> str:
+    """
+    :param texts: A dict of the QSettings texts, keyed like PORT_SETTINGS.
+    :return: The line parameters in the usual notation, e.g. 9600 8N1.
+    """
+    return (
+        f"{texts['baud_rate']} {texts['data_bits']}"
+        f"{texts['parity'][0]}{texts['stop_bits']}"
+    )
+
+
+def score_frames(frames: list, garbage: int = 0) -> int:
+    """
+    Rate the replies received with a candidate.
+
+    :param frames: The frames decoded from the replies.
+    :param garbage: The number of bytes received outside of any frame.
+    :return: The number of well-formed frames, less one for every frame that
+    could not be parsed and every 16 bytes of unframed data.
+    """
+    well_formed = sum(isinstance(frame, _WELL_FORMED) for frame in frames)
+    return well_formed - (len(frames) - well_formed) - garbage // 16
+
+
+class LineProbe(QObject):
+    """
+    Find the fastest line parameters a gateway radio answers on.
+
+    Every candidate is applied to the port in turn, a position request is
+    sent to a known radio through KSync and the replies received within the
+    timeout are scored by how many parse as well-formed frames. Candidates
+    are tried fastest first and the probe stops after the first baud rate
+    that got an answer, picking the best scoring parity and stop bits at
+    that rate.
+
+    The probe opens the port itself, so the gateway using it must release
+    it first. Like the SerialWorker it never blocks, it may be moved to its
+    own QThread with start() connected to the thread's started signal.
+    """
+
+    candidate_tested = Signal(str, int)
+    progress = Signal(int, int)
+    # The QSettings texts of the best candidate, or None if nothing answered.
+    finished = Signal(object)
+
+    # Milliseconds to let a late reply to the previous candidate arrive
+    # before it is discarded.
+    settle_time = 50
+
+    def __init__(
+        self,
+        port_name: str,
+        fleet_id: int,
+        device_id: int,
+        candidate_list: list = None,
+        timeout: float = 3.0,
+        parent=None,
+    ):
+        """
+        :param port_name: The name of the serial port to probe.
+        :param fleet_id: The fleet ID of the radio to query.
+        :param device_id: The device ID of the radio to query.
+        :param candidate_list: The candidates to try, see candidates().
+        :param timeout: Seconds to wait for replies to each query.
+        :param parent: parent object, must be None to be moved to a thread.
+        """
+        super().__init__(parent)
+        self.port_name = port_name
+        self.fleet_id = fleet_id
+        self.device_id = device_id
+        self.candidates = candidate_list if candidate_list else candidates()
+        self.timeout = timeout
+        # Scores of the candidates tried, in the order they were tried.
+        self.results = []
+        self.best = None
+        self.best_score = None
+        self.serial_port = None
+        self.ksync = None
+        self.decoder = FrameDecoder()
+        self._frames = []
+        self._number = 0
+        self._settle_timer = None
+        self._reply_timer = None
+
+    @Slot()
+    def start(self) -> None:
+        """
+        Open the port and try the first candidate, this must run in the
+        probe's thread.
+
+        :return: None
+        """
+        self.serial_port = QSerialPort(self.port_name, self)
+        if not self.serial_port.open(QIODevice.OpenModeFlag.ReadWrite):
+            logger.info(
+                "Unable to open %s to probe: %s",
+                self.port_name,
+                self.serial_port.errorString(),
+            )
+            self.finished.emit(None)
+            return
+
+        self.ksync = KSync(self.serial_port)
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(self.settle_time)
+        self._settle_timer.timeout.connect(self._query)
+        self._reply_timer = QTimer(self)
+        self._reply_timer.setSingleShot(True)
+        self._reply_timer.setInterval(int(self.timeout * 1000))
+        self._reply_timer.timeout.connect(self._score)
+        self.serial_port.readyRead.connect(self._read)
+        self._next_candidate()
+
+    @Slot()
+    def cancel(self) -> None:
+        """
+        Stop probing, finished is emitted with the best candidate so far.
+
+        :return: None
+        """
+        if self.serial_port is not None and self.serial_port.isOpen():
+            logger.info("Probe of %s cancelled.", self.port_name)
+            self._finish()
+
+    def _next_candidate(self) -> None:
+        """
+        Apply the next candidate, or finish if there is none left to try.
+
+        :return: None
+        """
+        while self._number < len(self.candidates):
+            texts = self.candidates[self._number]
+            self._number += 1
+            # Slower rates are only tried while nothing has answered.
+            if self.best is not None and texts["baud_rate"] != self.best["baud_rate"]:
+                break
+
+            settings = program_settings(texts)
+            if all(
+                (
+                    self.serial_port.setBaudRate(settings["baud_rate"]),
+                    self.serial_port.setDataBits(settings["data_bits"]),
+                    self.serial_port.setParity(settings["parity"]),
+                    self.serial_port.setStopBits(settings["stop_bits"]),
+                    self.serial_port.setFlowControl(settings["flow_control"]),
+                )
+            ):
+                self._settle_timer.start()
+                return
+
+            logger.info("%s does not support %s.", self.port_name, describe(texts))
+            self.serial_port.clearError()
+            self.progress.emit(self._number, len(self.candidates))
+
+        self._finish()
+
+    def _query(self) -> None:
+        """
+        Discard whatever arrived under the previous candidate and query the
+        radio.
+
+        :return: None
+        """
+        self.serial_port.clear()
+        self.serial_port.readAll()
+        self.decoder = FrameDecoder()
+        self._frames = []
+        self.ksync.poll_gnss(self.fleet_id, self.device_id)
+        self._reply_timer.start()
+
+    @Slot()
+    def _read(self) -> None:
+        """
+        Collect the replies, scoring the candidate early if the polled radio
+        answered.
+
+        :return: None
+        """
+        data = self.serial_port.readAll().data()
+        # Anything arriving while settling is discarded by _query().
+        if self._reply_timer.isActive():
+            self._frames += self.decoder.feed(data)
+            if any(
+                isinstance(frame, PositionFrame)
+                and (frame.fleet_id, frame.device_id) == (self.fleet_id, self.device_id)
+                for frame in self._frames
+            ):
+                self._reply_timer.stop()
+                self._score()
+
+    def _score(self) -> None:
+        """
+        Score the replies to the current candidate and move on.
+
+        :return: None
+        """
+        texts = self.candidates[self._number - 1]
+        # A partial frame left at the end counts as noise as well.
+        score = score_frames(self._frames, self.decoder.skipped + len(self.decoder))
+        self.results.append((texts, score))
+        logger.info(
+            "Probe of %s at %s scored %s.", self.port_name, describe(texts), score
+        )
+        self.candidate_tested.emit(describe(texts), score)
+        self.progress.emit(self._number, len(self.candidates))
+
+        # Any well-formed reply shows the settings work, even if noise from
+        # an earlier candidate arrived late and lowered the score.
+        answered = any(isinstance(frame, _WELL_FORMED) for frame in self._frames)
+        if answered and (self.best is None or score > self.best_score):
+            self.best, self.best_score = texts, score
+
+        self._next_candidate()
+
+    def _finish(self) -> None:
+        """
+        Close the port and report the best candidate.
+
+        :return: None
+        """
+        self._settle_timer.stop()
+        self._reply_timer.stop()
+        self.serial_port.close()
+        if self.best is not None:
+            logger.info("Probe of %s found %s.", self.port_name, describe(self.best))
+        self.finished.emit(self.best)
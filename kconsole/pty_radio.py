@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides a stand-in gateway radio on a pseudo terminal."""
+import argparse
+import logging
+import os
+import pty
+import random
+import select
+import sys
+import termios
+import threading
+import time
+import tty
+
+from kconsole.decoder import FrameDecoder
+
+logger = logging.getLogger(__name__)
+
+# termios speed constant -> the baud rate text used in QSettings.
+_SPEEDS = {
+    getattr(termios, f"B{rate}"): rate
+    for rate in ("1200", "2400", "4800", "9600", "19200", "38400", "57600", "115200")
+}
+# The termios flag for mark and space parity, Linux only.
+_CMSPAR = getattr(termios, "CMSPAR", 0o10000000000)
+
+
+def nmea_coordinate(value: float, degree_digits: int) -> tuple:
+    """
+    Format a coordinate the way NMEA sentences carry it.
+
+    :param value: Decimal degrees, negative for south or west.
+    :param degree_digits: 2 for latitude, 3 for longitude.
+    :return: A (ddmm.mmmmm, hemisphere index) tuple, the index being 0 for
+    north or east and 1 for south or west.
+    """
+    degrees, minutes = divmod(abs(value) * 60, 60)
+    return f"{int(degrees):0{degree_digits}d}{minutes:08.5f}", int(value < 0)
+
+
+def position_sentence(
+    fleet_id: int, device_id: int, latitude: float, longitude: float, when=None
+) -> bytes:
+    """
+    Build the $PKLSH sentence a radio sends in reply to a position request.
+
+    :param fleet_id: The fleet ID of the radio.
+    :param device_id: The device ID of the radio.
+    :param latitude: Decimal degrees.
+    :param longitude: Decimal degrees.
+    :param when: A time.struct_time in UTC, now if None.
+    :return: The sentence including the checksum and line ending.
+    """
+    lat, south = nmea_coordinate(latitude, 2)
+    lon, west = nmea_coordinate(longitude, 3)
+    fix_time = time.strftime("%H%M%S", when or time.gmtime())
+    body = (
+        f"PKLSH,{lat},{'NS'[south]},{lon},{'EW'[west]},{fix_time},A,"
+        f"{fleet_id:03d},{device_id:04d}"
+    )
+    checksum = 0
+    for character in body.encode():
+        checksum ^= character
+    return f"${body}*{checksum:02X}\r\n".encode()
+
+
+def line_settings(fd: int) -> dict:
+    """
+    Read the line parameters a terminal is set to.
+
+    :param fd: A file descriptor of the terminal.
+    :return: A dict of the QSettings texts for baud_rate, data_bits, parity
+    and stop_bits.
+    """
+    attributes = termios.tcgetattr(fd)
+    cflag = attributes[2]
+
+    if not cflag & termios.PARENB:
+        parity = "None"
+    elif cflag & _CMSPAR:
+        parity = "Mark" if cflag & termios.PARODD else "Space"
+    else:
+        parity = "Odd" if cflag & termios.PARODD else "Even"
+
+    return {
+        "baud_rate": _SPEEDS.get(attributes[4], str(attributes[4])),
+        "data_bits": {
+            termios.CS5: "5",
+            termios.CS6: "6",
+            termios.CS7: "7",
+            termios.CS8: "8",
+        }[cflag & termios.CSIZE],
+        "parity": parity,
+        "stop_bits": "2" if cflag & termios.CSTOPB else "1",
+    }
+
+
+class PtyRadio:
+    """
+    Pretend to be a gateway radio on the slave side of a pseudo terminal.
+
+    The port name can be opened by KConsole like any serial port. Position
+    requests for a known radio are answered with a $PKLSH sentence, but only
+    while the terminal is set to the radio's line parameters. On any other
+    setting the reply is turned into noise, as a real reply read at the
+    wrong rate would be, so the line probe can be tested without hardware.
+    Linux pseudo terminals can not be set to use parity, so only the baud
+    rate, data bits and stop bits are compared. The radio runs in a daemon
+    thread.
+    """
+
+    def __init__(
+        self,
+        baud_rate: str = "9600",
+        stop_bits: str = "1",
+        radios: dict = None,
+        seed: int = None,
+    ):
+        """
+        :param baud_rate: The baud rate the radio works at.
+        :param stop_bits: The stop bits the radio works with.
+        :param radios: (fleet_id, device_id) -> (latitude, longitude) of the
+        radios answering position requests, 100-1000 if None.
+        :param seed: Seed for the noise, random if None.
+        """
+        self.line = {
+            "baud_rate": baud_rate,
+            "data_bits": "8",
+            "stop_bits": stop_bits,
+        }
+        self.radios = radios if radios is not None else {(100, 1000): (51.5, -0.1)}
+        self.random = random.Random(seed)
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port_name = os.ttyname(self.slave)
+        # Requests received, and those answered with a readable reply.
+        self.requests = 0
+        self.answered = 0
+        self._decoder = FrameDecoder()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        """
+        Start answering requests.
+
+        :return: None
+        """
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop answering and close the pseudo terminal.
+
+        :return: None
+        """
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def matches(self) -> bool:
+        """
+        :return: True if the terminal is set to the radio's line parameters.
+        """
+        settings = line_settings(self.slave)
+        return all(settings[key] == value for key, value in self.line.items())
+
+    def _run(self) -> None:
+        """
+        Read requests from the terminal until stopped.
+
+        :return: None
+        """
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([self.master], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                # Nothing has the slave open, e.g. between two probes.
+                time.sleep(0.1)
+                continue
+
+            for frame in self._decoder.feed(data):
+                self._handle(frame.raw)
+
+    def _handle(self, payload: bytes) -> None:
+        """
+        Answer a single request.
+
+        :param payload: The request without STX and ETX.
+        :return: None
+        """
+        if not payload.startswith(b"R3"):
+            logger.debug("Stand-in radio ignoring %s.", payload)
+            return
+
+        self.requests += 1
+        try:
+            radio = int(payload[2:5]), int(payload[5:9])
+        except ValueError:
+            return
+        if radio not in self.radios:
+            return
+
+        reply = position_sentence(*radio, *self.radios[radio])
+        if self.matches():
+            self.answered += 1
+        else:
+            reply = bytes(self.random.randrange(256) for _ in reply)
+        os.write(self.master, reply)
+
+
+def main() -> None:
+    """
+    Run a stand-in radio until interrupted, printing its port name.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m kconsole.pty_radio",
+        description="Pretend to be a gateway radio on a pseudo terminal.",
+    )
+    parser.add_argument("--baud-rate", default="9600")
+    parser.add_argument("--stop-bits", default="1", choices=("1", "2"))
+    parser.add_argument("--fleet-id", type=int, default=100)
+    parser.add_argument("--device-id", type=int, default=1000)
+    arguments = parser.parse_args()
+
+    radio = PtyRadio(
+        arguments.baud_rate,
+        arguments.stop_bits,
+        radios={(arguments.fleet_id, arguments.device_id): (51.5, -0.1)},
+    )
+    radio.start()
+    print(radio.port_name, flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        radio.stop()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
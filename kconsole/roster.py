@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides bulk import and export of the radios table."""
+import csv
+import json
+import logging
+import pathlib
+from dataclasses import dataclass, field
+
+from PySide6.QtSql import QSqlDatabase, QSqlQuery
+
+from kconsole.database import prepared_query
+
+logger = logging.getLogger(__name__)
+
+# Columns read and written by import and export, in file order.
+ROSTER_FIELDS = ("name", "fleet_id", "device_id")
+
+# File suffixes holding one JSON object per line.
+_JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+
+
+@dataclass
+class ImportReport:
+    """The outcome of a roster import."""
+
+    imported: int = 0
+    # (line, fleet_id, device_id) of radios already known.
+    duplicates: list = field(default_factory=list)
+    # (line, message) of records that failed validation.
+    errors: list = field(default_factory=list)
+
+    def __str__(self) -> str:
+        lines = [
+            f"Imported {self.imported} radios, skipped {len(self.duplicates)} "
+            f"duplicates and {len(self.errors)} invalid records."
+        ]
+        lines.extend(
+            f"Line {line}: fleet {fleet_id} device {device_id} already exists."
+            for line, fleet_id, device_id in self.duplicates
+        )
+        lines.extend(f"Line {line}: {message}" for line, message in self.errors)
+        return "\n".join(lines)
+
+
+def validate_radio(name: str, fleet_id: str, device_id: str) -> str:
+    """
+    Validate a radio the same way for the add dialog and imports.
+
+    :param name: The name of the radio.
+    :param fleet_id: The fleet ID as text.
+    :param device_id: The device ID as text.
+    :return: An error message, or an empty string if the radio is valid.
+    """
+    if len(fleet_id) != 3 or not fleet_id.isdigit():
+        return "Fleet ID must be three characters."
+
+    if len(device_id) != 4 or not device_id.isdigit():
+        return "Device ID must be four characters."
+
+    if not name:
+        return "You must provide a name."
+
+    return ""
+
+
+def read_roster(path: pathlib.Path):
+    """
+    Stream the records of a CSV, JSON or JSON lines roster file.
+
+    :param path: The file to read.
+    :return: An iterator of (line, record) tuples, record being a dict for
+    CSV files and whatever the file holds for JSON. For a JSON array the line
+    is the position of the record in the array.
+    """
+    path = pathlib.Path(path)
+
+    with path.open(newline="", encoding="utf-8") as roster_file:
+        if path.suffix.lower() == ".csv":
+            reader = csv.DictReader(roster_file)
+            for record in reader:
+                yield reader.line_num, record
+
+        elif path.suffix.lower() in _JSON_LINES_SUFFIXES:
+            for line, text in enumerate(roster_file, start=1):
+                if text.strip():
+                    yield line, json.loads(text)
+
+        else:
+            # A plain JSON file holds a single array of records.
+            for line, record in enumerate(_read_json_array(roster_file), start=1):
+                yield line, record
+
+
+def _read_json_array(text_file, chunk_size: int = 65536):
+    """
+    Decode the elements of a JSON array one at a time, reading the file in
+    chunks rather than loading the whole document.
+
+    :param text_file: The open file holding the array.
+    :param chunk_size: The characters read at a time.
+    :return: A generator of the decoded elements.
+    :raises ValueError: If the file is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, end_of_file = "", 0, False
+    # What the next non-blank character must be.
+    expected = "["
+
+    while True:
+        # Skip blanks, reading on once the buffer is used up.
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or end_of_file:
+                break
+            buffer, position = text_file.read(chunk_size), 0
+            end_of_file = not buffer
+
+        if position == len(buffer):
+            raise ValueError("The JSON roster ends before its array is closed.")
+        character = buffer[position]
+
+        if expected == "[":
+            if character != "[":
+                raise ValueError("A JSON roster must hold an array of radios.")
+            position += 1
+            expected = "value or ]"
+
+        elif expected == ", or ]":
+            if character == "]":
+                return
+            if character != ",":
+                raise ValueError("Expected , or ] after a radio of the array.")
+            position += 1
+            expected = "value"
+
+        else:
+            if character == "]" and expected == "value or ]":
+                return
+            # Read on until the value is followed by , or ], a number cut
+            # off by the end of a chunk still decodes.
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                    after = end
+                    while after < len(buffer) and buffer[after].isspace():
+                        after += 1
+                    if end_of_file or buffer[after : after + 1] in (",", "]"):
+                        break
+                except json.JSONDecodeError:
+                    if end_of_file:
+                        raise
+                chunk = text_file.read(chunk_size)
+                end_of_file = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+
+            yield element
+            position = end
+            expected = ", or ]"
+
+
+def import_roster(path: pathlib.Path) -> ImportReport:
+    """
+    Import radios from a file in a single transaction.
+
+    Records failing validation and radios already in the DB (or earlier in
+    the same file) are skipped and reported rather than aborting the import.
+
+    :param path: The CSV, JSON or JSON lines file to import.
+    :return: An ImportReport.
+    """
+    report = ImportReport()
+    known = _known_radios()
+
+    database = QSqlDatabase.database()
+    database.transaction()
+
+    # One prepared statement reused for every row.
+    query = prepared_query(
+        "INSERT INTO radios (name, fleet_id, device_id) VALUES (?, ?, ?)"
+    )
+
+    try:
+        for line, record in read_roster(path):
+            if not isinstance(record, dict):
+                report.errors.append((line, "A radio must be an object of fields."))
+                continue
+
+            name, fleet_id, device_id = (
+                str(record.get(key) or "").strip() for key in ROSTER_FIELDS
+            )
+
+            error = validate_radio(name, fleet_id, device_id)
+            if error:
+                report.errors.append((line, error))
+                continue
+
+            key = (int(fleet_id), int(device_id))
+            if key in known:
+                report.duplicates.append((line, *key))
+                continue
+
+            query.bindValue(0, name)
+            query.bindValue(1, key[0])
+            query.bindValue(2, key[1])
+            if not query.exec():
+                report.errors.append((line, query.lastError().text()))
+                continue
+
+            known.add(key)
+            report.imported += 1
+
+    except (OSError, ValueError, csv.Error) as error:
+        # Unreadable files or malformed JSON, nothing is imported.
+        database.rollback()
+        report.errors.append((0, str(error)))
+        report.imported = 0
+        return report
+    except BaseException:
+        # Never leave the default connection in a half-open transaction.
+        database.rollback()
+        raise
+
+    if not database.commit():
+        report.errors.append((0, database.lastError().text()))
+        report.imported = 0
+
+    logger.info("Roster import from %s: %s", path, report)
+    return report
+
+
+def export_roster(path: pathlib.Path) -> int:
+    """
+    Stream every radio to a CSV, JSON or JSON lines file.
+
+    :param path: The file to write, the format follows the suffix.
+    :return: The number of radios written.
+    """
+    path = pathlib.Path(path)
+    suffix = path.suffix.lower()
+
+    query = QSqlQuery()
+    query.setForwardOnly(True)
+    if not query.exec(f"SELECT {', '.join(ROSTER_FIELDS)} FROM radios ORDER BY id"):
+        logger.info("Unable to read radios, error: %s", query.lastError().text())
+        return 0
+
+    count = 0
+    with path.open("w", newline="", encoding="utf-8") as roster_file:
+        if suffix == ".csv":
+            writer = csv.writer(roster_file)
+            writer.writerow(ROSTER_FIELDS)
+
+        elif suffix not in _JSON_LINES_SUFFIXES:
+            roster_file.write("[\n")
+
+        while query.next():
+            record = dict(zip(ROSTER_FIELDS, (query.value(i) for i in range(3))))
+
+            if suffix == ".csv":
+                writer.writerow(record.values())
+            elif suffix in _JSON_LINES_SUFFIXES:
+                roster_file.write(json.dumps(record) + "\n")
+            else:
+                separator = ",\n" if count else ""
+                roster_file.write(f"{separator}  {json.dumps(record)}")
+
+            count += 1
+
+        if suffix != ".csv" and suffix not in _JSON_LINES_SUFFIXES:
+            roster_file.write("\n]\n")
+
+    logger.info("Exported %s radios to %s.", count, path)
+    return count
+
+
+def _known_radios() -> set:
+    """
+    The fleet and device IDs of every radio already in the DB.
+
+    :return: A set of (fleet_id, device_id) tuples.
+    """
+    query = QSqlQuery()
+    query.setForwardOnly(True)
+    query.exec("SELECT fleet_id, device_id FROM radios")
+
+    known = set()
+    while query.next():
+        known.add((query.value(0), query.value(1)))
+
+    return known
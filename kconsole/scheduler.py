@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the adaptive GNSS poll scheduler."""
+import heapq
+import itertools
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+from PySide6.QtSql import QSqlQuery
+
+from kconsole.database import prepared_query
+from kconsole.decoder import PositionFrame
+from kconsole.models import DEFAULT_POLL_PRIORITY
+
+logger = logging.getLogger(__name__)
+
+_EARTH_RADIUS = 6371000.0
+
+# Marks a heap entry superseded by a later push or removed.
+_REMOVED = object()
+
+
+def distance(
+    latitude: float, longitude: float, other_latitude: float, other_longitude: float
+) -> float:
+    """
+    The great circle distance between two positions.
+
+    :param latitude: The latitude of the first position in degrees.
+    :param longitude: The longitude of the first position in degrees.
+    :param other_latitude: The latitude of the second position in degrees.
+    :param other_longitude: The longitude of the second position in degrees.
+    :return: The distance in metres.
+    """
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    half_chord = (
+        math.sin((other_phi - phi) / 2) ** 2
+        + math.cos(phi)
+        * math.cos(other_phi)
+        * math.sin(math.radians(other_longitude - longitude) / 2) ** 2
+    )
+    return 2 * _EARTH_RADIUS * math.asin(math.sqrt(min(1.0, half_chord)))
+
+
+class PollQueue:
+    """
+    Min-heap of radios keyed by the time they are due, with cheap updates.
+
+    Rescheduling a radio pushes a new entry and marks the old one removed
+    instead of searching the heap, so every update is O(log n). Removed
+    entries are dropped when they reach the top, or all at once when they
+    outnumber the live ones.
+    """
+
+    def __init__(self):
+        self._heap = []
+        # Radio key -> its live heap entry [due, sequence, key].
+        self._entries = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def clear(self) -> None:
+        """
+        Remove every radio.
+
+        :return: None
+        """
+        self._heap.clear()
+        self._entries.clear()
+
+    def push(self, key, due: float) -> None:
+        """
+        Add a radio or move it to a new due time.
+
+        :param key: The (fleet_id, device_id) of the radio.
+        :param due: The monotonic time the radio should be polled.
+        :return: None
+        """
+        self.remove(key)
+        entry = [due, next(self._sequence), key]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+
+    def remove(self, key) -> None:
+        """
+        Remove a radio if it is queued.
+
+        :param key: The (fleet_id, device_id) of the radio.
+        :return: None
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[-1] = _REMOVED
+
+    def peek(self) -> tuple:
+        """
+        The radio due first without removing it.
+
+        :return: A (key, due) tuple, or None if the queue is empty.
+        """
+        heap = self._heap
+        while heap and heap[0][-1] is _REMOVED:
+            heapq.heappop(heap)
+
+        if not heap:
+            return None
+        return heap[0][-1], heap[0][0]
+
+    def pop(self) -> tuple:
+        """
+        Remove and return the radio due first.
+
+        :return: A (key, due) tuple, or None if the queue is empty.
+        """
+        top = self.peek()
+        if top is not None:
+            heapq.heappop(self._heap)
+            del self._entries[top[0]]
+        return top
+
+
+@dataclass
+class RadioState:
+    """What the scheduler knows about a single radio."""
+
+    priority: int = DEFAULT_POLL_PRIORITY
+    # Monotonic times, None if never heard from or polled.
+    last_contact: float = None
+    last_polled: float = None
+    # The last fix as (latitude, longitude, monotonic time).
+    last_fix: tuple = None
+    # Metres per second between the last two fixes.
+    speed: float = 0.0
+
+
+class PollScheduler(QObject):
+    """
+    Decide which radio to poll next to keep positions as fresh as possible.
+
+    Each radio is due for a poll once its last contact is older than an
+    interval that shrinks with the operator set priority and with how fast
+    the radio moved between its last two fixes. Radios wait in a PollQueue
+    ordered by that due time, which only changes when a radio is heard from,
+    polled or edited, so the ordering never has to be recomputed as time
+    passes. At most one poll is issued per poll interval, and none while
+    other outbound commands are queued, so the channel is never saturated.
+    """
+
+    poll_requested = Signal(object, object)
+
+    def __init__(
+        self,
+        base_interval: float = 600.0,
+        poll_interval: float = 5.0,
+        reference_speed: float = 5.0,
+        parent=None,
+    ):
+        """
+        :param base_interval: Seconds between polls of a stationary radio of
+        the default priority.
+        :param poll_interval: The fewest seconds between two polls.
+        :param reference_speed: The speed in metres per second that halves
+        the interval of a radio.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        self.base_interval = base_interval
+        self.reference_speed = reference_speed
+        self.queue = PollQueue()
+        self._radios = {}
+        self._queue_depth = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(poll_interval * 1000))
+        self._timer.timeout.connect(self.poll_next)
+
+    def is_running(self) -> bool:
+        """
+        :return: True while the scheduler issues polls.
+        """
+        return self._timer.isActive()
+
+    @Slot()
+    def start(self) -> None:
+        """
+        Start issuing polls.
+
+        :return: None
+        """
+        logger.info("Adaptive polling of %s radios started.", len(self.queue))
+        self._timer.start()
+
+    @Slot()
+    def stop(self) -> None:
+        """
+        Stop issuing polls, replies still update the schedule.
+
+        :return: None
+        """
+        logger.info("Adaptive polling stopped.")
+        self._timer.stop()
+
+    def load(self) -> bool:
+        """
+        Read every radio from the DB.
+
+        Radios already known keep the fixes recorded as frames arrived, only
+        radios new to the scheduler read their last two fixes from the DB, so
+        reloading after an edit does not scan the position history.
+
+        :return: True if successful, False if not.
+        """
+        # DB times are epoch seconds, the scheduler runs on monotonic time.
+        offset = time.monotonic() - time.time()
+
+        query = QSqlQuery()
+        query.setForwardOnly(True)
+        if not query.exec(
+            "SELECT fleet_id, device_id, poll_priority, last_contact FROM radios"
+        ):
+            logger.info("Unable to read radios, error: %s", query.lastError().text())
+            return False
+
+        radios = {}
+        added = []
+        while query.next():
+            key = (query.value(0), query.value(1))
+            state = self._radios.get(key)
+            if state is None:
+                state = RadioState()
+                added.append(key)
+            state.priority = query.value(2)
+            if not query.isNull(3):
+                last_contact = query.value(3) + offset
+                if state.last_contact is None or state.last_contact < last_contact:
+                    state.last_contact = last_contact
+            radios[key] = state
+
+        self._radios = radios
+        for key in added:
+            self._read_fixes(key, offset)
+
+        self.queue.clear()
+        for key in self._radios:
+            self._reschedule(key)
+
+        return True
+
+    def set_radio(self, fleet_id: int, device_id: int, priority: int) -> None:
+        """
+        Add a radio or change its priority.
+
+        :param fleet_id: The fleet ID of the radio.
+        :param device_id: The device ID of the radio.
+        :param priority: The poll priority, 0 never polls the radio.
+        :return: None
+        """
+        key = (fleet_id, device_id)
+        if key not in self._radios:
+            self._radios[key] = RadioState()
+            self._read_fixes(key, time.monotonic() - time.time())
+        self._radios[key].priority = priority
+        self._reschedule(key)
+
+    def remove_radio(self, fleet_id: int, device_id: int) -> None:
+        """
+        Forget a radio.
+
+        :param fleet_id: The fleet ID of the radio.
+        :param device_id: The device ID of the radio.
+        :return: None
+        """
+        self._radios.pop((fleet_id, device_id), None)
+        self.queue.remove((fleet_id, device_id))
+
+    def interval(self, fleet_id: int, device_id: int) -> float:
+        """
+        The seconds between polls of a radio.
+
+        :param fleet_id: The fleet ID of the radio.
+        :param device_id: The device ID of the radio.
+        :return: The interval, infinite if the radio is never polled.
+        """
+        state = self._radios[(fleet_id, device_id)]
+        if state.priority <= 0:
+            return math.inf
+
+        return self.base_interval / (
+            state.priority * (1.0 + state.speed / self.reference_speed)
+        )
+
+    @Slot(int)
+    def set_queue_depth(self, depth: int) -> None:
+        """
+        Track the outbound queue, polls are held while it is not empty.
+
+        :param depth: The outbound queue depth.
+        :return: None
+        """
+        self._queue_depth = depth
+
+    @Slot(list)
+    def handle_frames(self, frames: list) -> None:
+        """
+        Reschedule the radios heard from.
+
+        :param frames: Frames produced by the FrameDecoder.
+        :return: None
+        """
+        now = time.monotonic()
+        for frame in frames:
+            key = (getattr(frame, "fleet_id", 0), getattr(frame, "device_id", 0))
+            state = self._radios.get(key)
+            if state is None:
+                continue
+
+            state.last_contact = now
+            if isinstance(frame, PositionFrame):
+                self._record_fix(state, frame.latitude, frame.longitude, now)
+            self._reschedule(key)
+
+    @Slot()
+    def poll_next(self) -> None:
+        """
+        Poll the most overdue radio, if any radio is due.
+
+        :return: None
+        """
+        if self._queue_depth:
+            return
+
+        now = time.monotonic()
+        top = self.queue.peek()
+        if top is None or top[1] > now:
+            return
+
+        key, _ = self.queue.pop()
+        self._radios[key].last_polled = now
+        self._reschedule(key)
+        logger.debug("Adaptive poll of %s-%s.", *key)
+        self.poll_requested.emit(*key)
+
+    def _read_fixes(self, key: tuple, offset: float) -> None:
+        """
+        Record the last two position fixes of a radio from the DB.
+
+        :param key: The (fleet_id, device_id) of the radio.
+        :param offset: Seconds to add to epoch times to get monotonic times.
+        :return: None
+        """
+        # Walks the positions_device_received index backwards, two rows.
+        query = prepared_query(
+            """
+            SELECT received, latitude, longitude FROM positions
+            WHERE fleet_id = ? AND device_id = ?
+            ORDER BY received DESC LIMIT 2
+            """
+        )
+        query.bindValue(0, key[0])
+        query.bindValue(1, key[1])
+        if not query.exec():
+            logger.info(
+                "Unable to read position history, error: %s", query.lastError().text()
+            )
+            return
+
+        fixes = []
+        while query.next():
+            fixes.append((query.value(1), query.value(2), query.value(0) + offset))
+        query.finish()
+
+        state = self._radios[key]
+        for latitude, longitude, received in reversed(fixes):
+            self._record_fix(state, latitude, longitude, received)
+
+    def _record_fix(
+        self, state: RadioState, latitude: float, longitude: float, received: float
+    ) -> None:
+        """
+        Store a position fix and the speed since the previous one.
+
+        :param state: The RadioState of the radio.
+        :param latitude: The latitude of the fix.
+        :param longitude: The longitude of the fix.
+        :param received: The monotonic time of the fix.
+        :return: None
+        """
+        if state.last_fix is not None:
+            previous_latitude, previous_longitude, previous_time = state.last_fix
+            elapsed = received - previous_time
+            if elapsed > 0:
+                state.speed = (
+                    distance(previous_latitude, previous_longitude, latitude, longitude)
+                    / elapsed
+                )
+
+        state.last_fix = (latitude, longitude, received)
+
+    def _reschedule(self, key: tuple) -> None:
+        """
+        Queue a radio for its next poll, or drop it if it is never polled.
+
+        :param key: The (fleet_id, device_id) of the radio.
+        :return: None
+        """
+        state = self._radios[key]
+        interval = self.interval(*key)
+        if math.isinf(interval):
+            self.queue.remove(key)
+            return
+
+        # A poll counts as contact, so a silent radio waits a full interval
+        # before it is polled again rather than hogging the channel.
+        heard = max(
+            (t for t in (state.last_contact, state.last_polled) if t is not None),
+            default=None,
+        )
+        self.queue.push(key, -math.inf if heard is None else heard + interval)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the serial port settings stored in QSettings."""
+import logging
+
+from PySide6.QtCore import QSettings
+from PySide6.QtSerialPort import QSerialPort
+
+logger = logging.getLogger(__name__)
+
+# The choices offered for each port setting, in display order, mapping the
+# text stored in QSettings to the QSerialPort enum. The first one is the
+# default.
+BAUD_RATES = {
+    "9600": QSerialPort.BaudRate.Baud9600,
+    "4800": QSerialPort.BaudRate.Baud4800,
+    # Not confirmed with Kenwood radios, found by the line probe if usable.
+    "19200": QSerialPort.BaudRate.Baud19200,
+    "38400": QSerialPort.BaudRate.Baud38400,
+    "57600": QSerialPort.BaudRate.Baud57600,
+    "115200": QSerialPort.BaudRate.Baud115200,
+    "2400": QSerialPort.BaudRate.Baud2400,
+    "1200": QSerialPort.BaudRate.Baud1200,
+}
+DATA_BITS = {
+    "8": QSerialPort.DataBits.Data8,
+    "7": QSerialPort.DataBits.Data7,
+    "6": QSerialPort.DataBits.Data6,
+    "5": QSerialPort.DataBits.Data5,
+}
+PARITIES = {
+    "None": QSerialPort.Parity.NoParity,
+    "Even": QSerialPort.Parity.EvenParity,
+    "Odd": QSerialPort.Parity.OddParity,
+    "Mark": QSerialPort.Parity.MarkParity,
+    "Space": QSerialPort.Parity.SpaceParity,
+}
+STOP_BITS = {
+    "1": QSerialPort.StopBits.OneStop,
+    "1.5": QSerialPort.StopBits.OneAndHalfStop,
+    "2": QSerialPort.StopBits.TwoStop,
+}
+FLOW_CONTROLS = {
+    "None": QSerialPort.FlowControl.NoFlowControl,
+    "RTS/CTS": QSerialPort.FlowControl.HardwareControl,
+    "XON/XOFF": QSerialPort.FlowControl.SoftwareControl,
+}
+
+# Program setting -> the choices for it, keyed like the QSettings values.
+PORT_SETTINGS = {
+    "baud_rate": BAUD_RATES,
+    "data_bits": DATA_BITS,
+    "parity": PARITIES,
+    "stop_bits": STOP_BITS,
+    "flow_control": FLOW_CONTROLS,
+}
+
+
+def port_settings(port_name: str, saved_settings: QSettings = None) -> dict:
+    """
+    Read the stored settings of a serial port as QSerialPort enums.
+
+    Missing or unknown values fall back to the first choice, so a port that
+    was never configured opens at 9600 8N1 without flow control.
+
+    :param port_name: The name of the serial port, its QSettings group.
+    :param saved_settings: The QSettings to read, the application's if None.
+    :return: The program settings dict used by SerialWorker.
+    """
+    if saved_settings is None:
+        saved_settings = QSettings()
+
+    settings = {}
+    saved_settings.beginGroup(port_name)
+    for key, choices in PORT_SETTINGS.items():
+        text = saved_settings.value(key)
+        if text not in choices:
+            if text is not None:
+                logger.info("Ignoring unknown %s %r of %s.", key, text, port_name)
+            text = next(iter(choices))
+        settings[key] = choices[text]
+    saved_settings.endGroup()
+
+    return settings
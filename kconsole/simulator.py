@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides a simulated radio fleet on a pseudo terminal."""
+import argparse
+import csv
+import fcntl
+import logging
+import math
+import os
+import select
+import sys
+import time
+from dataclasses import dataclass
+
+from kconsole.pty_radio import PtyRadio, position_sentence
+from kconsole.roster import ROSTER_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Metres per degree of latitude.
+_METRES_PER_DEGREE = 111320.0
+# Seconds to wait for the rest of a partly written frame to fit.
+_WRITE_TIMEOUT = 1.0
+# Canned texts sent by the simulated radios.
+_TEXTS = (
+    "On scene",
+    "Returning to base",
+    "Need assistance",
+    "Search area complete",
+    "Subject located, requesting medical",
+    "Radio check",
+)
+
+
+@dataclass
+class VirtualRadio:
+    """A simulated radio moving at a steady speed on a wandering heading."""
+
+    fleet_id: int
+    device_id: int
+    latitude: float
+    longitude: float
+    # Degrees clockwise from north.
+    heading: float = 0.0
+    # Metres per second.
+    speed: float = 1.4
+    updated: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"Sim {self.fleet_id}-{self.device_id}"
+
+    def advance(self, now: float, random) -> None:
+        """
+        Move the radio to where it is at a given time.
+
+        :param now: The time, as returned by time.monotonic().
+        :param random: The random.Random used to wander off course.
+        :return: None
+        """
+        elapsed = now - self.updated
+        self.updated = now
+        if elapsed <= 0:
+            return
+
+        distance = self.speed * elapsed
+        heading = math.radians(self.heading)
+        self.latitude += distance * math.cos(heading) / _METRES_PER_DEGREE
+        self.latitude = max(-89.0, min(89.0, self.latitude))
+        self.longitude += (
+            distance
+            * math.sin(heading)
+            / (_METRES_PER_DEGREE * math.cos(math.radians(self.latitude)))
+        )
+        self.longitude = (self.longitude + 180.0) % 360.0 - 180.0
+        self.heading = (self.heading + random.gauss(0, 15) * min(elapsed, 60)) % 360
+
+
+class FleetSimulator(PtyRadio):
+    """
+    Pretend to be a gateway radio serving a whole fleet of radios.
+
+    Position requests are answered with where the polled radio has moved to
+    since it was last heard, texts addressed to a simulated radio are
+    acknowledged, and the radios send position reports, texts and
+    identifications of their own at the given rates, spread randomly over
+    time. Optionally bursts of line noise are injected and a share of the
+    frames corrupted, to exercise the decoder's recovery.
+
+    As with the PtyRadio everything sent is turned into noise while the
+    terminal is not set to the simulator's line parameters. Frames that do
+    not fit in the terminal buffer because nothing reads them are counted
+    as dropped rather than blocking the simulator, a frame only partly
+    written is finished once the terminal is read again.
+    """
+
+    def __init__(
+        self,
+        radio_count: int = 100,
+        fleet_id: int = 100,
+        first_device_id: int = 1000,
+        latitude: float = 51.5,
+        longitude: float = -0.1,
+        spread: float = 5000.0,
+        position_rate: float = 0.0,
+        text_rate: float = 0.0,
+        status_rate: float = 0.0,
+        noise_rate: float = 0.0,
+        corruption: float = 0.0,
+        baud_rate: str = "9600",
+        stop_bits: str = "1",
+        seed: int = None,
+    ):
+        """
+        :param radio_count: The number of radios simulated. Device IDs run
+        from first_device_id, moving on to the next fleet after device 9999.
+        :param fleet_id: The fleet ID of the first radio.
+        :param first_device_id: The device ID of the first radio.
+        :param latitude: The centre of the area the radios start in.
+        :param longitude: The centre of the area the radios start in.
+        :param spread: The radius of the area in metres.
+        :param position_rate: Unsolicited position reports per second, for
+        the whole fleet.
+        :param text_rate: Texts sent per second, for the whole fleet.
+        :param status_rate: Identifications sent per second, for the whole fleet.
+        :param noise_rate: Bursts of random bytes per second.
+        :param corruption: The share of frames, 0 to 1, sent damaged.
+        :param baud_rate: The baud rate the gateway works at.
+        :param stop_bits: The stop bits the gateway works with.
+        :param seed: Seed for positions, traffic and noise, random if None.
+        """
+        super().__init__(baud_rate, stop_bits, radios={}, seed=seed)
+        # Writes must not block while nothing reads the terminal.
+        flags = fcntl.fcntl(self.master, fcntl.F_GETFL)
+        fcntl.fcntl(self.master, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+        devices_per_fleet = 10000 - first_device_id
+        now = time.monotonic()
+        for number in range(radio_count):
+            fleet_offset, device_offset = divmod(number, devices_per_fleet)
+            distance = spread * math.sqrt(self.random.random())
+            bearing = self.random.uniform(0, 2 * math.pi)
+            radio = VirtualRadio(
+                fleet_id + fleet_offset,
+                first_device_id + device_offset,
+                latitude + distance * math.cos(bearing) / _METRES_PER_DEGREE,
+                longitude
+                + distance
+                * math.sin(bearing)
+                / (_METRES_PER_DEGREE * math.cos(math.radians(latitude))),
+                heading=self.random.uniform(0, 360),
+                speed=self.random.uniform(0.5, 2.0),
+                updated=now,
+            )
+            self.radios[radio.fleet_id, radio.device_id] = radio
+        self._fleet = list(self.radios.values())
+
+        self.rates = {
+            "position": position_rate,
+            "text": text_rate,
+            "status": status_rate,
+            "noise": noise_rate,
+        }
+        self.corruption = corruption
+        # Counts of what was received and sent, for status reports.
+        self.counts = dict.fromkeys(
+            (
+                "texts_received",
+                "broadcasts_received",
+                "position",
+                "text",
+                "status",
+                "noise",
+                "corrupted",
+                "dropped",
+            ),
+            0,
+        )
+        self._due = {}
+
+    def roster(self, path: str) -> int:
+        """
+        Write the simulated radios to a CSV roster, for kconsole --import-roster.
+
+        :param path: The file to write.
+        :return: The number of radios written.
+        """
+        with open(path, "w", newline="", encoding="utf-8") as roster_file:
+            writer = csv.writer(roster_file)
+            writer.writerow(ROSTER_FIELDS)
+            for radio in self._fleet:
+                writer.writerow(
+                    (radio.name, f"{radio.fleet_id:03d}", f"{radio.device_id:04d}")
+                )
+        return len(self._fleet)
+
+    def status(self) -> str:
+        """
+        :return: A one line summary of the traffic so far.
+        """
+        return (
+            f"{self.requests} polls ({self.answered} answered), "
+            f"{self.counts['texts_received']} texts and "
+            f"{self.counts['broadcasts_received']} broadcasts received, sent "
+            f"{self.counts['position']} positions, {self.counts['text']} texts, "
+            f"{self.counts['status']} identifications, {self.counts['noise']} "
+            f"noise bursts, {self.counts['corrupted']} corrupted, "
+            f"{self.counts['dropped']} dropped"
+        )
+
+    def _run(self) -> None:
+        """
+        Answer requests and send unsolicited traffic until stopped.
+
+        :return: None
+        """
+        now = time.monotonic()
+        self._due = {
+            kind: now + self.random.expovariate(rate)
+            for kind, rate in self.rates.items()
+            if rate > 0
+        }
+
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            for kind, due in self._due.items():
+                if due <= now:
+                    self._unsolicited(kind)
+                    self._due[kind] = max(due, now - 1.0) + self.random.expovariate(
+                        self.rates[kind]
+                    )
+
+            timeout = 0.1
+            if self._due:
+                timeout = max(0.0, min(timeout, min(self._due.values()) - now))
+            readable, _, _ = select.select([self.master], [], [], timeout)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                time.sleep(0.1)
+                continue
+
+            for frame in self._decoder.feed(data):
+                self._handle(frame.raw)
+
+    def _handle(self, payload: bytes) -> None:
+        """
+        Answer a position request or acknowledge a text.
+
+        :param payload: The request without STX and ETX.
+        :return: None
+        """
+        code = payload[:1]
+        if code not in (b"R", b"F", b"G"):
+            logger.debug("Simulator ignoring %s.", payload)
+            return
+
+        try:
+            start = 2 if code == b"R" else 1
+            key = int(payload[start : start + 3]), int(payload[start + 3 : start + 7])
+        except ValueError:
+            return
+
+        if code != b"R":
+            if key == (0, 0):
+                self.counts["broadcasts_received"] += 1
+            elif key in self.radios:
+                self.counts["texts_received"] += 1
+                self._send(b"\x020\x03")
+            logger.debug("Simulator received text %s.", payload)
+            return
+
+        self.requests += 1
+        radio = self.radios.get(key)
+        if radio is None:
+            return
+
+        radio.advance(time.monotonic(), self.random)
+        if self._send(
+            position_sentence(
+                radio.fleet_id, radio.device_id, radio.latitude, radio.longitude
+            )
+        ):
+            self.answered += 1
+
+    def _unsolicited(self, kind: str) -> None:
+        """
+        Send a frame from a random radio, or a burst of noise.
+
+        :param kind: position, text, status or noise.
+        :return: None
+        """
+        self.counts[kind] += 1
+        if kind == "noise":
+            self._write(
+                bytes(
+                    self.random.randrange(256)
+                    for _ in range(self.random.randint(1, 32))
+                )
+            )
+            return
+
+        radio = self.random.choice(self._fleet)
+        ids = f"{radio.fleet_id:03d}{radio.device_id:04d}"
+        if kind == "position":
+            radio.advance(time.monotonic(), self.random)
+            frame = position_sentence(
+                radio.fleet_id, radio.device_id, radio.latitude, radio.longitude
+            )
+        elif kind == "text":
+            frame = f"\x02F{ids}{self.random.choice(_TEXTS)}\x03".encode()
+        else:
+            frame = f"\x02I0{ids}{ids}\x03".encode()
+        self._send(frame)
+
+    def _send(self, frame: bytes) -> bool:
+        """
+        Send a frame, damaged if the line parameters are wrong or by chance.
+
+        :param frame: The frame.
+        :return: True if it was sent intact.
+        """
+        if not self.matches():
+            self._write(bytes(self.random.randrange(256) for _ in frame))
+            return False
+
+        if self.corruption and self.random.random() < self.corruption:
+            self.counts["corrupted"] += 1
+            frame = bytearray(frame)
+            position = self.random.randrange(len(frame))
+            damage = self.random.randrange(3)
+            if damage == 0:
+                frame[position] = self.random.randrange(256)
+            elif damage == 1:
+                del frame[position]
+            else:
+                del frame[position:]
+            self._write(bytes(frame))
+            return False
+
+        return self._write(frame)
+
+    def _write(self, data: bytes) -> bool:
+        """
+        Write all of the data, or none of it if the terminal buffer is full.
+
+        Once part of the data is written the rest is waited for, for up to
+        _WRITE_TIMEOUT seconds, so a frame is never cut short silently.
+
+        :param data: The bytes to write to the terminal.
+        :return: True if all of it was written, False if dropped.
+        """
+        view = memoryview(data)
+        deadline = None
+        while True:
+            try:
+                written = os.write(self.master, view)
+            except BlockingIOError:
+                written = 0
+            except OSError:
+                break
+
+            view = view[written:]
+            if not view:
+                return True
+            if deadline is None:
+                if written == 0:
+                    # Nothing written yet, drop the frame rather than block.
+                    break
+                deadline = time.monotonic() + _WRITE_TIMEOUT
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                logger.info(
+                    "Dropping the last %s bytes of a frame, nothing reads them.",
+                    len(view),
+                )
+                break
+            select.select([], [self.master], [], timeout)
+
+        self.counts["dropped"] += 1
+        return False
+
+
+def main() -> None:
+    """
+    Run a simulated fleet until interrupted, printing its port name.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m kconsole.simulator",
+        description="Simulate a gateway radio and a fleet of radios on a pseudo "
+        "terminal. Point KConsole at the printed port name.",
+    )
+    parser.add_argument("--radios", type=int, default=100)
+    parser.add_argument("--fleet-id", type=int, default=100)
+    parser.add_argument("--first-device-id", type=int, default=1000)
+    parser.add_argument("--latitude", type=float, default=51.5)
+    parser.add_argument("--longitude", type=float, default=-0.1)
+    parser.add_argument(
+        "--spread", type=float, default=5000.0, help="Radius in metres."
+    )
+    parser.add_argument(
+        "--position-rate",
+        type=float,
+        default=0.0,
+        help="Unsolicited position reports per second.",
+    )
+    parser.add_argument(
+        "--text-rate", type=float, default=0.0, help="Texts per second."
+    )
+    parser.add_argument(
+        "--status-rate",
+        type=float,
+        default=0.0,
+        help="Identifications per second.",
+    )
+    parser.add_argument(
+        "--noise-rate",
+        type=float,
+        default=0.0,
+        help="Bursts of random bytes per second.",
+    )
+    parser.add_argument(
+        "--corruption",
+        type=float,
+        default=0.0,
+        help="Share of frames, 0 to 1, sent damaged.",
+    )
+    parser.add_argument("--baud-rate", default="9600")
+    parser.add_argument("--stop-bits", default="1", choices=("1", "2"))
+    parser.add_argument("--seed", type=int)
+    parser.add_argument(
+        "--roster",
+        metavar="FILE",
+        help="Write the radios to a CSV file for kconsole --import-roster.",
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between traffic summaries, 0 for none.",
+    )
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    simulator = FleetSimulator(
+        arguments.radios,
+        arguments.fleet_id,
+        arguments.first_device_id,
+        latitude=arguments.latitude,
+        longitude=arguments.longitude,
+        spread=arguments.spread,
+        position_rate=arguments.position_rate,
+        text_rate=arguments.text_rate,
+        status_rate=arguments.status_rate,
+        noise_rate=arguments.noise_rate,
+        corruption=arguments.corruption,
+        baud_rate=arguments.baud_rate,
+        stop_bits=arguments.stop_bits,
+        seed=arguments.seed,
+    )
+    if arguments.roster:
+        print(
+            f"Wrote {simulator.roster(arguments.roster)} radios to {arguments.roster}."
+        )
+    simulator.start()
+    print(simulator.port_name, flush=True)
+    try:
+        while True:
+            time.sleep(arguments.report_interval or 1)
+            if arguments.report_interval:
+                logger.info(simulator.status())
+    except KeyboardInterrupt:
+        simulator.stop()
+        print(simulator.status())
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
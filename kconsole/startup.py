@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides startup time measurement and application setup."""
+import json
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def configure_application(app) -> None:
+    """
+    Set the names used by QSettings and QStandardPaths.
+
+    :param app: The QCoreApplication instance.
+    :return: None
+    """
+    app.setApplicationName("KConsole")
+    app.setOrganizationName("SARStats")
+    app.setOrganizationDomain("sarstats.com")
+
+
+def process_age() -> float:
+    """
+    The seconds since the process was created, which for a frozen build
+    includes the bootloader unpacking the application.
+
+    :return: The age in seconds, or None if the platform is not supported.
+    """
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/stat") as stat_file:
+                # The command may contain spaces, fields are counted after it.
+                fields = stat_file.read().rpartition(")")[2].split()
+            with open("/proc/uptime") as uptime_file:
+                uptime = float(uptime_file.read().split()[0])
+            return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            creation, exited, kernel, user, now = (
+                wintypes.FILETIME() for _ in range(5)
+            )
+            ctypes.windll.kernel32.GetProcessTimes(
+                ctypes.windll.kernel32.GetCurrentProcess(),
+                ctypes.byref(creation),
+                ctypes.byref(exited),
+                ctypes.byref(kernel),
+                ctypes.byref(user),
+            )
+            ctypes.windll.kernel32.GetSystemTimeAsFileTime(ctypes.byref(now))
+
+            def ticks(filetime):
+                return (filetime.dwHighDateTime << 32) | filetime.dwLowDateTime
+
+            # FILETIME counts 100 nanosecond intervals.
+            return (ticks(now) - ticks(creation)) / 10**7
+
+    except (OSError, ValueError, IndexError, AttributeError) as error:
+        logger.info("Unable to read the process age: %s", error)
+
+    return None
+
+
+class StartupTimer:
+    """
+    Record how long each startup phase takes.
+
+    Phases are measured from the creation of the timer, the whole startup
+    from the creation of the process where the platform allows it.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Seconds the process existed before the timer was created.
+        age = process_age()
+        self.before_start = age if age is not None else 0.0
+        self.marks = {}
+
+    def mark(self, phase: str) -> None:
+        """
+        Record the end of a startup phase.
+
+        :param phase: The name of the phase.
+        :return: None
+        """
+        self.marks[phase] = time.perf_counter() - self.started
+
+    def report(self) -> dict:
+        """
+        :return: The seconds from the timer's creation to the end of every
+        phase, plus the time before the timer and the total.
+        """
+        report = {"before_start": round(self.before_start, 4)}
+        report.update(
+            (phase, round(elapsed, 4)) for phase, elapsed in self.marks.items()
+        )
+        if self.marks:
+            report["total"] = round(self.before_start + max(self.marks.values()), 4)
+        return report
+
+    def write(self, destination: str) -> None:
+        """
+        Write the report as a line of JSON.
+
+        :param destination: A file to append to, or - for standard output.
+        :return: None
+        """
+        line = json.dumps(self.report())
+        if destination == "-":
+            print(line, flush=True)
+        else:
+            with open(destination, "a", encoding="utf-8") as report_file:
+                report_file.write(line + "\n")
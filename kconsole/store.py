@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the write-behind store for received traffic."""
+import logging
+
+from PySide6.QtCore import QObject, QTimer, Slot
+from PySide6.QtSql import QSqlDatabase
+
+from kconsole.database import (
+    DEFAULT_CONNECTION,
+    configure_connection,
+    prepared_query,
+    release_prepared_queries,
+)
+from kconsole.decoder import PositionFrame, TextFrame
+
+logger = logging.getLogger(__name__)
+
+
+class FrameStore(QObject):
+    """
+    Persist received texts and position fixes in batched transactions.
+
+    Frames are queued in memory and written once the queue reaches
+    batch_size or flush_interval milliseconds have passed, whichever comes
+    first. The store uses its own database connection so it can live in a
+    different thread than the GUI.
+    """
+
+    connection_name = "frame_store"
+
+    def __init__(self, batch_size: int = 200, flush_interval: int = 1000, parent=None):
+        """
+        :param batch_size: Number of queued rows that triggers a flush.
+        :param flush_interval: Maximum time in milliseconds rows stay queued.
+        :param parent: parent object, must be None to be moved to a thread.
+        """
+        super().__init__(parent)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._messages = []
+        self._positions = []
+        self._timer = None
+
+    def __len__(self) -> int:
+        return len(self._messages) + len(self._positions)
+
+    @Slot()
+    def start(self) -> None:
+        """
+        Open the store connection, this must run in the thread the store lives in.
+
+        :return: None
+        """
+        if not QSqlDatabase.contains(self.connection_name):
+            QSqlDatabase.cloneDatabase(DEFAULT_CONNECTION, self.connection_name)
+        if self.database().open():
+            configure_connection(self.connection_name)
+        else:
+            logger.info(
+                "Unable to open frame store connection: %s",
+                self.database().lastError().text(),
+            )
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.flush_interval)
+        self._timer.timeout.connect(self.flush)
+
+    @Slot()
+    def stop(self) -> None:
+        """
+        Write anything still queued and close the store connection.
+
+        :return: None
+        """
+        self.flush()
+        release_prepared_queries(self.connection_name)
+        self.database().close()
+
+    def database(self) -> QSqlDatabase:
+        """
+        The connection used by this store.
+
+        :return: QSqlDatabase
+        """
+        return QSqlDatabase.database(self.connection_name, open=False)
+
+    @Slot(list)
+    def add_frames(self, frames: list) -> None:
+        """
+        Queue frames for writing, frames that are not stored are ignored.
+
+        :param frames: Frames produced by the FrameDecoder.
+        :return: None
+        """
+        for frame in frames:
+            if isinstance(frame, TextFrame):
+                self._messages.append(
+                    (frame.fleet_id, frame.device_id, frame.timestamp, frame.message)
+                )
+            elif isinstance(frame, PositionFrame):
+                self._positions.append(
+                    (
+                        frame.fleet_id,
+                        frame.device_id,
+                        frame.timestamp,
+                        frame.latitude,
+                        frame.longitude,
+                    )
+                )
+
+        if len(self) >= self.batch_size:
+            self.flush()
+        elif len(self) and not self._timer.isActive():
+            self._timer.start()
+
+    @Slot()
+    def flush(self) -> bool:
+        """
+        Write all queued rows in a single transaction.
+
+        :return: True if successful, False if not.
+        """
+        if self._timer is not None:
+            self._timer.stop()
+
+        if not len(self):
+            return True
+
+        database = self.database()
+        database.transaction()
+
+        success = self._write(
+            "INSERT INTO messages (fleet_id, device_id, received, message) "
+            "VALUES (?, ?, ?, ?)",
+            self._messages,
+        ) and self._write(
+            "INSERT INTO positions (fleet_id, device_id, received, latitude, longitude) "
+            "VALUES (?, ?, ?, ?, ?)",
+            self._positions,
+        )
+
+        if success and database.commit():
+            logger.debug(
+                "Stored %s messages and %s positions.",
+                len(self._messages),
+                len(self._positions),
+            )
+        else:
+            logger.info(
+                "Unable to store received frames, error: %s",
+                database.lastError().text(),
+            )
+            database.rollback()
+
+        self._messages.clear()
+        self._positions.clear()
+        return success
+
+    def _write(self, statement: str, rows: list) -> bool:
+        """
+        Insert rows by executing a reused prepared statement once per row.
+
+        :param statement: The INSERT statement with positional placeholders.
+        :param rows: A list of tuples, one per row.
+        :return: True if successful, False if not.
+        """
+        query = prepared_query(statement, self.connection_name)
+
+        for row in rows:
+            for position, value in enumerate(row):
+                query.bindValue(position, value)
+
+            if not query.exec():
+                logger.info("Query failed: %s", query.lastError().text())
+                return False
+
+        return True
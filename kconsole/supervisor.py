@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the serial connection supervisor."""
+import logging
+
+from PySide6.QtCore import QIODevice, QObject, QTimer, Signal, Slot
+from PySide6.QtSerialPort import QSerialPort
+
+logger = logging.getLogger(__name__)
+
+# Errors that leave the connection usable.
+_RECOVERABLE_ERRORS = (
+    QSerialPort.SerialPortError.NoError,
+    QSerialPort.SerialPortError.TimeoutError,
+    QSerialPort.SerialPortError.UnsupportedOperationError,
+    QSerialPort.SerialPortError.NotOpenError,
+)
+
+
+class ConnectionSupervisor(QObject):
+    """
+    Keep a serial port open, reopening it with exponential backoff.
+
+    Any error that breaks the connection, such as the device being unplugged
+    (ResourceError), closes the port and schedules a reopen. Each failed
+    attempt doubles the delay up to max_delay, a successful open resets it.
+    The port settings are applied again before every attempt. The supervisor
+    must live in the same thread as the serial port.
+    """
+
+    connected = Signal()
+    disconnected = Signal(str)
+
+    def __init__(
+        self,
+        serial_port: QSerialPort,
+        settings: dict,
+        initial_delay: float = 0.5,
+        max_delay: float = 30.0,
+        parent=None,
+    ):
+        """
+        :param serial_port: The QSerialPort to supervise.
+        :param settings: The program settings holding the QSerialPort enums.
+        :param initial_delay: Seconds before the first reopen attempt.
+        :param max_delay: The longest delay between attempts, in seconds.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        self.serial_port = serial_port
+        self.settings = settings
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.attempts = 0
+        self._opening = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.open)
+        self.serial_port.errorOccurred.connect(self._error_occurred)
+
+    def is_connected(self) -> bool:
+        """
+        :return: True while the port is open.
+        """
+        return self.serial_port.isOpen()
+
+    @Slot()
+    def open(self) -> bool:
+        """
+        Apply the settings and open the port, scheduling a retry on failure.
+
+        :return: True if the port is open.
+        """
+        self._timer.stop()
+        if self.serial_port.isOpen():
+            return True
+
+        self.serial_port.clearError()
+        self.apply_settings()
+
+        self._opening = True
+        opened = self.serial_port.open(QIODevice.OpenModeFlag.ReadWrite)
+        self._opening = False
+
+        if opened:
+            # Applied again as some drivers reset the line on open.
+            self.apply_settings()
+            logger.info("Serial port %s opened.", self.serial_port.portName())
+            self.attempts = 0
+            self.connected.emit()
+            return True
+
+        logger.info(
+            "Unable to open serial port %s: %s",
+            self.serial_port.portName(),
+            self.serial_port.errorString(),
+        )
+        self._schedule_reopen()
+        return False
+
+    @Slot()
+    def reopen_now(self) -> None:
+        """
+        Retry straight away, e.g. once the port is plugged back in.
+
+        :return: None
+        """
+        if not self.serial_port.isOpen():
+            self.attempts = 0
+            self.open()
+
+    @Slot()
+    def stop(self) -> None:
+        """
+        Stop reopening and close the port.
+
+        :return: None
+        """
+        self._timer.stop()
+        if self.serial_port.isOpen():
+            self.serial_port.close()
+
+    def apply_settings(self) -> bool:
+        """
+        Set the line parameters of the port.
+
+        :return: True if the driver accepted every parameter.
+        """
+        return all(
+            (
+                self.serial_port.setBaudRate(self.settings["baud_rate"]),
+                self.serial_port.setParity(self.settings["parity"]),
+                self.serial_port.setDataBits(self.settings["data_bits"]),
+                self.serial_port.setStopBits(self.settings["stop_bits"]),
+                self.serial_port.setFlowControl(self.settings["flow_control"]),
+            )
+        )
+
+    def next_delay(self) -> float:
+        """
+        :return: Seconds before the next attempt, doubling with every failure.
+        """
+        return min(self.max_delay, self.initial_delay * 2**self.attempts)
+
+    def _schedule_reopen(self) -> None:
+        """
+        Start the timer for the next attempt.
+
+        :return: None
+        """
+        delay = self.next_delay()
+        self.attempts += 1
+        logger.info(
+            "Reopening serial port %s in %.1f s (attempt %s).",
+            self.serial_port.portName(),
+            delay,
+            self.attempts,
+        )
+        self._timer.start(int(delay * 1000))
+
+    @Slot(QSerialPort.SerialPortError)
+    def _error_occurred(self, error: QSerialPort.SerialPortError) -> None:
+        """
+        Close the port and schedule a reopen if the error broke the connection.
+
+        :param error: The error reported by the port.
+        :return: None
+        """
+        # Failed opens are handled, and retried, by open() itself.
+        if error in _RECOVERABLE_ERRORS or self._opening:
+            return
+
+        message = self.serial_port.errorString()
+        logger.info("Serial port %s failed: %s", self.serial_port.portName(), message)
+        if self.serial_port.isOpen():
+            self.serial_port.close()
+
+        self.disconnected.emit(message)
+        if not self._timer.isActive():
+            self._schedule_reopen()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the pipelined GNSS sweep over many radios."""
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from kconsole.decoder import PositionFrame
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepReport:
+    """The outcome of a GNSS sweep."""
+
+    duration: float = 0.0
+    # (fleet_id, device_id) -> seconds until the reply, None if it timed out.
+    results: dict = field(default_factory=dict)
+
+    @property
+    def answered(self) -> int:
+        return sum(1 for latency in self.results.values() if latency is not None)
+
+    @property
+    def response_rate(self) -> float:
+        return self.answered / len(self.results) if self.results else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Sweep finished in {self.duration:.1f} s, {self.answered} of "
+            f"{len(self.results)} radios answered ({self.response_rate:.0%})."
+        )
+
+
+class GnssSweep(QObject):
+    """
+    Poll the position of many radios with several polls in flight.
+
+    A new poll is issued as soon as a reply arrives or a poll times out, so
+    the channel stays busy without queueing the whole fleet at once. Replies
+    are matched to polls by fleet and device ID. The timeout of a poll only
+    starts once it is sent, see handle_poll_sent(), so polls held back by
+    pacing or the duty-cycle budget do not time out while still queued.
+    """
+
+    poll_requested = Signal(object, object)
+    progress = Signal(int, int)
+    finished = Signal(object)
+
+    def __init__(
+        self,
+        radios: list,
+        in_flight: int = 4,
+        timeout: float = 10.0,
+        queue_timeout: float = 300.0,
+        parent=None,
+    ):
+        """
+        :param radios: (fleet_id, device_id) tuples of the radios to poll.
+        :param in_flight: The number of polls awaiting a reply at once.
+        :param timeout: Seconds to wait for a reply to a single poll once sent.
+        :param queue_timeout: Seconds a poll may wait to be sent, e.g. while
+        the gateway port is down, before it counts as unanswered.
+        :param parent: parent object.
+        """
+        super().__init__(parent)
+        self.in_flight = in_flight
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.report = SweepReport()
+        self._pending = deque(dict.fromkeys(radios))
+        self._total = len(self._pending)
+        # (fleet_id, device_id) -> time the poll was sent, None while queued.
+        self._polled = {}
+        # (fleet_id, device_id) -> time the poll was requested.
+        self._requested = {}
+        self._started = 0.0
+        self._timer = QTimer(self)
+        self._timer.setInterval(250)
+        self._timer.timeout.connect(self._expire_polls)
+
+    def is_running(self) -> bool:
+        """
+        :return: True while the sweep has polls pending or in flight.
+        """
+        return self._timer.isActive()
+
+    @Slot()
+    def start(self) -> None:
+        """
+        Start polling.
+
+        :return: None
+        """
+        logger.info("Starting GNSS sweep of %s radios.", self._total)
+        self._started = time.monotonic()
+        self._timer.start()
+        self._issue_polls()
+
+    @Slot()
+    def cancel(self) -> None:
+        """
+        Stop issuing polls, the radios not polled yet are left out of the report.
+
+        :return: None
+        """
+        self._pending.clear()
+        for radio in self._polled:
+            self.report.results[radio] = None
+        self._polled.clear()
+        self._finish()
+
+    @Slot(list)
+    def handle_frames(self, frames: list) -> None:
+        """
+        Match received position frames to the polls in flight.
+
+        :param frames: Frames produced by the FrameDecoder.
+        :return: None
+        """
+        now = time.monotonic()
+        for frame in frames:
+            if not isinstance(frame, PositionFrame):
+                continue
+
+            radio = (frame.fleet_id, frame.device_id)
+            if radio in self._polled:
+                sent_at = self._polled.pop(radio)
+                self.report.results[radio] = now - (now if sent_at is None else sent_at)
+
+        self._issue_polls()
+
+    @Slot(object, object, bool)
+    def handle_poll_sent(self, fleet_id: int, device_id: int, sent: bool) -> None:
+        """
+        Start the timeout of a poll once it is on the air.
+
+        :param fleet_id: The fleet ID of the polled radio.
+        :param device_id: The device ID of the polled radio.
+        :param sent: False if the poll could not be written, it counts as
+        unanswered straight away.
+        :return: None
+        """
+        radio = (fleet_id, device_id)
+        if radio not in self._polled or self._polled[radio] is not None:
+            return
+
+        if sent:
+            self._polled[radio] = time.monotonic()
+            return
+
+        logger.info("GNSS poll of %s-%s could not be sent.", *radio)
+        del self._polled[radio]
+        self.report.results[radio] = None
+        # May be called from within _issue_polls(), when no gateway is set.
+        QTimer.singleShot(0, self._issue_polls)
+
+    def _issue_polls(self) -> None:
+        """
+        Poll the next radios until the in flight limit is reached.
+
+        :return: None
+        """
+        if not self.is_running():
+            return
+
+        now = time.monotonic()
+        while self._pending and len(self._polled) < self.in_flight:
+            fleet_id, device_id = self._pending.popleft()
+            self._polled[(fleet_id, device_id)] = None
+            self._requested[(fleet_id, device_id)] = now
+            self.poll_requested.emit(fleet_id, device_id)
+
+        self.progress.emit(len(self.report.results), self._total)
+
+        if not self._pending and not self._polled:
+            self._finish()
+
+    def _expire_polls(self) -> None:
+        """
+        Give up on polls that have not been answered within the timeout.
+
+        :return: None
+        """
+        now = time.monotonic()
+        for radio, sent_at in list(self._polled.items()):
+            if sent_at is None:
+                if self._requested[radio] < now - self.queue_timeout:
+                    logger.info("GNSS poll of %s-%s was never sent.", *radio)
+                    del self._polled[radio]
+                    self.report.results[radio] = None
+            elif sent_at < now - self.timeout:
+                logger.info("GNSS poll of %s-%s timed out.", *radio)
+                del self._polled[radio]
+                self.report.results[radio] = None
+
+        self._issue_polls()
+
+    def _finish(self) -> None:
+        """
+        Stop the sweep and publish the report.
+
+        :return: None
+        """
+        if not self.is_running():
+            return
+
+        self._timer.stop()
+        self.report.duration = time.monotonic() - self._started
+        logger.info("%s", self.report)
+        self.finished.emit(self.report)
@@ -55,7 +55,7 @@ class Ui_TextDialog(object):
         self.buttonBox.setOrientation(Qt.Horizontal)
         self.buttonBox.setStandardButtons(QDialogButtonBox.Cancel|QDialogButtonBox.Ok)
 
-        self.formLayout.setWidget(4, QFormLayout.FieldRole, self.buttonBox)
+        self.formLayout.setWidget(5, QFormLayout.FieldRole, self.buttonBox)
 
         self.messageLabel = QLabel(TextDialog)
         self.messageLabel.setObjectName(u"messageLabel")
@@ -73,6 +73,11 @@ class Ui_TextDialog(object):
 
         self.formLayout.setWidget(3, QFormLayout.FieldRole, self.broadcastCheckBox)
 
+        self.emergencyCheckBox = QCheckBox(TextDialog)
+        self.emergencyCheckBox.setObjectName(u"emergencyCheckBox")
+
+        self.formLayout.setWidget(4, QFormLayout.FieldRole, self.emergencyCheckBox)
+
 
         self.retranslateUi(TextDialog)
         self.buttonBox.accepted.connect(TextDialog.accept)
@@ -92,5 +97,9 @@ class Ui_TextDialog(object):
         self.broadcastCheckBox.setToolTip(QCoreApplication.translate("TextDialog", u"When checked Fleet ID and Device ID are disabled.", None))
 #endif // QT_CONFIG(tooltip)
         self.broadcastCheckBox.setText(QCoreApplication.translate("TextDialog", u"Broadcast", None))
+#if QT_CONFIG(tooltip)
+        self.emergencyCheckBox.setToolTip(QCoreApplication.translate("TextDialog", u"Emergency messages are sent ahead of all other traffic.", None))
+#endif // QT_CONFIG(tooltip)
+        self.emergencyCheckBox.setText(QCoreApplication.translate("TextDialog", u"Emergency", None))
     # retranslateUi
 
@@ -6,56 +6,82 @@ import logging
 # Resources looks unused, it isn't, and it needs to remain as long as there are icons.
 import kconsole.ui.resources
 
-from PySide6.QtCore import QIODevice, QPoint, QSettings, Qt
-from PySide6.QtGui import QIcon
-from PySide6.QtSerialPort import QSerialPort
+from PySide6.QtCore import QPoint, QSettings, Qt, Signal
+from PySide6.QtGui import QAction, QIcon
 from PySide6.QtWidgets import (
     QAbstractItemView,
     QDialog,
+    QFileDialog,
+    QLabel,
     QMainWindow,
     QMenu,
     QMessageBox,
     QStatusBar,
 )
-from ksync.ksync import KSync
+from kconsole.gateways import GatewayManager
 from kconsole.logs import ConsoleWindowLogHandler
 from kconsole.models import RadiosModel
-from kconsole.views.add_dialog import AddDialog
-from kconsole.ui.logging_dialog_ui import Ui_loggingDialog
+from kconsole.outbound import Priority
+from kconsole.ports import PortRegistry
+from kconsole.roster import export_roster, import_roster
+from kconsole.scheduler import PollScheduler
+from kconsole.sweep import GnssSweep
 from kconsole.ui.main_window_ui import Ui_MainWindow
-from kconsole.views.query_location_dialog import QueryLocationDialog
-from kconsole.views.settings_dialog import SettingsDialog
-from kconsole.views.text_dialog import TextDialog
 
 logger = logging.getLogger(__name__)
 
+_ROSTER_FILE_FILTER = "Radio rosters (*.csv *.json *.jsonl);;All files (*)"
+
 
 class Window(QMainWindow, Ui_MainWindow):
     """Main Window."""
 
-    def __init__(self, parent=None):
-        """Initializer."""
+    # Requests routed to a gateway by the gateway manager.
+    send_text_requested = Signal(str, object, object, bool, int)
+    poll_gnss_requested = Signal(object, object)
+
+    def __init__(
+        self,
+        parent=None,
+        log_database=None,
+        capture_directory=None,
+        compress_capture=False,
+    ):
+        """
+        Initializer.
+
+        :param parent: parent widget.
+        :param log_database: The log database searched by the logging
+        console, None if records are not logged to a database.
+        :param capture_directory: The directory serial traffic is recorded
+        to, None to not record.
+        :param compress_capture: Compress the capture files.
+        """
         super().__init__(parent)
+        self.capture_directory = capture_directory
+        self.compress_capture = compress_capture
 
-        self.settings = self.load_settings()
         self.saved_settings = QSettings()
         self.setupUi(self)
 
         # Configure Console Logger, we do this as early as possible to capture as much as possible.
+        # Records are only buffered until the console is first opened.
         self.console_handler = ConsoleWindowLogHandler()
         logging.getLogger().addHandler(self.console_handler)
-        self._console_dialog = LoggingDialog(self)
-        self.console_handler.bridge.sigLog.connect(
-            self._console_dialog.loggingConsole.appendPlainText
-        )
+        self._console_dialog = None
+        self.log_database = log_database
         logger.debug("Logging configured.")
 
         # Create the main DB interface.
         self.radiosModel = RadiosModel()
         self.radioTable.setModel(self.radiosModel.model)
+        # Sorting is done in memory by the model.
+        self.radioTable.setSortingEnabled(True)
         self.radioTable.setSelectionBehavior(
             QAbstractItemView.SelectionBehavior.SelectRows
         )
+        # Size columns from a sample of rows rather than measuring every row.
+        self.radioTable.horizontalHeader().setResizeContentsPrecision(100)
         self.radioTable.resizeColumnsToContents()
         self.radioTable.verticalHeader().hide()
         self.radioTable.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
@@ -65,26 +91,63 @@ class Window(QMainWindow, Ui_MainWindow):
         self.actionSettings.setIcon(QIcon(":/icons/settings"))
         self.actionLoggingConsole.setIcon(QIcon(":/icons/terminal"))
         self.menuWindow.addAction(self.toolBar.toggleViewAction())
+        self.actionImportRoster = QAction("Import Radios...", self)
+        self.actionExportRoster = QAction("Export Radios...", self)
+        self.menuFile.insertActions(
+            self.actionExit, [self.actionImportRoster, self.actionExportRoster]
+        )
+        self.menuRadios = QMenu("Radios", self)
+        self.menuBar().insertMenu(self.menuWindow.menuAction(), self.menuRadios)
+        self.actionPollAll = QAction("Poll All Radios", self)
+        self.actionPollSelection = QAction("Poll Selected Radios", self)
+        self.actionCancelSweep = QAction("Cancel Polling", self)
+        self.actionCancelSweep.setEnabled(False)
+        self.actionAdaptivePolling = QAction("Adaptive Polling", self)
+        self.actionAdaptivePolling.setCheckable(True)
+        self.menuRadios.addActions(
+            [self.actionPollAll, self.actionPollSelection, self.actionCancelSweep]
+        )
+        self.menuRadios.addSeparator()
+        self.menuRadios.addAction(self.actionAdaptivePolling)
         self.setStatusBar(QStatusBar(self))
+        self.queueDepthLabel = QLabel("Queue: 0", self)
+        self.statusBar().addPermanentWidget(self.queueDepthLabel)
+        self.airtimeLabel = QLabel(self)
+        self.statusBar().addPermanentWidget(self.airtimeLabel)
+
+        # Serial ports are enumerated in the background from now on.
+        self.port_registry = PortRegistry(parent=self)
+        self.port_registry.start()
+
+        self.gateways = None
 
         # First run without any settings configured.
         if not self.saved_settings.contains("default_port"):
             self.open_settings_dialog()
 
-        self.serial_port = None
-        self.open_serial_port()
-        self.ksync = KSync(self.serial_port)
+        self.gnss_sweep = None
+        self.open_gateways()
+        self.poll_scheduler = PollScheduler(
+            base_interval=float(self.saved_settings.value("poll_base_interval", 600)),
+            poll_interval=float(self.saved_settings.value("poll_interval", 5)),
+            parent=self,
+        )
+        self.poll_scheduler.load()
         self.connect_signals_slots()
+        self.actionAdaptivePolling.setChecked(
+            self.saved_settings.value("adaptive_polling", False, type=bool)
+        )
 
-    def close_serial_port(self) -> None:
+    def closeEvent(self, event) -> None:
         """
-        Close the serial port if it was open.
+        Stop the gateway threads before the window closes.
 
+        :param event: The QCloseEvent.
         :return: None
         """
-
-        if self.serial_port.isOpen():
-            self.serial_port.close()
+        self.gateways.stop()
+        self.port_registry.stop()
+        super().closeEvent(event)
 
     def connect_signals_slots(self) -> None:
         """
@@ -92,6 +155,12 @@ class Window(QMainWindow, Ui_MainWindow):
         """
 
         self.actionExit.triggered.connect(self.close)
+        self.actionExportRoster.triggered.connect(self.export_roster)
+        self.actionImportRoster.triggered.connect(self.import_roster)
+        self.actionPollAll.triggered.connect(self.poll_all_radios)
+        self.actionPollSelection.triggered.connect(self.poll_selected_radios)
+        self.actionCancelSweep.triggered.connect(self.cancel_gnss_sweep)
+        self.actionAdaptivePolling.toggled.connect(self.set_adaptive_polling)
         self.actionQueryLocation.triggered.connect(self.open_query_location_dialog)
         self.actionLoggingConsole.triggered.connect(self.open_logging_dialog)
         self.actionSettings.triggered.connect(self.open_settings_dialog)
@@ -102,7 +171,33 @@ class Window(QMainWindow, Ui_MainWindow):
         self.radioTable.customContextMenuRequested.connect(
             self.radio_table_context_menu
         )
-        self.serial_port.readyRead.connect(self.display_data_statusbar)
+        self.gateways.frames_received.connect(self.display_frames_statusbar)
+        self.gateways.frames_received.connect(self.radiosModel.record_frames)
+        self.gateways.frames_received.connect(self.poll_scheduler.handle_frames)
+        self.gateways.queue_depth_changed.connect(self.poll_scheduler.set_queue_depth)
+        self.poll_scheduler.poll_requested.connect(self.poll_gnss_requested)
+        model = self.radiosModel.model
+        model.modelReset.connect(self.poll_scheduler.load)
+        model.rowsInserted.connect(self._schedule_inserted_radios)
+        model.rowsAboutToBeRemoved.connect(self._unschedule_removed_radios)
+        model.dataChanged.connect(self._reschedule_edited_radios)
+        self.gateways.queue_depth_changed.connect(self.display_queue_depth)
+        self.gateways.airtime_changed.connect(self.display_airtime_budget)
+        self.gateways.send_failed.connect(self.display_send_failure)
+        self.gateways.port_error.connect(self.display_send_failure)
+        self.gateways.port_lost.connect(self.display_port_lost)
+        self.gateways.port_restored.connect(self.display_port_restored)
+        self.send_text_requested.connect(self.gateways.send_text)
+        self.poll_gnss_requested.connect(self.gateways.poll_gnss)
+
+    def cancel_gnss_sweep(self) -> None:
+        """
+        Stop the running GNSS sweep.
+
+        :return: None
+        """
+        if self.gnss_sweep is not None:
+            self.gnss_sweep.cancel()
 
     def delete_radio(self) -> None:
         """
@@ -124,24 +219,139 @@ class Window(QMainWindow, Ui_MainWindow):
         if message_box == QMessageBox.StandardButton.Ok:
             self.radiosModel.delete_radio(row)
 
-    def display_data_statusbar(self) -> None:
+    def display_frames_statusbar(self, frames: list) -> None:
+        """
+        Display the most recent decoded frame on the status bar.
+
+        :param frames: The frames decoded by the serial worker.
+        :return: None
+        """
+        frame = frames[-1]
+        radio = None
+        if getattr(frame, "fleet_id", 0):
+            radio = self.radiosModel.lookup(frame.fleet_id, frame.device_id)
+
+        if radio is not None:
+            message = f"Message Received from {radio['name']}: {frame}"
+        else:
+            message = f"Message Received: {frame}"
+
+        self.statusBar().showMessage(message, timeout=5000)
+
+    def display_sweep_progress(self, done: int, total: int) -> None:
+        """
+        Show how many radios of a GNSS sweep have answered or timed out.
+
+        :param done: The radios dealt with so far.
+        :param total: The radios in the sweep.
+        :return: None
+        """
+        self.statusBar().showMessage(f"Polling radios: {done} of {total}.")
+
+    def display_airtime_budget(self, remaining: float, budget: float) -> None:
+        """
+        Show the air time left in the duty-cycle window.
+
+        :param remaining: Seconds of air time left.
+        :param budget: Seconds of air time per window.
+        :return: None
+        """
+        share = remaining / budget if budget > 0 else 0.0
+        self.airtimeLabel.setText(f"Airtime: {remaining:.0f} s ({share:.0%}) left")
+
+    def display_port_lost(self, port_name: str) -> None:
+        """
+        Warn that a gateway serial port was unplugged.
+
+        :param port_name: The name of the port.
+        :return: None
+        """
+        self.statusBar().showMessage(f"Gateway port {port_name} disconnected.")
+
+    def display_port_restored(self, port_name: str) -> None:
+        """
+        Show that a gateway serial port was plugged back in.
+
+        :param port_name: The name of the port.
+        :return: None
+        """
+        self.statusBar().showMessage(
+            f"Gateway port {port_name} reconnected.", timeout=10000
+        )
+
+    def display_queue_depth(self, depth: int) -> None:
         """
-        Display raw serial data on the status bar as it is received.
+        Show the number of outbound commands waiting to be sent.
 
+        :param depth: The outbound queue depth.
         :return: None
         """
-        line = self.serial_port.readLine()
-        logger.debug('Raw data received on serial port: %s', line)
+        self.queueDepthLabel.setText(f"Queue: {depth}")
 
-        self.statusBar().showMessage(f"Raw Message Received: {bytes(line).decode()}", timeout=5000)
+    def display_send_failure(self, message: str) -> None:
+        """
+        Show an outbound command that could not be sent.
 
-    def load_settings(self) -> dict:
+        :param message: The failure description.
+        :return: None
         """
-        Load the current program settings.
+        self.statusBar().showMessage(message, timeout=10000)
+
+    def export_roster(self) -> None:
         """
+        Export every radio to a file chosen by the user.
 
-        dialog = SettingsDialog(self)
-        return dialog.program_settings
+        :return: None
+        """
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Radios", "radios.csv", _ROSTER_FILE_FILTER
+        )
+        if not path:
+            return
+
+        count = export_roster(path)
+        self.statusBar().showMessage(f"Exported {count} radios.", timeout=5000)
+
+    def gnss_sweep_finished(self, report: object) -> None:
+        """
+        Show the outcome of a GNSS sweep and release it.
+
+        :param report: The SweepReport of the sweep.
+        :return: None
+        """
+        self.statusBar().showMessage(str(report), timeout=10000)
+        self.actionCancelSweep.setEnabled(False)
+        self.gateways.frames_received.disconnect(self.gnss_sweep.handle_frames)
+        self.gateways.poll_sent.disconnect(self.gnss_sweep.handle_poll_sent)
+        self.gnss_sweep.deleteLater()
+        self.gnss_sweep = None
+
+    def import_roster(self) -> None:
+        """
+        Import radios from a file chosen by the user and report the outcome.
+
+        :return: None
+        """
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Radios", "", _ROSTER_FILE_FILTER
+        )
+        if not path:
+            return
+
+        report = import_roster(path)
+        # A bulk import is the one case where reading the whole table is cheaper.
+        self.radiosModel.model.select()
+
+        message_box = QMessageBox(
+            QMessageBox.Icon.Warning if report.errors else QMessageBox.Icon.Information,
+            "Import Radios",
+            f"Imported {report.imported} radios.",
+            QMessageBox.StandardButton.Ok,
+            self,
+        )
+        if report.duplicates or report.errors:
+            message_box.setDetailedText(str(report))
+        message_box.exec()
 
     def open_add_dialog(self) -> None:
         """
@@ -150,39 +360,82 @@ class Window(QMainWindow, Ui_MainWindow):
         :return: None
         """
 
+        from kconsole.views.add_dialog import AddDialog
+
         dialog = AddDialog(self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self.radiosModel.add_radio(dialog.data)
-            self.radioTable.resizeColumnsToContents()
+            if self.radiosModel.add_radio(dialog.data):
+                self._fit_columns_to_row(self.radiosModel.model.rowCount() - 1)
+            else:
+                QMessageBox.critical(
+                    self,
+                    "Error",
+                    "Unable to add the radio, the fleet and device ID may "
+                    "already be in use.",
+                )
+
+    def _fit_columns_to_row(self, row: int) -> None:
+        """
+        Widen columns that are too narrow for a single row, columns are never
+        shrunk so the rest of the table does not need to be measured.
+
+        :param row: The row to fit.
+        :return: None
+        """
+        header = self.radioTable.horizontalHeader()
+        model = self.radiosModel.model
+        metrics = self.radioTable.fontMetrics()
+        for column in range(model.columnCount()):
+            text = str(model.index(row, column).data() or "")
+            # Allow for the cell margins.
+            width = metrics.horizontalAdvance(text) + 2 * metrics.averageCharWidth()
+            if width > header.sectionSize(column):
+                header.resizeSection(column, width)
 
     def open_broadcast_message_dialog(self) -> None:
         """
         Open the Broadcast Message dialog.
         """
 
+        from kconsole.views.text_dialog import TextDialog
+
         dialog = TextDialog(self)
         dialog.broadcastCheckBox.setChecked(True)
         if dialog.exec() == QDialog.DialogCode.Accepted:
 
-            if dialog.broadcast:
-                self.ksync.send_text(message=dialog.message, broadcast=dialog.broadcast)
-            else:
-                self.ksync.send_text(
-                    message=dialog.message,
-                    fleet_id=dialog.fleet_id,
-                    device_id=dialog.device_id,
-                )
+            self.send_text_requested.emit(
+                dialog.message,
+                dialog.fleet_id,
+                dialog.device_id,
+                dialog.broadcast,
+                self._text_priority(dialog),
+            )
 
     def open_logging_dialog(self) -> None:
         """
         Open the logging 'Console' in a non modal QDialog.
 
-        The QDialog is already initalized much further up but it is hidden.
-        This method simply shows the hidden dialog.
+        The QDialog is built the first time, later it is hidden when closed
+        and this method simply shows it again.
 
         :return: None
         """
 
+        if self._console_dialog is None:
+            from kconsole.views.logging_dialog import LoggingDialog
+
+            self._console_dialog = LoggingDialog(
+                self,
+                max_lines=self.console_handler.capacity,
+                log_database=self.log_database,
+            )
+            self.console_handler.bridge.sigLog.connect(
+                self._console_dialog.loggingConsole.appendPlainText
+            )
+            self._console_dialog.visibility_changed.connect(
+                self.console_handler.set_visible
+            )
+
         self._console_dialog.show()
 
         logger.debug("Logging console called.")
@@ -193,14 +446,16 @@ class Window(QMainWindow, Ui_MainWindow):
 
         :return: None
         """
-        record = self.radiosModel.model.record(self.radioTable.currentIndex().row())
+        radio = self.radiosModel.radio(self.radioTable.currentIndex().row())
+
+        from kconsole.views.query_location_dialog import QueryLocationDialog
 
         dialog = QueryLocationDialog(
-            self, fleet_id=record.value("fleet_id"), device_id=record.value("device_id")
+            self, fleet_id=radio.get("fleet_id"), device_id=radio.get("device_id")
         )
 
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self.ksync.poll_gnss(fleet_id=dialog.fleet_id, device_id=dialog.device_id)
+            self.poll_gnss_requested.emit(dialog.fleet_id, dialog.device_id)
 
     def open_settings_dialog(self) -> None:
         """
@@ -209,8 +464,25 @@ class Window(QMainWindow, Ui_MainWindow):
         :return: None
         """
 
-        dialog = SettingsDialog(self)
+        # Built on demand, it enumerates every serial port.
+        from kconsole.views.settings_dialog import SettingsDialog
+
+        # The selected radio, or the first one, answers the line probe.
+        radio = self.radiosModel.radio(
+            self.radioTable.currentIndex().row()
+        ) or self.radiosModel.radio(0)
+        dialog = SettingsDialog(
+            self,
+            port_registry=self.port_registry,
+            probe_target=(radio["fleet_id"], radio["device_id"]) if radio else None,
+        )
+        # None on the first run, the gateways are started after the dialog.
+        if self.gateways is not None:
+            dialog.settings_saved.connect(self.gateways.reload_settings)
+            dialog.port_claimed.connect(self.gateways.release_port)
+            dialog.port_released.connect(self.gateways.reopen_port)
         dialog.exec()
+        dialog.deleteLater()
 
     def open_text_dialog(self) -> None:
         """
@@ -218,35 +490,161 @@ class Window(QMainWindow, Ui_MainWindow):
 
         :return: None
         """
-        record = self.radiosModel.model.record(self.radioTable.currentIndex().row())
-        fleet_id = record.value("fleet_id")
-        device_id = record.value("device_id")
+        radio = self.radiosModel.radio(self.radioTable.currentIndex().row())
+        fleet_id = radio.get("fleet_id")
+        device_id = radio.get("device_id")
+
+        from kconsole.views.text_dialog import TextDialog
 
         dialog = TextDialog(self, fleet_id=fleet_id, device_id=device_id)
 
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self.ksync.send_text(
-                message=dialog.message,
-                fleet_id=dialog.fleet_id,
-                device_id=dialog.device_id,
+            self.send_text_requested.emit(
+                dialog.message,
+                dialog.fleet_id,
+                dialog.device_id,
+                False,
+                self._text_priority(dialog),
             )
 
-    def open_serial_port(self) -> None:
+    def open_gateways(self) -> None:
         """
-        Open the QSerialport object for use in the program.
+        Start the gateway manager, which opens every configured serial port.
+
+        Each port, with its KSync and frame decoding, lives in its own worker
+        thread and the frame store in another, so slow writes or heavy reads
+        never block the GUI.
         """
 
-        self.serial_port = QSerialPort(self.saved_settings.value("default_port"))
-        self.serial_port.setBaudRate(self.settings["baud_rate"])
-        self.serial_port.setParity(self.settings["parity"])
-        self.serial_port.setDataBits(self.settings["data_bits"])
-        self.serial_port.setStopBits(self.settings["stop_bits"])
-        self.serial_port.setFlowControl(self.settings["flow_control"])
+        self.gateways = GatewayManager(
+            self, self.capture_directory, self.compress_capture
+        )
+        self.gateways.start()
+        self.gateways.watch_ports(self.port_registry)
+
+    def poll_all_radios(self) -> None:
+        """
+        Poll the position of every radio in the table.
+
+        :return: None
+        """
+        self.start_gnss_sweep(
+            [
+                (fleet_id, device_id)
+                for fleet_id, device_id, _ in self.radiosModel.model.keys()
+            ]
+        )
+
+    def poll_selected_radios(self) -> None:
+        """
+        Poll the position of the selected radios.
+
+        :return: None
+        """
+        radios = [
+            self.radiosModel.radio(index.row())
+            for index in self.radioTable.selectionModel().selectedRows()
+        ]
+        self.start_gnss_sweep(
+            [(radio["fleet_id"], radio["device_id"]) for radio in radios]
+        )
+
+    def set_adaptive_polling(self, enabled: bool) -> None:
+        """
+        Start or stop the adaptive poll scheduler and remember the choice.
 
-        if self.serial_port.open(QIODevice.OpenModeFlag.ReadWrite):
-            return None
+        :param enabled: True to start polling.
+        :return: None
+        """
+        self.saved_settings.setValue("adaptive_polling", enabled)
+        if enabled:
+            self.poll_scheduler.start()
         else:
-            logger.info('Unable to open serial port due to error: %s', self.serial_port.error())
+            self.poll_scheduler.stop()
+
+    def start_gnss_sweep(self, radios: list) -> None:
+        """
+        Poll the position of several radios with a few polls in flight.
+
+        :param radios: (fleet_id, device_id) tuples of the radios to poll.
+        :return: None
+        """
+        if not radios:
+            return
+
+        # Only one sweep at a time, a new one replaces the running one.
+        self.cancel_gnss_sweep()
+
+        self.gnss_sweep = GnssSweep(
+            radios,
+            in_flight=int(self.saved_settings.value("sweep_in_flight", 4)),
+            timeout=float(self.saved_settings.value("sweep_timeout", 10.0)),
+            parent=self,
+        )
+        self.gnss_sweep.poll_requested.connect(self.poll_gnss_requested)
+        self.gnss_sweep.progress.connect(self.display_sweep_progress)
+        self.gnss_sweep.finished.connect(self.gnss_sweep_finished)
+        self.gateways.frames_received.connect(self.gnss_sweep.handle_frames)
+        self.gateways.poll_sent.connect(self.gnss_sweep.handle_poll_sent)
+        self.actionCancelSweep.setEnabled(True)
+        self.gnss_sweep.start()
+
+    @staticmethod
+    def _text_priority(dialog: QDialog) -> int:
+        """
+        The outbound priority of a text entered in a TextDialog.
+
+        :param dialog: The accepted dialog.
+        :return: The Priority of the text.
+        """
+        return Priority.EMERGENCY if dialog.emergency else Priority.ROUTINE
+
+    def _schedule_inserted_radios(self, parent, first: int, last: int) -> None:
+        """
+        Add radios added to the table to the poll schedule.
+
+        :param parent: Unused, the table has no hierarchy.
+        :param first: The first inserted row.
+        :param last: The last inserted row.
+        :return: None
+        """
+        for row in range(first, last + 1):
+            radio = self.radiosModel.radio(row)
+            self.poll_scheduler.set_radio(
+                radio["fleet_id"], radio["device_id"], radio["poll_priority"]
+            )
+
+    def _unschedule_removed_radios(self, parent, first: int, last: int) -> None:
+        """
+        Remove radios about to be deleted from the poll schedule.
+
+        :param parent: Unused, the table has no hierarchy.
+        :param first: The first removed row.
+        :param last: The last removed row.
+        :return: None
+        """
+        for row in range(first, last + 1):
+            radio = self.radiosModel.radio(row)
+            self.poll_scheduler.remove_radio(radio["fleet_id"], radio["device_id"])
+
+    def _reschedule_edited_radios(self, top_left, bottom_right) -> None:
+        """
+        Follow edits of the poll priority or IDs of radios.
+
+        :param top_left: The first changed index.
+        :param bottom_right: The last changed index.
+        :return: None
+        """
+        model = self.radiosModel.model
+        columns = range(top_left.column(), bottom_right.column() + 1)
+
+        if model.fieldIndex("fleet_id") in columns or (
+            model.fieldIndex("device_id") in columns
+        ):
+            # Radios are scheduled by their IDs, so an edited ID is reloaded.
+            self.poll_scheduler.load()
+        elif model.fieldIndex("poll_priority") in columns:
+            self._schedule_inserted_radios(None, top_left.row(), bottom_right.row())
 
     def radio_table_context_menu(self, position: QPoint) -> None:
         """
@@ -259,14 +657,5 @@ class Window(QMainWindow, Ui_MainWindow):
         context = QMenu(self)
         context.addAction(self.actionQueryLocation)
         context.addAction(self.actionTextRadio)
+        context.addAction(self.actionPollSelection)
         context.exec(self.radioTable.mapToGlobal(position))
-
-
-class LoggingDialog(QDialog, Ui_loggingDialog):
-    """
-    Logging Dialog
-    """
-
-    def __init__(self, parent=None):
-        super().__init__(parent=parent)
-        self.setupUi(self)
@@ -2,6 +2,7 @@ from PySide6.QtWidgets import (
     QDialog,
     QMessageBox,
 )
+from kconsole.roster import validate_radio
 from kconsole.ui.add_dialog_ui import Ui_AddDialog
 
 
@@ -22,21 +23,15 @@ class AddDialog(QDialog, Ui_AddDialog):
         :return: None
         """
 
-        if len(self.fleetIdspinBox.text()) != 3:
-            QMessageBox.critical(self, "Error", "Fleet ID must be three characters.")
-            return
+        name = self.nameField.text()
+        fleet_id = self.fleetIdspinBox.text()
+        device_id = self.deviceIdspinBox.text()
 
-        if len(self.deviceIdspinBox.text()) != 4:
-            QMessageBox.critical(self, "Error", "Device ID must be four characters.")
+        error = validate_radio(name, fleet_id, device_id)
+        if error:
+            QMessageBox.critical(self, "Error", error)
             return
 
-        for field in (self.nameField, self.fleetIdspinBox, self.deviceIdspinBox):
-            if not field.text():
-                QMessageBox.critical(
-                    self, "Error", f"You must provide {field.objectName()}."
-                )
-                return
-
-            self.data.append(field.text())
+        self.data = [name, fleet_id, device_id]
 
         super().accept()
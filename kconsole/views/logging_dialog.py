@@ -0,0 +1,157 @@
+import logging
+
+from PySide6.QtCore import QDateTime, Signal
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
+    QDateTimeEdit,
+    QDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLineEdit,
+    QPushButton,
+    QTableView,
+    QTabWidget,
+    QVBoxLayout,
+    QWidget,
+)
+
+from kconsole.logs import LogHistoryModel
+from kconsole.ui.logging_dialog_ui import Ui_loggingDialog
+
+# The levels offered by the history filter, each including those above it.
+_LEVELS = (
+    logging.DEBUG,
+    logging.INFO,
+    logging.WARNING,
+    logging.ERROR,
+    logging.CRITICAL,
+)
+
+
+class LoggingDialog(QDialog, Ui_loggingDialog):
+    """
+    Logging Dialog
+    """
+
+    visibility_changed = Signal(bool)
+
+    def __init__(self, parent=None, max_lines: int = 5000, log_database=None):
+        """
+        :param parent: parent widget.
+        :param max_lines: The number of lines kept, older ones are removed.
+        :param log_database: The log database to search in the History tab,
+        the tab is disabled if None.
+        """
+        super().__init__(parent=parent)
+        self.setupUi(self)
+        self.resize(800, 400)
+        self.loggingConsole.setMaximumBlockCount(max_lines)
+
+        # The live console becomes the first of two tabs.
+        self.tabs = QTabWidget(self)
+        self.verticalLayout.removeWidget(self.loggingConsole)
+        self.tabs.addTab(self.loggingConsole, "Live")
+        self.verticalLayout.insertWidget(0, self.tabs)
+
+        self.history = QWidget(self.tabs)
+        self.levelBox = QComboBox(self.history)
+        for level in _LEVELS:
+            self.levelBox.addItem(logging.getLevelName(level), level)
+        self.loggerEdit = QLineEdit(self.history)
+        self.loggerEdit.setPlaceholderText("Logger, e.g. kconsole.worker")
+        self.startEdit = self._date_time_edit("Any time")
+        self.startEdit.setDateTime(QDateTime.currentDateTime().addDays(-1))
+        self.endEdit = self._date_time_edit("Now")
+        self.searchButton = QPushButton("Search", self.history)
+        self.historyView = QTableView(self.history)
+        self.historyView.setSelectionBehavior(
+            QAbstractItemView.SelectionBehavior.SelectRows
+        )
+        self.historyView.verticalHeader().hide()
+        self.historyView.horizontalHeader().setStretchLastSection(True)
+
+        filters = QHBoxLayout()
+        filters.addWidget(self.levelBox)
+        filters.addWidget(self.loggerEdit)
+        filters.addWidget(self.startEdit)
+        filters.addWidget(self.endEdit)
+        filters.addWidget(self.searchButton)
+        layout = QVBoxLayout(self.history)
+        layout.addLayout(filters)
+        layout.addWidget(self.historyView)
+        self.tabs.addTab(self.history, "History")
+
+        self.history_model = None
+        if log_database is None:
+            self.tabs.setTabEnabled(1, False)
+            self.tabs.setTabToolTip(1, "Logging to a database is turned off.")
+        else:
+            self.history_model = LogHistoryModel(log_database, parent=self)
+            self.historyView.setModel(self.history_model)
+            self.historyView.horizontalHeader().setSectionResizeMode(
+                QHeaderView.ResizeMode.ResizeToContents
+            )
+
+        self.searchButton.clicked.connect(self.search_history)
+        self.loggerEdit.returnPressed.connect(self.search_history)
+        self.tabs.currentChanged.connect(self._tab_changed)
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self.visibility_changed.emit(True)
+
+    def hideEvent(self, event) -> None:
+        super().hideEvent(event)
+        self.visibility_changed.emit(False)
+
+    def search_history(self) -> None:
+        """
+        Show the newest logged records matching the filters, older ones are
+        loaded as the table is scrolled down.
+        """
+
+        if self.history_model is None:
+            return
+
+        self.history_model.set_filter(
+            level=self.levelBox.currentData(),
+            logger_name=self.loggerEdit.text().strip(),
+            start=self._seconds(self.startEdit),
+            end=self._seconds(self.endEdit),
+        )
+        self.historyView.scrollToTop()
+
+    def _date_time_edit(self, unset_text: str) -> QDateTimeEdit:
+        """
+        A date and time filter that is unset at its minimum.
+
+        :param unset_text: The text shown while unset.
+        :return: The QDateTimeEdit.
+        """
+        edit = QDateTimeEdit(self.history)
+        edit.setCalendarPopup(True)
+        edit.setDisplayFormat("yyyy-MM-dd HH:mm")
+        edit.setMinimumDateTime(QDateTime.fromSecsSinceEpoch(0))
+        edit.setSpecialValueText(unset_text)
+        edit.setDateTime(edit.minimumDateTime())
+        return edit
+
+    @staticmethod
+    def _seconds(edit: QDateTimeEdit):
+        """
+        :param edit: A filter made by _date_time_edit().
+        :return: The seconds since the epoch, or None if unset.
+        """
+        if edit.dateTime() == edit.minimumDateTime():
+            return None
+        return edit.dateTime().toSecsSinceEpoch()
+
+    def _tab_changed(self, index: int) -> None:
+        """
+        Search with the default filters the first time History is shown.
+        """
+
+        if self.tabs.widget(index) is self.history and self.history_model is not None:
+            if not self.history_model.rowCount():
+                self.search_history()
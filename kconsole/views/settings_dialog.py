@@ -1,7 +1,28 @@
-from PySide6.QtCore import QSettings
-from PySide6.QtSerialPort import QSerialPort, QSerialPortInfo
-from PySide6.QtWidgets import QDialog
+import re
 
+from PySide6.QtCore import QRegularExpression, QSettings, Qt, QThread, Signal
+from PySide6.QtGui import QRegularExpressionValidator
+from PySide6.QtSerialPort import QSerialPortInfo
+from PySide6.QtWidgets import (
+    QDialog,
+    QGridLayout,
+    QGroupBox,
+    QLabel,
+    QLineEdit,
+    QListWidget,
+    QListWidgetItem,
+    QPushButton,
+)
+
+from kconsole.ports import port_info
+from kconsole.settings import (
+    BAUD_RATES,
+    DATA_BITS,
+    FLOW_CONTROLS,
+    PARITIES,
+    PORT_SETTINGS,
+    STOP_BITS,
+)
 from kconsole.ui.settings_dialog_ui import Ui_SettingsDialog
 
 
@@ -10,36 +31,59 @@ class SettingsDialog(QDialog, Ui_SettingsDialog):
     Build the settings dialog.
     """
 
-    def __init__(self, parent=None):
-        """Initializer."""
+    # Emitted once the settings have been written to permanent storage.
+    settings_saved = Signal()
+    # The line probe needs the port to itself, a gateway using it must let it
+    # go when claimed and reopen it when released.
+    port_claimed = Signal(str)
+    port_released = Signal(str)
+
+    def __init__(self, parent=None, port_registry=None, probe_target=None):
+        """
+        Initializer.
+
+        :param parent: parent widget.
+        :param port_registry: A PortRegistry to list the ports from, the ports
+        are enumerated while building the dialog if None.
+        :param probe_target: The (fleet_id, device_id) of a radio to query
+        when detecting the line parameters, detection is disabled if None.
+        """
         super().__init__(parent=parent)
         self.setupUi(self)
         self.saved_settings = QSettings()
         self.program_settings = {}
+        self.port_registry = port_registry
+        self.probe_target = probe_target
+        self.probe = None
+        self.probe_thread = None
+        self.detectButton = QPushButton("Detect", self.parametersBox)
+        self.detectButton.setEnabled(probe_target is not None)
+        self.detectButton.setToolTip(
+            "Find the fastest settings the gateway radio answers on."
+            if probe_target is not None
+            else "Add a radio to detect the settings with."
+        )
+        self.gridLayout_2.addWidget(self.detectButton, 5, 0, 1, 2)
+        # Port name -> the line setting texts chosen but not saved yet.
+        self.port_texts = {}
+        self._shown_port = None
+        self._shown_texts = {}
+        self.build_gateways_box()
         self.fill_ports_info()
         self.fill_baud_options()
         self.fill_data_bits_options()
         self.fill_parity_bits_options()
         self.fill_stop_bits_options()
         self.fill_flow_control_options()
+        self.fill_gateways()
 
         # If Default_Port is defined set the settings to that and display the port info.
         if self.saved_settings.value("default_port"):
             self.serialPortInfoListBox.setCurrentText(
                 self.saved_settings.value("default_port")
             )
-            self.show_port_info(self.serialPortInfoListBox.currentIndex())
-            self.saved_settings.beginGroup(self.serialPortInfoListBox.currentText())
-            self.baudRateBox.setCurrentText(self.saved_settings.value("baud_rate"))
-            self.dataBitsBox.setCurrentText(self.saved_settings.value("data_bits"))
-            self.parityBox.setCurrentText(self.saved_settings.value("parity_bits"))
-            self.stopBitsBox.setCurrentText(self.saved_settings.value("stop_bits"))
-            self.flowControlBox.setCurrentText(
-                self.saved_settings.value("flow_control")
-            )
-            self.saved_settings.endGroup()
-        else:
-            self.show_port_info(self.serialPortInfoListBox.currentIndex())
+        self.show_port_info(self.serialPortInfoListBox.currentIndex())
+        self.show_port_settings(self.serialPortInfoListBox.currentText())
 
         self.update_program_settings()
         self.connect_signal_slots()
@@ -50,57 +94,302 @@ class SettingsDialog(QDialog, Ui_SettingsDialog):
         """
 
         self.serialPortInfoListBox.currentIndexChanged.connect(self.show_port_info)
+        self.serialPortInfoListBox.currentTextChanged.connect(self.switch_port)
+        self.gatewayList.currentItemChanged.connect(self.show_gateway)
+        self.addGatewayButton.clicked.connect(self.add_gateway)
+        self.removeGatewayButton.clicked.connect(self.remove_gateway)
+        self.fleetsEdit.textEdited.connect(self.set_gateway_fleets)
+        if self.port_registry is not None:
+            self.port_registry.port_added.connect(self.add_port)
+            self.port_registry.port_removed.connect(self.remove_port)
+            self.port_registry.refresh()
         self.buttonBox.accepted.connect(self.save_settings)
         self.buttonBox.accepted.connect(self.update_program_settings)
+        self.detectButton.clicked.connect(self.detect_settings)
+
+    def detect_settings(self) -> None:
+        """
+        Probe the selected port for the fastest line parameters the gateway
+        radio answers on, selecting them once found.
+        """
+        # Imported on first use, the probe is rarely needed.
+        from kconsole.probe import LineProbe, candidates
+
+        port_name = self.serialPortInfoListBox.currentText()
+        if not port_name or self.probe_thread is not None:
+            return
+
+        self.port_claimed.emit(port_name)
+        self.probe_thread = QThread(self)
+        self.probe = LineProbe(
+            port_name,
+            *self.probe_target,
+            candidate_list=candidates(
+                data_bits=self.dataBitsBox.currentText(),
+                flow_control=self.flowControlBox.currentText(),
+            ),
+            timeout=float(self.saved_settings.value("probe_timeout", 3.0)),
+        )
+        self.probe.moveToThread(self.probe_thread)
+        self.probe_thread.started.connect(self.probe.start)
+        # Emitted from the probe thread once its event loop has stopped.
+        self.probe_thread.finished.connect(self.probe.cancel)
+        self.probe_thread.finished.connect(self.probe.deleteLater)
+        self.probe.progress.connect(self.show_probe_progress)
+        self.probe.finished.connect(self.probe_finished)
+        self.detectButton.setEnabled(False)
+        self.probe_thread.start()
+
+    def show_probe_progress(self, done: int, total: int) -> None:
+        """
+        Display how many candidates the probe has tried.
+        """
+
+        self.detectButton.setText(f"Detecting... {done}/{total}")
+
+    def probe_finished(self, texts: object) -> None:
+        """
+        Select the detected settings and give the port back.
+
+        :param texts: The QSettings texts of the detected settings, or None if
+        the radio never answered.
+        """
+
+        # Already stopped if the dialog was closed meanwhile.
+        if self.probe_thread is None:
+            return
+
+        self.port_released.emit(self._stop_probe())
+        if texts is None:
+            self.detectButton.setText("Detect (no answer)")
+            return
+
+        self.baudRateBox.setCurrentText(texts["baud_rate"])
+        self.dataBitsBox.setCurrentText(texts["data_bits"])
+        self.parityBox.setCurrentText(texts["parity"])
+        self.stopBitsBox.setCurrentText(texts["stop_bits"])
+        self.flowControlBox.setCurrentText(texts["flow_control"])
+        self.detectButton.setText("Detect")
+
+    def done(self, result: int) -> None:
+        """
+        Stop a running probe before the dialog closes.
+        """
+
+        if self.probe_thread is not None:
+            self.port_released.emit(self._stop_probe())
+        super().done(result)
+
+    def _stop_probe(self) -> str:
+        """
+        Wait for the probe thread to end.
+
+        :return: The name of the probed port.
+        """
+        port_name = self.probe.port_name
+        self.probe_thread.quit()
+        self.probe_thread.wait()
+        self.probe_thread = None
+        self.probe = None
+        self.detectButton.setEnabled(True)
+        return port_name
+
+    def build_gateways_box(self) -> None:
+        """
+        Add the list of gateway ports and the fleets routed to each of them
+        below the port settings.
+        """
+
+        self.gatewaysBox = QGroupBox("Gateways", self)
+        layout = QGridLayout(self.gatewaysBox)
+        self.gatewayList = QListWidget(self.gatewaysBox)
+        self.gatewayList.setToolTip(
+            "The ports opened as gateway radios, the selected port alone if empty."
+        )
+        self.addGatewayButton = QPushButton("Add selected port", self.gatewaysBox)
+        self.removeGatewayButton = QPushButton("Remove", self.gatewaysBox)
+        self.fleetsEdit = QLineEdit(self.gatewaysBox)
+        self.fleetsEdit.setPlaceholderText("Any fleet")
+        self.fleetsEdit.setToolTip(
+            "Comma separated fleet IDs sent through this gateway only, "
+            "other fleets share the gateways without any."
+        )
+        self.fleetsEdit.setValidator(
+            QRegularExpressionValidator(QRegularExpression(r"[\d,\s]*"), self)
+        )
+        layout.addWidget(self.gatewayList, 0, 0, 1, 2)
+        layout.addWidget(self.addGatewayButton, 1, 0, 1, 1)
+        layout.addWidget(self.removeGatewayButton, 1, 1, 1, 1)
+        layout.addWidget(QLabel("Fleets:", self.gatewaysBox), 2, 0, 1, 1)
+        layout.addWidget(self.fleetsEdit, 2, 1, 1, 1)
+
+        # Keep the dialog buttons at the bottom.
+        self.gridLayout_3.removeItem(self.horizontalLayout)
+        self.gridLayout_3.addWidget(self.gatewaysBox, 1, 0, 1, 2)
+        self.gridLayout_3.addLayout(self.horizontalLayout, 2, 0, 1, 2)
+        self.show_gateway(None)
+
+    def fill_gateways(self) -> None:
+        """
+        Fill in the configured gateways, the default port if none are listed.
+        """
+
+        port_names = self.saved_settings.value("gateways", [], type=list)
+        if not port_names and self.saved_settings.value("default_port"):
+            port_names = [self.saved_settings.value("default_port")]
+
+        for port_name in port_names:
+            fleets = self.saved_settings.value(f"{port_name}/fleets", "")
+            if isinstance(fleets, list):
+                fleets = ",".join(fleets)
+            item = QListWidgetItem(port_name, self.gatewayList)
+            item.setData(Qt.ItemDataRole.UserRole, fleets)
+
+    def add_gateway(self) -> None:
+        """
+        Open the selected port as a gateway too.
+        """
+
+        port_name = self.serialPortInfoListBox.currentText()
+        if not port_name:
+            return
+
+        items = self.gatewayList.findItems(port_name, Qt.MatchFlag.MatchExactly)
+        if items:
+            self.gatewayList.setCurrentItem(items[0])
+            return
+
+        item = QListWidgetItem(port_name, self.gatewayList)
+        item.setData(Qt.ItemDataRole.UserRole, "")
+        self.gatewayList.setCurrentItem(item)
+
+    def remove_gateway(self) -> None:
+        """
+        Stop using the selected gateway port.
+        """
+
+        self.gatewayList.takeItem(self.gatewayList.currentRow())
+
+    def show_gateway(self, item: QListWidgetItem) -> None:
+        """
+        Display the fleets of the selected gateway and select its port.
+
+        :param item: The selected gateway, None if there is none.
+        """
+
+        self.removeGatewayButton.setEnabled(item is not None)
+        self.fleetsEdit.setEnabled(item is not None)
+        if item is None:
+            self.fleetsEdit.clear()
+            return
+
+        self.fleetsEdit.setText(item.data(Qt.ItemDataRole.UserRole))
+        if self.serialPortInfoListBox.findText(item.text()) != -1:
+            self.serialPortInfoListBox.setCurrentText(item.text())
+
+    def set_gateway_fleets(self, text: str) -> None:
+        """
+        Route the fleets typed in to the selected gateway.
+        """
+
+        item = self.gatewayList.currentItem()
+        if item is not None:
+            item.setData(Qt.ItemDataRole.UserRole, text)
+
+    def switch_port(self, port_name: str) -> None:
+        """
+        Keep the settings chosen for the previous port and display those of
+        the newly selected one.
+
+        :param port_name: The name of the selected port.
+        """
+
+        texts = self.line_texts()
+        if self._shown_port and texts != self._shown_texts:
+            self.port_texts[self._shown_port] = texts
+        self.show_port_settings(port_name)
+
+    def show_port_settings(self, port_name: str) -> None:
+        """
+        Display the line settings of a port, as chosen in this dialog or as
+        saved. A port without any keeps the settings on display.
+
+        :param port_name: The name of the port.
+        """
+
+        texts = self.port_texts.get(port_name)
+        if texts is None:
+            self.saved_settings.beginGroup(port_name)
+            texts = {key: self.saved_settings.value(key) for key in PORT_SETTINGS}
+            self.saved_settings.endGroup()
+
+        for key, box in self.line_boxes().items():
+            if texts[key] is not None:
+                box.setCurrentText(texts[key])
+        self._shown_port = port_name
+        self._shown_texts = self.line_texts()
+
+    def line_boxes(self) -> dict:
+        """
+        :return: Setting key -> the combo box choosing it.
+        """
+
+        return {
+            "baud_rate": self.baudRateBox,
+            "data_bits": self.dataBitsBox,
+            "parity": self.parityBox,
+            "stop_bits": self.stopBitsBox,
+            "flow_control": self.flowControlBox,
+        }
+
+    def line_texts(self) -> dict:
+        """
+        :return: Setting key -> the text chosen for it.
+        """
+
+        return {key: box.currentText() for key, box in self.line_boxes().items()}
 
     def fill_baud_options(self) -> None:
         """
         Fill in the Baud rate info options for the serial port.
         Indications are that only 4800 and 9600 work with
-        Kenwood Radios. Need more info to confirm.
+        Kenwood Radios, Detect finds out what the radio supports.
         """
 
-        self.baudRateBox.addItem("9600", QSerialPort.BaudRate.Baud9600)
-        self.baudRateBox.addItem("4800", QSerialPort.BaudRate.Baud4800)
+        for text, baud_rate in BAUD_RATES.items():
+            self.baudRateBox.addItem(text, baud_rate)
 
     def fill_data_bits_options(self) -> None:
         """
         Fill in the data bits options
         """
 
-        self.dataBitsBox.addItem("8", QSerialPort.DataBits.Data8)
-        self.dataBitsBox.addItem("7", QSerialPort.DataBits.Data7)
-        self.dataBitsBox.addItem("6", QSerialPort.DataBits.Data6)
-        self.dataBitsBox.addItem("5", QSerialPort.DataBits.Data5)
+        for text, data_bits in DATA_BITS.items():
+            self.dataBitsBox.addItem(text, data_bits)
 
     def fill_flow_control_options(self) -> None:
         """
         Fill in the flow control options.
         """
 
-        self.flowControlBox.addItem("None", QSerialPort.FlowControl.NoFlowControl)
-        self.flowControlBox.addItem("RTS/CTS", QSerialPort.FlowControl.HardwareControl)
-        self.flowControlBox.addItem("XON/XOFF", QSerialPort.FlowControl.SoftwareControl)
+        for text, flow_control in FLOW_CONTROLS.items():
+            self.flowControlBox.addItem(text, flow_control)
 
     def fill_parity_bits_options(self) -> None:
         """
         Fill in the data bits options.
         """
 
-        self.parityBox.addItem("None", QSerialPort.Parity.NoParity)
-        self.parityBox.addItem("Even", QSerialPort.Parity.EvenParity)
-        self.parityBox.addItem("Odd", QSerialPort.Parity.OddParity)
-        self.parityBox.addItem("Mark", QSerialPort.Parity.MarkParity)
-        self.parityBox.addItem("Space", QSerialPort.Parity.SpaceParity)
+        for text, parity in PARITIES.items():
+            self.parityBox.addItem(text, parity)
 
     def fill_stop_bits_options(self) -> None:
         """
         Fill in the stop bits options.
         """
 
-        self.stopBitsBox.addItem("1", QSerialPort.StopBits.OneStop)
-        self.stopBitsBox.addItem("1.5", QSerialPort.StopBits.OneAndHalfStop)
-        self.stopBitsBox.addItem("2", QSerialPort.StopBits.TwoStop)
+        for text, stop_bits in STOP_BITS.items():
+            self.stopBitsBox.addItem(text, stop_bits)
 
     def fill_ports_info(self) -> None:
         """
@@ -108,18 +397,40 @@ class SettingsDialog(QDialog, Ui_SettingsDialog):
         and provide extended information to be displayed in the settings dialog.
         """
 
-        for port in QSerialPortInfo.availablePorts():
-            port_info = {
-                "portName": port.portName(),
-                "description": port.description(),
-                "manufacturer": port.manufacturer(),
-                "serialNumber": port.serialNumber(),
-                "systemLocation": port.systemLocation(),
-                "vendorIdentifier": port.vendorIdentifier(),
-                "productIdentifier": port.productIdentifier(),
-            }
+        if self.port_registry is not None:
+            ports = self.port_registry.ports.values()
+        else:
+            ports = (port_info(port) for port in QSerialPortInfo.availablePorts())
 
-            self.serialPortInfoListBox.addItem(port_info["portName"], port_info)
+        for info in ports:
+            self.serialPortInfoListBox.addItem(info["portName"], info)
+
+    def add_port(self, port_name: str, info: dict) -> None:
+        """
+        Add a port that appeared while the dialog is open, selecting it if it
+        is the saved default port.
+
+        :param port_name: The name of the port.
+        :param info: The port details.
+        :return: None
+        """
+        if self.serialPortInfoListBox.findText(port_name) != -1:
+            return
+
+        self.serialPortInfoListBox.addItem(port_name, info)
+        if port_name == self.saved_settings.value("default_port"):
+            self.serialPortInfoListBox.setCurrentText(port_name)
+
+    def remove_port(self, port_name: str) -> None:
+        """
+        Remove a port that disappeared while the dialog is open.
+
+        :param port_name: The name of the port.
+        :return: None
+        """
+        index = self.serialPortInfoListBox.findText(port_name)
+        if index != -1:
+            self.serialPortInfoListBox.removeItem(index)
 
     def save_settings(self) -> None:
         """
@@ -129,15 +440,45 @@ class SettingsDialog(QDialog, Ui_SettingsDialog):
         port_name = self.serialPortInfoListBox.currentText()
 
         self.saved_settings.setValue("default_port", port_name)
-        self.saved_settings.beginGroup(port_name)
-        self.saved_settings.setValue("baud_rate", self.baudRateBox.currentText())
-        self.saved_settings.setValue("data_bits", self.dataBitsBox.currentText())
-        self.saved_settings.setValue("parity", self.parityBox.currentText())
-        self.saved_settings.setValue("stop_bits", self.stopBitsBox.currentText())
-        self.saved_settings.setValue("flow_control", self.flowControlBox.currentText())
-        self.saved_settings.endGroup()
+        self.port_texts[port_name] = self.line_texts()
+        for name, texts in self.port_texts.items():
+            self.saved_settings.beginGroup(name)
+            for key, text in texts.items():
+                self.saved_settings.setValue(key, text)
+            self.saved_settings.endGroup()
+        self.save_gateways()
         # Flush to permanent storage
         self.saved_settings.sync()
+        self.settings_saved.emit()
+
+    def save_gateways(self) -> None:
+        """
+        Save the gateway ports in the "gateways" list and the fleets routed
+        to each in its "fleets" setting. Without gateways the default port is
+        the only one.
+        """
+
+        port_names = []
+        for row in range(self.gatewayList.count()):
+            item = self.gatewayList.item(row)
+            port_names.append(item.text())
+            fleets = re.split(r"[,\s]+", item.data(Qt.ItemDataRole.UserRole))
+            fleets = sorted({int(fleet) for fleet in fleets if fleet})
+            if fleets:
+                self.saved_settings.setValue(
+                    f"{item.text()}/fleets", ",".join(map(str, fleets))
+                )
+            else:
+                self.saved_settings.remove(f"{item.text()}/fleets")
+
+        for port_name in self.saved_settings.value("gateways", [], type=list):
+            if port_name not in port_names:
+                self.saved_settings.remove(f"{port_name}/fleets")
+
+        if port_names:
+            self.saved_settings.setValue("gateways", port_names)
+        else:
+            self.saved_settings.remove("gateways")
 
     def show_port_info(self, index: int) -> None:
         """
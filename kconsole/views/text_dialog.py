@@ -17,6 +17,7 @@ class TextDialog(QDialog, Ui_TextDialog):
         """Initializer."""
         super().__init__(parent=parent)
         self.broadcast = False
+        self.emergency = False
         self.fleet_id = fleet_id
         self.device_id = device_id
         self.message = ""
@@ -37,6 +38,7 @@ class TextDialog(QDialog, Ui_TextDialog):
         :return: None
         """
         self.broadcast = self.broadcastCheckBox.isChecked()
+        self.emergency = self.emergencyCheckBox.isChecked()
         self.device_id = self.deviceIdSpinBox.text()
         self.fleet_id = self.fleetIdSpinBox.text()
         self.message = self.radioMessage.text()
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+
+"""This module provides the serial I/O worker that runs off the GUI thread."""
+import logging
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+from PySide6.QtSerialPort import QSerialPort
+from ksync.ksync import KSync
+
+from kconsole.airtime import AirtimeAccountant, character_time
+from kconsole.capture import CaptureWriter, Direction, RecordingPort
+from kconsole.decoder import FrameDecoder
+from kconsole.outbound import OutboundQueue, Priority
+from kconsole.supervisor import ConnectionSupervisor
+
+logger = logging.getLogger(__name__)
+
+
+class SerialWorker(QObject):
+    """
+    Own the serial port, the KSync instance and the frame decoder.
+
+    A ConnectionSupervisor keeps the port open: when the link drops the
+    outbound queue is paused and any partial frame discarded, and queued
+    commands are sent once the port is reopened.
+
+    The worker is meant to be moved to its own QThread, all interaction with
+    it must happen through (queued) signals so the GUI never blocks on the
+    serial line.
+
+    With a capture path every byte read and written, and every time the
+    link comes up or drops, is recorded to a capture file for replay.
+    """
+
+    frames_received = Signal(list)
+    port_opened = Signal(str)
+    port_error = Signal(str)
+    queue_depth_changed = Signal(int)
+    send_failed = Signal(str)
+    airtime_changed = Signal(float, float)
+    # (fleet_id, device_id, sent) once a GNSS poll left the outbound queue,
+    # sent is False if it could not be written.
+    poll_sent = Signal(object, object, bool)
+
+    def __init__(
+        self,
+        port_name: str,
+        settings: dict,
+        duty_cycle: float = 1.0,
+        duty_cycle_window: float = 3600.0,
+        capture_path: str = None,
+        compress_capture: bool = False,
+        parent=None,
+    ):
+        """
+        :param port_name: The name of the serial port to open.
+        :param settings: The program settings holding the QSerialPort enums.
+        :param duty_cycle: The share of the window that may be spent transmitting.
+        :param duty_cycle_window: The duty-cycle window in seconds.
+        :param capture_path: A file to record the traffic to, None to not record.
+        :param compress_capture: Compress the capture file.
+        :param parent: parent object, must be None to be moved to a thread.
+        """
+        super().__init__(parent)
+        self.port_name = port_name
+        self.settings = settings
+        self.duty_cycle = duty_cycle
+        self.duty_cycle_window = duty_cycle_window
+        self.capture_path = capture_path
+        self.compress_capture = compress_capture
+        self.capture = None
+        self.decoder = FrameDecoder()
+        self.serial_port = None
+        self.ksync = None
+        self.outbound = None
+        self.airtime = None
+        self.supervisor = None
+
+    @Slot()
+    def open_serial_port(self) -> None:
+        """
+        Create and open the serial port, this must run in the worker thread.
+
+        If the port can not be opened it is retried by the supervisor, and
+        commands are queued until it opens.
+
+        :return: None
+        """
+        self.serial_port = QSerialPort(self.port_name, self)
+        self.serial_port.readyRead.connect(self.read_serial_port)
+        if self.capture_path:
+            self._start_capture()
+            self.ksync = KSync(RecordingPort(self.serial_port, self.capture))
+        else:
+            self.ksync = KSync(self.serial_port)
+        self.airtime = AirtimeAccountant(
+            self.settings,
+            duty_cycle=self.duty_cycle,
+            window=self.duty_cycle_window,
+            parent=self,
+        )
+        self.airtime.budget_changed.connect(self.airtime_changed)
+        self.outbound = OutboundQueue(self.ksync, self.airtime, parent=self)
+        self.outbound.depth_changed.connect(self.queue_depth_changed)
+        self.outbound.request_sent.connect(self._report_sent)
+        self.outbound.request_failed.connect(self._report_send_failure)
+        self.outbound.pause()
+
+        self.supervisor = ConnectionSupervisor(
+            self.serial_port, self.settings, parent=self
+        )
+        self.supervisor.connected.connect(self._link_up)
+        self.supervisor.disconnected.connect(self._link_down)
+        self.airtime_changed.emit(self.airtime.remaining(), self.airtime.budget)
+
+        if not self.supervisor.open():
+            self.port_error.emit(
+                f"{self.serial_port.errorString()}, retrying in the background."
+            )
+
+    @Slot()
+    def close_serial_port(self) -> None:
+        """
+        Close the serial port if it was open and stop reopening it.
+
+        :return: None
+        """
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        if self.capture is not None:
+            self.capture.close()
+            logger.info("Capture %s closed.", self.capture.path)
+
+    @Slot()
+    def reconnect(self) -> None:
+        """
+        Retry opening the port now rather than waiting for the next attempt.
+
+        :return: None
+        """
+        if self.supervisor is not None:
+            self.supervisor.reopen_now()
+
+    @Slot()
+    def release(self) -> None:
+        """
+        Close the port for another user, e.g. the line probe, holding
+        commands until reconnect() reopens it.
+
+        :return: None
+        """
+        if self.supervisor is None:
+            return
+
+        self.outbound.pause()
+        self.supervisor.stop()
+        self.decoder.clear()
+        self._record_event("closed: released")
+        logger.info("Serial port %s released.", self.port_name)
+
+    @Slot(str, dict)
+    def reconfigure(self, port_name: str, settings: dict) -> None:
+        """
+        Apply new port settings to the live port.
+
+        Outbound commands are held and whatever is still buffered is written
+        out first, so no frame straddles the change. The line parameters are
+        changed in place where the driver allows it, otherwise, or when the
+        port name changed, the port is closed and reopened by the supervisor.
+        Queued commands are sent once the port is usable again.
+
+        :param port_name: The name of the serial port to use.
+        :param settings: The program settings holding the QSerialPort enums.
+        :return: None
+        """
+        if self.supervisor is None:
+            # Not opened yet, the new settings are used when it is.
+            self.port_name = port_name
+            self.settings = settings
+            return
+
+        self.outbound.pause()
+        if self.serial_port.isOpen() and self.serial_port.bytesToWrite():
+            self.serial_port.waitForBytesWritten(1000)
+
+        self.settings = settings
+        self.supervisor.settings = settings
+        self.airtime.character_time = character_time(settings)
+        # Bytes received under the old settings are meaningless.
+        self.decoder.clear()
+        self._record_event("closed: reconfigured")
+
+        if port_name != self.port_name:
+            logger.info("Switching gateway %s to %s.", self.port_name, port_name)
+            self.supervisor.stop()
+            self.port_name = port_name
+            self.serial_port.setPortName(port_name)
+            if not self.supervisor.open():
+                self.port_error.emit(
+                    f"{self.serial_port.errorString()}, retrying in the background."
+                )
+            return
+
+        if not self.serial_port.isOpen():
+            # The supervisor applies the settings on its next attempt.
+            return
+
+        if not self.supervisor.apply_settings():
+            logger.info(
+                "Reopening %s to apply the settings: %s",
+                port_name,
+                self.serial_port.errorString(),
+            )
+            self.supervisor.stop()
+            self.supervisor.open()
+            return
+
+        logger.info("Serial port %s reconfigured.", port_name)
+        self.outbound.resume()
+
+    @Slot()
+    def read_serial_port(self) -> None:
+        """
+        Drain the serial port and emit every complete frame in one batch.
+
+        :return: None
+        """
+        data = self.serial_port.readAll().data()
+        logger.debug("Raw data received on serial port: %s", data)
+        if self.capture is not None:
+            self.capture.write(Direction.READ, data)
+
+        frames = self.decoder.feed(data)
+        if frames:
+            self.frames_received.emit(frames)
+
+    @Slot(str, object, object, bool, int)
+    def send_text(
+        self,
+        message: str,
+        fleet_id: int,
+        device_id: int,
+        broadcast: bool,
+        priority: int = Priority.ROUTINE,
+    ) -> None:
+        """
+        Queue a text message for KSync.
+
+        :param message: The text of the message to be sent.
+        :param fleet_id: The fleet ID of the receiving device.
+        :param device_id: The device ID of the receiving device.
+        :param broadcast: Send the message to every device.
+        :param priority: The Priority of the message.
+        :return: None
+        """
+        if broadcast:
+            self.outbound.submit("send_text", priority, message=message, broadcast=True)
+        else:
+            self.outbound.submit(
+                "send_text",
+                priority,
+                message=message,
+                fleet_id=fleet_id,
+                device_id=device_id,
+            )
+
+    @Slot(object, object)
+    def poll_gnss(self, fleet_id: int, device_id: int) -> None:
+        """
+        Queue a position request for KSync.
+
+        :param fleet_id: The fleet ID of the device to poll.
+        :param device_id: The device ID of the device to poll.
+        :return: None
+        """
+        self.outbound.submit(
+            "poll_gnss", Priority.POLL, fleet_id=fleet_id, device_id=device_id
+        )
+
+    def _link_up(self) -> None:
+        """
+        Resume sending once the port is open.
+
+        :return: None
+        """
+        self._record_event(f"opened {self.port_name}")
+        self.port_opened.emit(self.port_name)
+        self.outbound.resume()
+
+    def _link_down(self, error: str) -> None:
+        """
+        Hold outbound commands and drop partial frames while the link is down.
+
+        :param error: The error that closed the port.
+        :return: None
+        """
+        self.outbound.pause()
+        self.decoder.clear()
+        self._record_event(f"closed: {error}")
+        self.port_error.emit(f"Connection lost ({error}), reconnecting.")
+
+    def _start_capture(self) -> None:
+        """
+        Open the capture file and write it out every second.
+
+        :return: None
+        """
+        self.capture = CaptureWriter(
+            self.capture_path, compressed=self.compress_capture
+        )
+        capture_timer = QTimer(self)
+        capture_timer.setInterval(1000)
+        capture_timer.timeout.connect(self.capture.flush)
+        capture_timer.start()
+        logger.info("Recording %s to %s.", self.port_name, self.capture_path)
+
+    def _record_event(self, event: str) -> None:
+        """
+        Record a change of the link, replays discard partial frames on close.
+
+        :param event: What happened, starting with opened or closed.
+        :return: None
+        """
+        if self.capture is not None:
+            self.capture.write(Direction.EVENT, event.encode())
+
+    def _report_sent(self, request: object) -> None:
+        """
+        Report a GNSS poll that went out on the air.
+
+        :param request: The sent OutboundRequest.
+        :return: None
+        """
+        if request.command == "poll_gnss":
+            self.poll_sent.emit(
+                request.arguments["fleet_id"], request.arguments["device_id"], True
+            )
+
+    def _report_send_failure(self, request: object, error: str) -> None:
+        """
+        Forward an outbound command that could not be sent.
+
+        :param request: The failed OutboundRequest.
+        :param error: The reason it failed.
+        :return: None
+        """
+        if request.command == "poll_gnss":
+            self.poll_sent.emit(
+                request.arguments["fleet_id"], request.arguments["device_id"], False
+            )
+        self.send_failed.emit(f"Unable to {request.command.replace('_', ' ')}: {error}")